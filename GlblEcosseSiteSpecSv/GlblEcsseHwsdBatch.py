@@ -0,0 +1,158 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        GlblEcsseHwsdBatch.py
+# Purpose:     command line entry point which runs the simulation and weather generation pipelines without PyQt5
+#              e.g. on cluster nodes with no display
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'GlblEcsseHwsdBatch.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import sys
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from time import time
+
+from headless_form_class import HeadlessForm
+from glbl_ecsse_low_level_fns import set_progress_json, report_progress
+
+ERROR_STR = '*** Error *** '
+
+PIPELINES = ['sims', 'weather', 'avemet', 'unpack_wthr']
+
+def _parse_args(argv):
+    """
+    C
+    """
+    parser = ArgumentParser(prog=__prog__, description='Generate ECOSSE simulation files or weather without a GUI')
+    parser.add_argument('pipeline', choices=PIPELINES,
+                        help='sims: simulation files, weather: weather files, avemet: rewrite AVEMET.DAT files, '
+                                            'unpack_wthr: extract weather stores of the region to cell directories')
+    parser.add_argument('--setup', default=None,
+                        help='setup file, by default glbl_ecss_site_spec_sv_setup.json in the current directory')
+    parser.add_argument('--study', default=None, help='study whose configuration file is read')
+    parser.add_argument('--region', default=None, help='overrides the region of the configuration file')
+    parser.add_argument('--crop', default=None, help='overrides the crop of the configuration file')
+    parser.add_argument('--max-cells', type=int, default=None, help='overrides maximum number of cells')
+    parser.add_argument('--all-studies', action='store_true', help='create simulation files for all studies')
+    parser.add_argument('--resume', action='store_true', help='resume an interrupted run of simulation files')
+    parser.add_argument('--progress', default='json', choices=['json', 'text'],
+                        help='progress as one JSON record per line, the default, or as text; with JSON records all '
+                                                                                    'other output goes to stderr')
+    parser.add_argument('--progress-file', default=None,
+                        help='file to which JSON progress records are written, by default stdout')
+
+    return parser.parse_args(argv)
+
+def _apply_overrides(form, args):
+    """
+    C
+    """
+    if args.region is not None:
+        if not form.change_region(args.region):
+            return False
+
+    if args.crop is not None:
+        if not form.change_crop(args.crop):
+            return False
+
+    if args.max_cells is not None:
+        form.w_max_cells.setText(str(args.max_cells))
+
+    if args.all_studies:
+        form.w_all_regions.setChecked(True)
+    elif args.region is not None:
+        form.w_all_regions.setChecked(False)
+
+    if args.resume:
+        form.w_resume.setChecked(True)
+
+    return True
+
+def run_pipeline(form, pipeline):
+    """
+    pipelines are imported only when required - returns False if the pipeline could not proceed
+    """
+    if pipeline == 'sims':
+        from glbl_ecss_cmmn_funcs import write_study_definition_file
+        from glbl_ecsse_high_level_fns import generate_banded_sims, all_generate_banded_sims
+
+        if not form.validate_sims():
+            return False
+
+        if form.w_all_regions.isChecked():
+            ok_flag = all_generate_banded_sims(form)
+        else:
+            ok_flag = generate_banded_sims(form, form.w_combo00a.currentText(), form.w_combo00b.currentText())
+            write_study_definition_file(form)
+
+    elif pipeline == 'weather':
+        from wthr_generation_fns import generate_all_weather
+
+        ok_flag = generate_all_weather(form)
+
+    elif pipeline == 'unpack_wthr':
+        from wthr_generation_fns import unpack_wthr_stores
+
+        ok_flag = unpack_wthr_stores(form)
+
+    else:
+        from wthr_generation_fns import write_avemet_files
+
+        ok_flag = write_avemet_files(form)
+
+    return ok_flag
+
+def main(argv=None):
+    """
+    returns exit status
+    """
+    args = _parse_args(argv)
+    if args.progress == 'json':
+        # stdout is reserved for progress records so that output is machine readable - messages go to stderr
+        # ===================================================================================================
+        with redirect_stdout(sys.stderr):
+            return _run(args)
+
+    return _run(args)
+
+def _run(args):
+    """
+    C
+    """
+    progress_fobj = None
+    if args.progress_file is not None:
+        progress_fobj = open(args.progress_file, 'a')
+    set_progress_json(args.progress == 'json', progress_fobj)
+
+    strt_time = time()
+    try:
+        form = HeadlessForm(args.setup, args.study)
+        if not _apply_overrides(form, args):
+            report_progress('error', pipeline=args.pipeline, error='invalid region or crop')
+            return 2
+
+        report_progress('start', pipeline=args.pipeline, study=form.w_study.text(),
+                        region=form.w_combo00a.currentText(), crop=form.w_combo00b.currentText(),
+                        init_secs=round(time() - strt_time, 2))
+        ok_flag = run_pipeline(form, args.pipeline)
+        report_progress('end', pipeline=args.pipeline, ok=ok_flag, elapsed_secs=round(time() - strt_time, 1))
+
+    except BaseException as err:
+        report_progress('error', pipeline=args.pipeline, error=repr(err))
+        raise
+
+    finally:
+        if progress_fobj is not None:
+            set_progress_json(args.progress == 'json')
+            progress_fobj.close()
+
+    return 0 if ok_flag else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
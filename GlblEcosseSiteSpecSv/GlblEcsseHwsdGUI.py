@@ -11,6 +11,9 @@ __version__ = '0.0.1'
 __author__ = 's03mm5'
 
 import sys
+from time import time
+_strt_time = time()     # start up time includes that taken by imports
+
 from os.path import join, isdir
 from os import listdir
 
@@ -22,19 +25,14 @@ from PyQt5.QtWidgets import (QLabel, QWidget, QApplication, QHBoxLayout, QVBoxLa
 from initialise_funcs import (read_config_file, initiation, change_config_file, write_config_file,
                                                                                             build_and_display_studies)
 from commonCmpntsGUI import exit_clicked, commonSection, grid_coarseness, calculate_grid_cell
-from glbl_ecss_cmmn_funcs import write_study_definition_file
-from runsites_high_level import run_ecosse_wrapper
 from shape_funcs import format_bbox, calculate_area
 
-from glbl_ecsse_high_level_fns import generate_banded_sims, all_generate_banded_sims
 from glbl_ecsse_low_level_fns import (check_cultiv_json_fname, check_rotation_json_fname, set_region_study)
-
-from glbl_ecsse_high_level_test_fns import generate_banded_sims_test, all_generate_banded_sims_test
-from glbl_ecsse_low_level_test_fns import check_cntry_prvnc_mappings
-
-from wthr_generation_fns import generate_all_weather, write_avemet_files
 from replicate_configs_fns import copy_config_files
 
+# modules which generate simulations and weather, and run ECOSSE, are imported when first required
+# ================================================================================================
+
 WARNING_STR = '*** Warning *** '
 
 WDGT_SIZE_80 = 80
@@ -334,7 +332,14 @@ class Form(QWidget):
         w_run_ecosse.clicked.connect(self.runEcosse)
         self.w_run_ecosse = w_run_ecosse
 
-        icol += 3
+        icol += 1
+        w_resume = QCheckBox('Resume run')
+        helpText = 'Select this option to skip bands and cells recorded as completed in the journal of an interrupted run'
+        w_resume.setToolTip(helpText)
+        grid.addWidget(w_resume, irow, icol)
+        self.w_resume = w_resume
+
+        icol += 2
         w_stop_all = QPushButton('Stop process')
         helpText = 'Stop creation of simulation files or run Ecosse processing'
         w_stop_all.setToolTip(helpText)
@@ -474,6 +479,8 @@ class Form(QWidget):
         """
         C
         """
+        from wthr_generation_fns import write_avemet_files
+
         write_avemet_files(self)
 
         return
@@ -482,6 +489,8 @@ class Form(QWidget):
         """
         generate weather for all regions, scenarios and GCMs
         """
+        from wthr_generation_fns import generate_all_weather
+
         generate_all_weather(self)
 
         return
@@ -504,12 +513,17 @@ class Form(QWidget):
         """
 
         """
+        from glbl_ecsse_low_level_test_fns import check_cntry_prvnc_mappings
+
         check_cntry_prvnc_mappings(self)
 
     def testFertiliserClicked(self):
         """
 
         """
+        from glbl_ecss_cmmn_funcs import write_study_definition_file
+        from glbl_ecsse_high_level_test_fns import generate_banded_sims_test, all_generate_banded_sims_test
+
         if self.w_all_regions.isChecked():
             all_generate_banded_sims_test(self)
         else:
@@ -529,6 +543,8 @@ class Form(QWidget):
             if study.find(' ') >= 0:
                 print('*** study name must not have spaces ***')
             else:
+                from glbl_ecss_cmmn_funcs import write_study_definition_file
+
                 # write last GUI selections
                 write_config_file(self)
                 write_study_definition_file(self)
@@ -596,6 +612,9 @@ class Form(QWidget):
         self.setup['study'] = study
         calculate_grid_cell(self)
 
+        from glbl_ecss_cmmn_funcs import write_study_definition_file
+        from glbl_ecsse_high_level_fns import generate_banded_sims, all_generate_banded_sims
+
         if self.w_all_regions.isChecked():
             all_generate_banded_sims(self)
         else:
@@ -608,6 +627,8 @@ class Form(QWidget):
         """
         C
         """
+        from runsites_high_level import run_ecosse_wrapper
+
         calculate_grid_cell(self)   # assigns value to req_resol_deg
         set_region_study(self)      # sets simulation root directory
         run_ecosse_wrapper(self)
@@ -648,6 +669,8 @@ class Form(QWidget):
         """
         exit cleanly
         """
+        from glbl_ecss_cmmn_funcs import write_study_definition_file
+
         write_study_definition_file(self)
         exit_clicked(self)
 
@@ -665,6 +688,7 @@ def main():
     form = Form() # instantiate form
     # display the GUI and start the event loop if we're not running batch mode
     form.show()             # paint form
+    print('Start up took {:.1f} seconds'.format(time() - _strt_time))
     sys.exit(app.exec_())   # start event loop
 
 if __name__ == '__main__':
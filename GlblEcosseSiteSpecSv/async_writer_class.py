@@ -0,0 +1,72 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        async_writer_class.py
+# Purpose:     bounded pool of writer threads so that simulation files, already formatted, are written while the
+#              generation loop moves on to the next cell
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'async_writer_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import BoundedSemaphore
+
+ERROR_STR = '*** Error *** '
+
+PENDING_PER_THREAD = 8      # cells queued for each writer thread before the generation loop is made to wait
+
+def run_jobs(jobs):
+    """
+    each job is a function and its arguments - jobs are run in order
+    """
+    for func, args in jobs:
+        func(*args)
+
+class AsyncWriter(object):
+    """
+    the jobs for a cell are run in order by a single thread; cells are written concurrently
+    exceptions raised by jobs are held until the next call of end_band
+    """
+    def __init__(self, nthreads, max_pending=None):
+        """
+        C
+        """
+        if max_pending is None:
+            max_pending = PENDING_PER_THREAD*nthreads
+
+        self.executor = ThreadPoolExecutor(max_workers=nthreads)
+        self.slots = BoundedSemaphore(max_pending)
+        self.band_futures = []      # cells submitted since the last call of end_band
+
+    def submit(self, jobs):
+        """
+        blocks while max_pending cells are waiting to be written, which caps the memory held by formatted files
+        """
+        self.slots.acquire()
+        future = self.executor.submit(run_jobs, jobs)
+        future.add_done_callback(lambda dummy: self.slots.release())
+        self.band_futures.append(future)
+
+    def end_band(self):
+        """
+        wait for all files submitted so far to be written then raise the first error, if any
+        """
+        band_futures, self.band_futures = self.band_futures, []
+        wait(band_futures)
+
+        errors = [future.exception() for future in band_futures if future.exception() is not None]
+        if len(errors) > 0:
+            if len(errors) > 1:
+                print(ERROR_STR + '{} errors writing simulation files, first error follows'.format(len(errors)))
+            raise errors[0]
+
+    def close(self):
+        """
+        C
+        """
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,65 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        bbox_index_class.py
+# Purpose:     uniform grid bucket index of bounding boxes for point in box queries
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'bbox_index_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from math import floor
+
+BUCKET_SIZE = 1.0   # degrees
+
+class BboxGridIndex(object,):
+    """
+    each grid bucket lists the bounding boxes which overlap it, in the order in which boxes were supplied, so that
+    queries return the same boxes, in the same order, as a scan of all boxes
+    """
+    def __init__(self, bboxes, bucket_size=BUCKET_SIZE):
+        """
+        bboxes: dictionary of names and their bounding boxes i.e. lon_ll, lat_ll, lon_ur, lat_ur
+        """
+        self.bucket_size = bucket_size
+        self.names = []
+        self.bboxes = []
+        self.buckets = {}
+
+        for name, bbox in bboxes.items():
+            lon_ll, lat_ll, lon_ur, lat_ur = bbox
+            indx = len(self.names)
+            self.names.append(name)
+            self.bboxes.append((lon_ll, lat_ll, lon_ur, lat_ur))
+
+            if not (lon_ll <= lon_ur and lat_ll <= lat_ur):
+                continue    # empty or undefined box - never matched by a scan
+
+            for ix in range(self._bucket(lon_ll), self._bucket(lon_ur) + 1):
+                for iy in range(self._bucket(lat_ll), self._bucket(lat_ur) + 1):
+                    self.buckets.setdefault((ix, iy), []).append(indx)
+
+    def _bucket(self, coord):
+        """
+        C
+        """
+        return int(floor(coord/self.bucket_size))
+
+    def locate(self, lat, lon):
+        """
+        return names of all boxes which contain this point, boundaries inclusive
+        """
+        names = []
+        if lat != lat or lon != lon:
+            return names    # undefined point
+
+        for indx in self.buckets.get((self._bucket(lon), self._bucket(lat)), []):
+            lon_ll, lat_ll, lon_ur, lat_ur = self.bboxes[indx]
+            if (lat >= lat_ll and lat <= lat_ur) and (lon >= lon_ll and lon <= lon_ur):
+                names.append(self.names[indx])
+
+        return names
@@ -16,68 +16,8 @@ __author__ = 's03mm5'
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QLabel, QComboBox, QRadioButton, QButtonGroup, QPushButton, QCheckBox
 
-from shape_funcs import calculate_area, format_bbox
 from initialise_funcs import write_config_file
-
-resolutions = {120:'30"', 30:'2\'', 20:'3\'', 10:'6\'', 6:'10\'', 4:'15\'', 3:'20\'', 2:'30\''}
-reverse_resols = {}
-
-for key in resolutions:
-    reverse_resols[resolutions[key]] = key
-
-def calculate_grid_cell(form, granularity = 120):
-
-    latitude = 52.0
-    # use current lower left latitude for reference
-    latText = form.w_ll_lat.text()
-    try:
-        latitude = float(latText)
-    except ValueError:
-        print(latText)
-
-    resol = form.w_combo16.currentText()
-    try:
-        granul = reverse_resols[resol]
-    except KeyError as e:
-        print(str(e))
-        return
-
-    resol_deg = 1.0/float(granul)  # units of decimal degrees
-    bbox = list([0.0, latitude, resol_deg, latitude + resol_deg])
-    area = calculate_area(bbox)
-    form.lbl16a.setText(format_bbox(bbox,area,2))
-
-    form.req_resol_upscale = int(granularity/granul)    # number of base granuals making up one side of a cell
-    form.req_resol_granul = granul                            # number of cells per degree
-    form.req_resol_deg = resol_deg                            # size of each trapizoid cell in decimal degrees
-
-    return
-
-def _fetch_wthr_detail(form):
-    """
-
-    """
-    generic_rsrce = form.wthr_rsrces_generic
-    rsrce_hist = generic_rsrce + '_hist'
-
-    # so far only CRU and WrldClim are permitted
-    # ==========================================
-    if generic_rsrce == 'WrldClim':
-        rsrce_fut = 'UKESM1-0-LL_126'
-    else:
-        rsrce_fut = 'ClimGen_A1B'
-
-    start_year = form.wthr_sets[rsrce_hist]['year_start']
-    end_year   = form.wthr_sets[rsrce_hist]['year_end']
-    hist_syears = list(range(start_year, end_year))
-    hist_eyears = list(range(start_year + 1, end_year + 1))
-
-    start_year = form.wthr_sets[rsrce_fut]['year_start']
-    end_year = form.wthr_sets[rsrce_fut]['year_end']
-    fut_syears = range(start_year, end_year)
-    fut_eyears = list(range(start_year + 1, end_year + 1))
-
-    return hist_syears, hist_eyears, fut_syears, fut_eyears
+from form_helper_fns import resolutions, calculate_grid_cell, fetch_wthr_detail
 
 def _fetch_land_use_types():
     """
@@ -98,7 +38,7 @@ def commonSection(form, grid, irow, wthr_only_flag = False):
     """
 
     """
-    hist_syears, hist_eyears, fut_syears, fut_eyears = _fetch_wthr_detail(form)
+    hist_syears, hist_eyears, fut_syears, fut_eyears = fetch_wthr_detail(form)
     form.land_use_types,  form.lu_type_abbrevs = _fetch_land_use_types()
 
     # =========
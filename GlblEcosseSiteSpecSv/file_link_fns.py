@@ -0,0 +1,68 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        file_link_fns.py
+# Purpose:     place identical ECOSSE input files in simulation directories by hardlink, reflink or symlink
+#              rather than by copying, with copying as the fallback
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'file_link_fns.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from os import link, remove, symlink
+from os.path import abspath, lexists
+from shutil import copyfile
+
+WARNING_STR = '*** Warning *** '
+
+LINK_MODES = list(['copy', 'hardlink', 'reflink', 'symlink'])
+FICLONE = 0x40049409        # Linux ioctl request to share the data blocks of one file with another
+
+# link modes which have failed in this process - subsequent files are copied without further attempts
+# ====================================================================================================
+_failed_modes = set()
+
+def _reflink(src, dst):
+    """
+    clone src to dst on file systems which support copy on write e.g. Btrfs, XFS; raises OSError otherwise
+    """
+    try:
+        from fcntl import ioctl
+    except ImportError:
+        raise OSError('reflink is not supported on this platform')
+
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+def link_or_copy(src, dst, link_mode='copy'):
+    """
+    place src at dst using the requested link mode, falling back to copying if the link cannot be made
+    NB  hardlinked and reflinked files must be treated as read only by ECOSSE as for copies
+    """
+    if link_mode == 'copy' or link_mode in _failed_modes:
+        copyfile(src, dst)
+        return
+
+    if lexists(dst):
+        remove(dst)     # copyfile overwrites but links cannot
+
+    try:
+        if link_mode == 'hardlink':
+            link(src, dst)
+        elif link_mode == 'reflink':
+            _reflink(src, dst)
+        elif link_mode == 'symlink':
+            symlink(abspath(src), dst)
+        else:
+            raise OSError('link mode ' + link_mode + ' not recognised')
+
+    except OSError as err:
+        print(WARNING_STR + 'could not {} {} - will copy files instead: {}'.format(link_mode, src, err))
+        _failed_modes.add(link_mode)
+        if lexists(dst):
+            remove(dst)
+        copyfile(src, dst)
@@ -0,0 +1,190 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        form_snapshot_class.py
+# Purpose:     Qt free copy of the main form which can be passed to worker processes
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'form_snapshot_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from copy import copy
+from netCDF4 import Dataset
+
+# attributes of the form, other than widgets, required by the simulation and weather generation functions
+# =======================================================================================================
+FORM_ATTRIBS = ['setup', 'settings', 'lgr', 'dflt_ecosse_fnames', 'cultiv_pattern', 'rota_pattern', 'crop_defns',
+                'req_resol_deg', 'req_resol_granul', 'req_resol_upscale', 'wthr_sets', 'weather_set_linkages',
+                'wthr_rsrces_generic', 'wthr_scenarios', 'regions', 'regions_abbrv', 'regions_df', 'studies',
+                'parms_settings', 'bbox']
+
+CHECKED = 2     # as Qt.Checked
+
+class WidgetValue(object,):
+    """
+    stands in for a Qt widget by returning the values recorded when the snapshot was taken
+    when created without a widget it serves as a line edit, label, check box, radio button or combo box for headless
+    runs - setters follow their Qt namesakes but no signals are emitted
+    """
+    def __init__(self, wdgt=None, items=None):
+        """
+        record whichever values this type of widget offers
+        """
+        self._group = None
+        self._enabled = True
+        if wdgt is None:
+            self._text = ''
+            self._checked = False
+            self._items = []
+            self._current_indx = -1
+            self._current_text = ''
+            if items is not None:
+                self.addItems(items)
+            return
+
+        self._text = wdgt.text() if hasattr(wdgt, 'text') else None
+        self._checked = wdgt.isChecked() if hasattr(wdgt, 'isChecked') else False
+        if hasattr(wdgt, 'currentText'):
+            self._current_text = wdgt.currentText()
+            self._current_indx = wdgt.currentIndex()
+            self._items = [wdgt.itemText(indx) for indx in range(wdgt.count())]
+        else:
+            self._current_text = None
+            self._current_indx = -1
+            self._items = []
+
+    def text(self):
+        return self._text
+
+    def isChecked(self):
+        return self._checked
+
+    def currentText(self):
+        return self._current_text
+
+    def currentIndex(self):
+        return self._current_indx
+
+    def count(self):
+        return len(self._items)
+
+    def itemText(self, indx):
+        return self._items[indx]
+
+    def findText(self, text):
+        return self._items.index(text) if text in self._items else -1
+
+    def isEnabled(self):
+        return self._enabled
+
+    def setText(self, text):
+        self._text = text
+
+    def setChecked(self, checked):
+        """
+        radio buttons of the same group are mutually exclusive - see button_group
+        """
+        if checked and self._group is not None:
+            for wdgt in self._group:
+                wdgt._checked = False
+        self._checked = bool(checked)
+
+    def setCheckState(self, state):
+        self.setChecked(state == CHECKED)
+
+    def setEnabled(self, enabled):
+        self._enabled = bool(enabled)
+
+    def clear(self):
+        self._items = []
+        self.setCurrentIndex(-1)
+
+    def addItem(self, item):
+        self._items.append(item)
+        if self._current_indx == -1:
+            self.setCurrentIndex(0)     # as for a Qt combo box the first item becomes current
+
+    def addItems(self, items):
+        for item in items:
+            self.addItem(item)
+
+    def setCurrentIndex(self, indx):
+        if 0 <= indx < len(self._items):
+            self._current_indx = indx
+            self._current_text = self._items[indx]
+        else:
+            self._current_indx = -1
+            self._current_text = ''
+
+    def setCurrentText(self, text):
+        indx = self.findText(text)
+        if indx >= 0:
+            self.setCurrentIndex(indx)
+
+def button_group(*wdgts):
+    """
+    make headless radio buttons mutually exclusive, as for a QButtonGroup
+    """
+    group = list(wdgts)
+    for wdgt in group:
+        wdgt._group = group
+
+class FormSnapshot(object,):
+    """
+    picklable copy of the form: widgets are replaced by their values and open netCDF handles are dropped
+    """
+    def __init__(self, form):
+        """
+        C
+        """
+        for attrib in FORM_ATTRIBS:
+            if hasattr(form, attrib):
+                setattr(self, attrib, getattr(form, attrib))
+
+        if hasattr(form, 'setup'):
+            self.setup = copy(form.setup)       # cell bounding box is written to setup during generation
+
+        for attrib in vars(form):
+            if attrib.startswith('w_'):
+                setattr(self, attrib, WidgetValue(getattr(form, attrib)))
+
+        # the countries netCDF handle must be reopened by each worker - see reopen_nc_dsets
+        # ==================================================================================
+        self.cntries_defn = _detach_nc_dset(getattr(form, 'cntries_defn', None))
+        glbl_n_inpts = getattr(form, 'glbl_n_inpts', None)
+        if glbl_n_inpts is not None:
+            glbl_n_inpts = copy(glbl_n_inpts)
+            glbl_n_inpts.cntries_defn = _detach_nc_dset(glbl_n_inpts.cntries_defn)
+        self.glbl_n_inpts = glbl_n_inpts
+
+    def reopen_nc_dsets(self):
+        """
+        called by worker processes
+        """
+        if self.glbl_n_inpts is not None:
+            cntries_defn = self.glbl_n_inpts.cntries_defn
+            cntries_defn.nc_dset = Dataset(cntries_defn.nc_fname, mode='r')
+
+    def close_nc_dsets(self):
+        """
+        C
+        """
+        if self.glbl_n_inpts is not None:
+            if self.glbl_n_inpts.cntries_defn.nc_dset is not None:
+                self.glbl_n_inpts.cntries_defn.nc_dset.close()
+
+def _detach_nc_dset(defn):
+    """
+    return copy of dataset definition without its netCDF handle
+    """
+    if defn is None:
+        return None
+
+    defn = copy(defn)
+    defn.nc_dset = None
+
+    return defn
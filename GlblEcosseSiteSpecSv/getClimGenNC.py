@@ -16,6 +16,7 @@ from os.path import join, normpath, isdir, isfile, split as split_dir
 from calendar import month_abbr
 
 from thornthwaite import thornthwaite
+from run_settings_class import RunSettings
 
 numSecsDay = 3600*24
 ngranularity = 120
@@ -55,25 +56,26 @@ def _check_list_for_none(metric_list):
 
 class ClimGenNC(object,):
 
-    def __init__(self, form, region, crop_name, sim_start_year, sim_end_year= -999, this_gcm=None , scnr=None):
+    def __init__(self, form, region, crop_name, sim_start_year, sim_end_year= -999, this_gcm=None , scnr=None,
+                                                                                                run_settings=None):
         """
-        C
+        widget values are taken from run_settings, if supplied, rather than from the form
         """
-        if form.w_mnthly.isChecked():   # monthly timestep
-            sim_mnthly_flag = True
-        else:
-            sim_mnthly_flag = False     # daily timestep
+        if run_settings is None:
+            run_settings = RunSettings(form)
+
+        sim_mnthly_flag = run_settings.sim_mnthly_flag     # monthly or daily timestep
 
         ave_wthr_flag = False   # form.w_ave_wthr.isChecked()
         if this_gcm is None:
-            wthr_rsrce = form.w_combo10w.currentText()
-            fut_clim_scen = form.w_combo10.currentText()
+            wthr_rsrce = run_settings.wthr_rsrce
+            fut_clim_scen = run_settings.fut_clim_scen
         else:
             wthr_rsrce = this_gcm
             fut_clim_scen = scnr
 
-        hist_start_year = int(form.w_combo09s.currentText())
-        hist_end_year = int(form.w_combo09e.currentText())
+        hist_start_year = run_settings.hist_start_year
+        hist_end_year = run_settings.hist_end_year
 
         # ===============================================================
         hist_wthr_set = form.wthr_sets['WrldClim_hist']
@@ -135,11 +137,13 @@ class ClimGenNC(object,):
         self.num_sim_years   =  sim_end_year - sim_start_year + 1
         self.sim_ave_file    = 'met{}_to_{}_ave.txt'.format(sim_start_year, sim_end_year)
 
-    def create_FutureAverages(self, clim_dir, lat_inp, site, lta_precip, lta_tmean):
+    def create_FutureAverages(self, clim_dir, lat_inp, site, lta_precip, lta_tmean, met_fnames=None):
         '''
         use preexisting metyyyys.txt files to generate a text file of average weather which will subsequently
         be included in the input.txt file
         also create a climate file for each of the simulation years based on average weather from the CRU year range
+        met_fnames: names of met files just written by make_met_files - if these comprise all simulation years then
+                    the met files are not read since lta PET depends only on the long term average temperatures
         '''
         func_name =  ' create_FutureAverages'
         full_func_name =  __prog__ +  func_name
@@ -166,7 +170,37 @@ class ClimGenNC(object,):
             sim_precip[month] = 0.0
             sim_tmean[month] = 0.0
 
-        for year in range(sim_start_year, sim_end_year):
+        if met_fnames is None:
+            met_fnames_missing = True
+        else:
+            met_fnames_wrttn = set([split_dir(fname)[1] for fname in met_fnames])
+            met_fnames_missing = any(['met{0}s.txt'.format(year) not in met_fnames_wrttn
+                                                                    for year in range(sim_start_year, sim_end_year)])
+        if met_fnames_missing:
+            ret_code = self._total_met_files(clim_dir, sim_precip, sim_tmean)
+            if ret_code < 0:
+                return ret_code
+
+        # note float conversion from float32 otherwise rounding does not work as expected
+        year = sim_end_year - 1
+        lta = {'pet': [], 'precip': lta_precip, 'tas': lta_tmean}
+        lta['pet'] = thornthwaite(lta['tas'], lat_inp, year)
+
+        site.lta_pet = [round(float(pet), 1) for pet in lta['pet']]
+        site.lta_precip = [round(float(precip), 1) for precip in lta['precip']]
+        site.lta_tmean = [round(float(tmean), 1) for tmean in lta['tas']]
+
+        dummy, location = split_dir(clim_dir)
+        self.lgr.info('Generated average weather at location {} in function {}'.format(location, func_name))
+
+        return 0
+
+    def _total_met_files(self, clim_dir, sim_precip, sim_tmean):
+        '''
+        fallback for existing weather trees: read metyyyys.txt files and total monthly precipitation and temperature
+        '''
+        months = self.months
+        for year in range(self.sim_start_year, self.sim_end_year):
             fname = 'met{0}s.txt'.format(year)
             met_fpath = join(clim_dir, fname)
 
@@ -185,15 +219,4 @@ class ClimGenNC(object,):
                 except IndexError as err:
                     print(ERROR_STR + str(err))
 
-        # note float conversion from float32 otherwise rounding does not work as expected
-        lta = {'pet': [], 'precip': lta_precip, 'tas': lta_tmean}
-        lta['pet'] = thornthwaite(lta['tas'], lat_inp, year)
-
-        site.lta_pet = [round(float(pet), 1) for pet in lta['pet']]
-        site.lta_precip = [round(float(precip), 1) for precip in lta['precip']]
-        site.lta_tmean = [round(float(tmean), 1) for tmean in lta['tas']]
-
-        dummy, location = split_dir(clim_dir)
-        self.lgr.info('Generated average weather at location {} in function {}'.format(location, func_name))
-
         return 0
@@ -13,11 +13,14 @@ __version__ = '0.0.1'
 __author__ = 's03mm5'
 
 from time import time
+from os.path import join
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import Value
 from locale import LC_ALL, setlocale, format_string
-from PyQt5.QtWidgets import QApplication
 
 from hwsd_bil import HWSD_bil
 from hwsd_soil_class import HWSD_soil_defn
+from hwsd_band_class import HwsdBand
 
 from getClimGenNC import ClimGenNC
 from getClimGenFns import check_clim_nc_limits, open_wthr_NC_sets, get_wthr_nc_coords
@@ -25,13 +28,22 @@ from make_site_spec_files_classes import MakeSiteFiles
 from prepare_ecosse_files import make_ecosse_files
 
 from glbl_ecss_cmmn_funcs import write_study_definition_file
-from glbl_ecsse_low_level_fns import Cell_hwsd_data_frame, check_run_mask, make_fert_recs, set_region_study, update_progress
-from mngmnt_fns_and_class import create_proj_data_defns, open_proj_NC_sets, close_proj_NC_sets
+from glbl_ecsse_low_level_fns import (Cell_hwsd_data_frame, check_run_mask, make_fert_recs, set_region_study,
+                                    update_progress, band_eta_mess, make_bbox_indices, process_events, report_progress)
+from mngmnt_fns_and_class import (create_proj_data_defns, open_proj_NC_sets, close_proj_NC_sets,
+                                            preload_proj_NC_slabs, preload_fert_cubes, detach_proj_NC_sets)
+from form_snapshot_class import FormSnapshot
+from run_settings_class import RunSettings
+from sims_journal_class import SimsJournal
+from async_writer_class import AsyncWriter
+from sims_archive_class import SimsShard
+from soil_recs_cache_class import soil_recs_cache
+from work_plan_fns import make_work_plan, band_cells_from_plan, report_work_plan, write_work_plan
 from runsites_high_level import run_ecosse_wrapper
 
 from shape_funcs import calculate_area, MakeBboxesNitroInpts
 from initialise_funcs import change_config_file
-from wthr_generation_fns import fetch_hist_lta_from_lat_lon
+from wthr_generation_fns import fetch_hist_lta_from_lat_lon, extract_wthr_cell
 
 WARNING_STR = '*** Warning *** '
 
@@ -39,26 +51,28 @@ SKIP_GRAFT = False   # avoid IO intensive overhead to test Mean N Application sp
 
 def all_generate_banded_sims(form):
     """
-    get all studies, then change config files
+    get all studies, then change config files - returns False if generation could not proceed for any study
     """
     study_set = [form.w_combo00s.itemText(istdy) for istdy in range(form.w_combo00s.count())]
+    nfailed = 0
 
     for study in study_set:
         change_config_file(form, study)
-        QApplication.processEvents()
+        process_events()
         form.update() # Updates the widget but does not cause an immediate repaint
 
         region = form.w_combo00a.currentText()
         crop_name = form.w_combo00b.currentText()
         print('\nGenerating cells for crop: {}\tregion: {}'.format(crop_name, region))
-        generate_banded_sims(form, region, crop_name)
+        if not generate_banded_sims(form, region, crop_name):
+            nfailed += 1
 
     print('Finished processing {} studies'.format(len(study_set)))
-    return
+    return nfailed == 0
 
 def generate_banded_sims(form, region, crop_name):
     """
-    called from GUI
+    called from GUI - returns False if generation could not proceed
     NB  vars ending in _dset indicate netCDF4 dataset objects
         vars ending in _defn are objects which comprising NC file attributes e.g. resolution, extents, file location
     """
@@ -70,6 +84,7 @@ def generate_banded_sims(form, region, crop_name):
             form.glbl_n_inpts = None
         else:
             form.glbl_n_inpts = MakeBboxesNitroInpts(form.settings, form.cntries_defn)
+            make_bbox_indices(form.glbl_n_inpts)
             glbl_n_flag = True
     else:
         form.glbl_n_inpts = None
@@ -102,7 +117,7 @@ def generate_banded_sims(form, region, crop_name):
     req_resol_deg = form.req_resol_deg
     if req_resol_deg not in permitted_resols:
         print('Only resolutions of ' + str(permitted_resols) + ' degrees are permitted')
-        return
+        return False
 
     resol_d2 = req_resol_deg/2
 
@@ -138,145 +153,127 @@ def generate_banded_sims(form, region, crop_name):
     proj_data_defns = create_proj_data_defns(form.setup['proj_path'], crop_name, req_resol_deg)
     if proj_data_defns is None:
         print('*** Error *** verifing NC files for study ' + form.setup['region_study'])
-        return
+        return False
 
     mask_defn, yield_defn, dates_defn, fert_defns = proj_data_defns
     del proj_data_defns
-    yld_varname = yield_defn.var_name
 
     # weather choice - CRU is default, check requested AOI coordinates against weather dataset extent
     # ===============================================================================================
     if not check_clim_nc_limits(form, form.setup['bbox'], form.wthr_rsrces_generic):
-        return
+        return False
 
-    climgen = ClimGenNC(form, region, crop_name, sim_strt_year, sim_end_year)
+    # widgets are read once - simulation files for each cell are then made from this snapshot and its tables
+    # ======================================================================================================
+    run_settings = RunSettings(form)
+    climgen = ClimGenNC(form, region, crop_name, sim_strt_year, sim_end_year, run_settings=run_settings)
+    run_settings = run_settings.with_tables(climgen)
 
     # identify geo-extent for this run
     # ================================
     lat_ur_indx, lon_ur_indx, ret_code = mask_defn.get_nc_coords(lat_ur, lon_ur)
     lat_ll_indx, lon_ll_indx, ret_code = mask_defn.get_nc_coords(lat_ll, lon_ll)
-    lat_ur_indx, ntotal_grow = check_run_mask(mask_defn, lon_ll_indx, lat_ll_indx, lon_ur_indx, lat_ur_indx)
-    if ntotal_grow == 0:
-        print('Nothing to grow for this AOI')
-        return
 
     #  open required NC sets
     # ======================
     open_proj_NC_sets(mask_defn, yield_defn, dates_defn, fert_defns)
 
-    # main AOI traversal loops - outer: North to South, inner: East to West
-    # ========================
-    start_at_band = 0
-    print('Starting at band {}'.format(start_at_band))
-
-    nbands = lat_ur_indx - lat_ll_indx + 1
-    last_time = time()
-    ncompleted = 0
-    nskipped = 0
-    warning_count = 0
-    no_wthr = 0
-    ngrowing = 0; nno_grow = 0
-
-    # main loop
-    # =========
-    for nband, lat_indx in enumerate(range(lat_ur_indx, lat_ll_indx - 1, -1)):
+    # read mask, yield and sowing/harvest layers once for the AOI - per cell lookups are then served from memory
+    # ==========================================================================================================
+    preload_proj_NC_slabs(mask_defn, yield_defn, dates_defn, lat_ll_indx, lon_ll_indx, lat_ur_indx, lon_ur_indx)
 
-        lat = mask_defn.lats[lat_indx]
-        ngrow_this_band = 0
-        area = None
-
-        for lon_indx in range(lon_ll_indx, lon_ur_indx + 1):
-            lon = mask_defn.lons[lon_indx]
-
-            last_time = update_progress(last_time, ncompleted, nskipped, ntotal_grow, ngrowing, nno_grow, hwsd)
-            if ncompleted >= max_cells:
-                break
-
-            # check weather
-            # =============
-            integrity_flag, hist_lta_recs, met_fnames = fetch_hist_lta_from_lat_lon(wthr_prj_dir, climgen, lat, lon)
-            if integrity_flag:
-                if hist_lta_recs is None or met_fnames is None:     # weather site is an empty folder
-                    nskipped += 1
-                    no_wthr += 1
-                    continue
-            else:
-                nskipped += 1
-                continue
+    # growing cells are counted from the mask slab
+    # ============================================
+    lat_ur_indx, ntotal_grow, band_grow_counts = check_run_mask(mask_defn, lon_ll_indx, lat_ll_indx,
+                                                                                            lon_ur_indx, lat_ur_indx)
+    if ntotal_grow == 0:
+        print('Nothing to grow for this AOI')
+        close_proj_NC_sets(mask_defn, yield_defn, dates_defn, fert_defns)
+        return True
 
-            mask_val = mask_defn.nc_dset.variables['cropmask'][lat_indx, lon_indx]
-            crop_grown = int(mask_val.item())
-            if crop_grown == 0:
-                nno_grow += 1
-                continue
+    # fertiliser time series are likewise read once for the AOI and retained for subsequent crops
+    # ============================================================================================
+    preload_fert_cubes(fert_defns, mask_defn, lat_ll_indx, lon_ll_indx, lat_ur_indx, lon_ur_indx)
 
-            if lat == 45.75 and lon == 136.75:
-                print('')
-            ngrowing += 1
-            ngrow_this_band += 1
+    # planning pass - generation then consumes only the growing cells identified by the work plan
+    # ============================================================================================
+    plan = make_work_plan(mask_defn, yield_defn, dates_defn, lat_ll_indx, lon_ll_indx, lat_ur_indx, lon_ur_indx)
+    band_cells, band_nunavail = band_cells_from_plan(plan)
+    report_work_plan(plan)
+    write_work_plan(join(sims_dir, form.setup['region_study'] + '_work_plan.npz'), plan)
 
-            form.setup['bbox'] = list([lon - resol_d2, lat - resol_d2, lon + resol_d2, lat + resol_d2])
-            if area is None:
-                area = calculate_area(form.setup['bbox'])
+    # journal of completed bands and cells - enables an interrupted run to be resumed
+    # ===============================================================================
+    resume_flag = hasattr(form, 'w_resume') and form.w_resume.isChecked()
+    journal = SimsJournal(sims_dir, form.setup['region_study'], region, crop_name, resume_flag)
 
-            # retrieve soil detail for this cell
-            # ==================================
-            nrows_read = hwsd.read_bbox_mu_globals(form.setup['bbox'])   # create grid of MU_GLOBAL values
-            mu_global_pairs = hwsd.get_mu_globals_dict()    # retrieve dictionary of mu_globals and number of occurrences
-            if mu_global_pairs is None:
-                nskipped += 1
-                continue
+    # main AOI traversal loops - outer: North to South, inner: East to West
+    # ========================
 
-            cell_hwsd_df = Cell_hwsd_data_frame(form.lgr, hwsd)  # create data frame for cell
-            soil_recs = hwsd.get_soil_recs(mu_global_pairs)            # create soil records - updates bad_muglobals
-            if soil_recs is None:
-                nskipped += 1
+    nbands = lat_ur_indx - lat_ll_indx + 1
+    lat_indices = list(range(lat_ur_indx, lat_ll_indx - 1, -1))
+    counters = {'ncompleted': 0, 'nskipped': 0, 'warning_count': 0, 'no_wthr': 0, 'ngrowing': 0, 'nno_grow': 0}
+    band_parms = {'lon_ll_indx': lon_ll_indx, 'lon_ur_indx': lon_ur_indx, 'resol_d2': resol_d2,
+                  'max_cells': max_cells, 'ntotal_grow': ntotal_grow, 'wthr_prj_dir': wthr_prj_dir,
+                  'sim_strt_year': sim_strt_year, 'sim_end_year': sim_end_year, 'year_from': year_from,
+                  'peren_flag': peren_flag, 'glbl_n_flag': glbl_n_flag,
+                  'use_dom_soil_flag': use_dom_soil_flag, 'use_high_cover_flag': use_high_cover_flag,
+                  'band_cells': band_cells, 'band_nunavail': band_nunavail, 'band_grow_counts': band_grow_counts,
+                  'run_settings': run_settings, 'aoi_indices': (lat_ll_indx, lon_ll_indx, lat_ur_indx, lon_ur_indx)}
+    del plan
+    proj_data_defns = mask_defn, yield_defn, dates_defn, fert_defns
+
+    n_workers = form.setup['n_workers']
+    if n_workers > 1:
+        print('Will spread {} bands across {} worker processes'.format(nbands, n_workers))
+        _generate_bands_in_pool(form, climgen, hwsd, proj_data_defns, band_parms, lat_indices, counters, n_workers,
+                                                                                                            journal)
+    else:
+        # simulation files are optionally written by a pool of threads while the next cells are prepared
+        # ================================================================================================
+        if form.setup['n_writer_threads'] > 0:
+            writer = AsyncWriter(form.setup['n_writer_threads'])
+        else:
+            writer = None
+
+        # main loop
+        # =========
+        last_time = time()
+        strt_time = last_time
+        ngrow_done, ngrow_remain = 0, ntotal_grow
+        for nband, lat_indx in enumerate(lat_indices):
+            lat = mask_defn.lats[lat_indx]
+            ngrow_remain -= band_grow_counts.get(lat_indx, 0)
+            if lat_indx in journal.bands_done:
+                for key in counters:
+                    counters[key] += journal.bands_done[lat_indx][key]
                 continue
 
-            soil_defn.populate(lat, lon, area, cell_hwsd_df, mu_global_pairs, soil_recs)
-
-            # yield has same resolution as mask
-            # =================================
-            val = yield_defn.nc_dset.variables[yld_varname][lat_indx, lon_indx]
-            yield_val = round(float(val.item()), 2)
-
-            lat_date_indx, lon_date_indx, ret_code = dates_defn.get_nc_coords(lat, lon)
-            if ret_code == 'OK':
-                day = dates_defn.nc_dset.variables['harvest'][lat_date_indx, lon_date_indx]
-                harvest_day = int(day.item())
-                day = dates_defn.nc_dset.variables['plant'][lat_date_indx, lon_date_indx]
-                plant_day = int(day.item())
-                fert_recs = make_fert_recs(form.lgr, fert_defns, lat, lon, sim_strt_year, sim_end_year,
-                                                            year_from, peren_flag, form.glbl_n_inpts, glbl_n_flag)
-                if fert_recs is None:
-                    warning_count += 1
-                    continue
-            else:
-                form.lgr.info(ret_code)
-                warning_count += 1
-                continue
+            strt_counters = dict(counters)
+            ngrow_this_band, last_time, band_done_flag = _generate_band(form, climgen, hwsd, soil_defn,
+                                        proj_data_defns, band_parms, lat_indx, counters, last_time, journal, writer)
+            if band_done_flag:
+                journal.record_band(lat_indx, {key: counters[key] - strt_counters[key] for key in counters})
+
+            # finished this band - report progress
+            # ====================================
+            ngrow_done += band_grow_counts.get(lat_indx, 0)
+            mess = 'Processed band {} of {} bands for lat: {}\t'.format(nband, nbands, lat)
+            mess += 'N growing locations: {}\t'.format(ngrow_this_band)
+            mess += band_eta_mess(strt_time, ngrow_done, ngrow_remain)
+            form.lgr.info(mess)
+            # print(mess)
+            report_progress('band', lat=float(lat), nband=nband, nbands=nbands, ngrow_this_band=ngrow_this_band,
+                                                        ngrow_done=ngrow_done, ngrow_remain=ngrow_remain, **counters)
+            if counters['ncompleted'] >= max_cells:
+                print('\nFinishing run after {} cells completed'.format(counters['ncompleted']))
+                break
 
-            # simplify if requested
-            # =====================
-            ret_code = soil_defn.simplify_soil_defn(use_dom_soil_flag, use_high_cover_flag, hwsd.bad_muglobals)
-            if ret_code is None:
-                warning_count += 1
-                continue
+        if writer is not None:
+            writer.close()
 
-            site_obj = MakeSiteFiles(form, climgen)
-            make_ecosse_files(site_obj, climgen, soil_defn, fert_recs, plant_day, harvest_day,
-                                                                         yield_val, hist_lta_recs, met_fnames)
-            ncompleted += 1
-
-        # finished this band - report progress
-        # ====================================
-        mess = 'Processed band {} of {} bands for lat: {}\t'.format(nband, nbands, lat)
-        mess += 'N growing locations: {}'.format(ngrow_this_band)
-        form.lgr.info(mess)
-        # print(mess)
-        if ncompleted >= max_cells:
-            print('\nFinishing run after {} cells completed'.format(ncompleted))
-            break
+    journal.close()
+    ngrowing, nno_grow = counters['ngrowing'], counters['nno_grow']
 
     # close NC files
     # ==============
@@ -288,9 +285,13 @@ def generate_banded_sims(form, region, crop_name):
     if len(hwsd.bad_muglobals) > 0:
         print('Bad mu globals: {}'.format(hwsd.bad_muglobals))
 
+    if n_workers == 1:
+        print(soil_recs_cache.stats_mess())
+
     ntotal_str = format_string('%d', ntotal_grow, grouping=True)
     print('Completed Region: {}\tCrop: {}\tLocations - growing: {}\tno grow: {}\ttotal: {}\t {}%\n'
                     .format(region,  crop_name, ngrowing, nno_grow, ntotal_str, round(100*(ngrowing/ntotal_grow),2)))
+    report_progress('region_done', region=region, crop=crop_name, ntotal_grow=ntotal_grow, **counters)
 
     # run further steps if requested
     # =============================
@@ -298,4 +299,298 @@ def generate_banded_sims(form, region, crop_name):
         run_ecosse_wrapper(form)
         print('\n')
 
+    return True
+
+def _generate_band(form, climgen, hwsd, soil_defn, proj_data_defns, band_parms, lat_indx, counters, last_time=None,
+                                                                        journal=None, writer=None, cell_quota=None):
+    """
+    generate simulation files for each cell in this latitude band, East to West, updating the counters
+    returns False as the last value if the band was cut short by the maximum number of cells
+    progress is reported only when last_time is supplied i.e. not by worker processes
+    worker processes supply cell_quota, a count of cells shared by all workers, against which max_cells is checked
+    cells recorded in the journal by an interrupted run are counted as completed and skipped
+    if a writer is supplied then files are written by its threads and any write errors are raised at the end of the band
+    when simulations are archived the band is written to a single shard and cells are not journaled since these
+    are only recoverable once the shard is complete - an interrupted band is then regenerated in full
+    """
+    mask_defn, yield_defn, dates_defn, fert_defns = proj_data_defns
+    yld_varname = yield_defn.var_name
+    wthr_prj_dir = band_parms['wthr_prj_dir']
+    resol_d2 = band_parms['resol_d2']
+    max_cells = band_parms['max_cells']
+    glbl_n_flag = band_parms['glbl_n_flag']
+
+    lat = mask_defn.lats[lat_indx]
+    ngrow_this_band = 0
+    area = None
+
+    if form.setup['sims_archive_flag']:
+        shard = SimsShard(form.setup['sims_dir'], climgen.region_study, lat_indx)
+        journal = None
+    else:
+        shard = None
+
+    # cells of this band which are absent from the work plan do not grow the crop - these are counted as no grow
+    # without a weather check so nskipped comprises growing cells only, whereas before the work plan any cell lacking
+    # weather was counted as skipped and only non growing cells with weather as no grow
+    # growing cells which lack yields or sowing/harvest dates are dropped by the plan and counted as skipped
+    # ================================================================================================================
+    lon_indices = band_parms['band_cells'].get(lat_indx, [])
+    nunavail = band_parms['band_nunavail'].get(lat_indx, 0)
+    counters['nskipped'] += nunavail
+    counters['nno_grow'] += band_parms['lon_ur_indx'] - band_parms['lon_ll_indx'] + 1 - len(lon_indices) - nunavail
+
+    # read HWSD grid once for the band - mu_global counts for each cell are then taken from the band
+    # ===============================================================================================
+    hwsd_band = HwsdBand(hwsd, lat, [mask_defn.lons[lon_indx] for lon_indx in lon_indices], 2*resol_d2)
+
+    band_done_flag = True
+    quota_ncmpltd = None    # value of ncompleted when a cell was last claimed from the shared quota
+    for lon_indx in lon_indices:
+        lon = mask_defn.lons[lon_indx]
+
+        if last_time is not None:
+            last_time = update_progress(last_time, counters['ncompleted'], counters['nskipped'],
+                                band_parms['ntotal_grow'], counters['ngrowing'], counters['nno_grow'], hwsd)
+        if cell_quota is None:
+            if counters['ncompleted'] >= max_cells:
+                band_done_flag = False
+                break
+        else:
+            _release_cell_claim(cell_quota, quota_ncmpltd, counters)
+            if not _claim_cell(cell_quota, max_cells):
+                quota_ncmpltd = None
+                band_done_flag = False
+                break
+            quota_ncmpltd = counters['ncompleted']
+
+        if journal is not None and journal.is_cell_done(lat_indx, lon_indx):
+            counters['ngrowing'] += 1
+            counters['ncompleted'] += 1
+            ngrow_this_band += 1
+            continue
+
+        # check weather
+        # =============
+        integrity_flag, hist_lta_recs, met_fnames = fetch_hist_lta_from_lat_lon(wthr_prj_dir, climgen, lat, lon)
+        if integrity_flag:
+            if hist_lta_recs is None or met_fnames is None:     # weather site is an empty folder
+                counters['nskipped'] += 1
+                counters['no_wthr'] += 1
+                continue
+        else:
+            counters['nskipped'] += 1
+            continue
+
+        counters['ngrowing'] += 1
+        ngrow_this_band += 1
+
+        form.setup['bbox'] = list([lon - resol_d2, lat - resol_d2, lon + resol_d2, lat + resol_d2])
+        if area is None:
+            area = calculate_area(form.setup['bbox'])
+
+        # retrieve soil detail for this cell
+        # ==================================
+        mu_global_pairs = hwsd_band.get_mu_globals_dict(form.lgr, hwsd, form.setup['bbox'])  # mu_globals and number of occurrences
+        if mu_global_pairs is None:
+            counters['nskipped'] += 1
+            continue
+
+        cell_hwsd_df = Cell_hwsd_data_frame(form.lgr, hwsd)  # create data frame for cell
+        soil_recs = soil_recs_cache.get_soil_recs(hwsd, mu_global_pairs)   # create soil records - updates bad_muglobals
+        if soil_recs is None:
+            counters['nskipped'] += 1
+            continue
+
+        soil_defn.populate(lat, lon, area, cell_hwsd_df, mu_global_pairs, soil_recs)
+
+        # yield has same resolution as mask
+        # =================================
+        val = yield_defn.fetch_aoi_val(yld_varname, lat_indx, lon_indx)
+        yield_val = round(float(val.item()), 2)
+
+        lat_date_indx, lon_date_indx, ret_code = dates_defn.get_nc_coords(lat, lon)
+        if ret_code == 'OK':
+            day = dates_defn.fetch_aoi_val('harvest', lat_date_indx, lon_date_indx)
+            harvest_day = int(day.item())
+            day = dates_defn.fetch_aoi_val('plant', lat_date_indx, lon_date_indx)
+            plant_day = int(day.item())
+            fert_recs = make_fert_recs(form.lgr, fert_defns, lat, lon, band_parms['sim_strt_year'],
+                                       band_parms['sim_end_year'], band_parms['year_from'], band_parms['peren_flag'],
+                                                                                    form.glbl_n_inpts, glbl_n_flag)
+            if fert_recs is None:
+                counters['warning_count'] += 1
+                continue
+        else:
+            form.lgr.info(ret_code)
+            counters['warning_count'] += 1
+            continue
+
+        # simplify if requested
+        # =====================
+        ret_code = soil_defn.simplify_soil_defn(band_parms['use_dom_soil_flag'], band_parms['use_high_cover_flag'],
+                                                                                                hwsd.bad_muglobals)
+        if ret_code is None:
+            counters['warning_count'] += 1
+            continue
+
+        extract_wthr_cell(wthr_prj_dir, climgen, lat, lon)     # only required when weather is held in a store
+        site_obj = MakeSiteFiles(band_parms['run_settings'], climgen)
+        if writer is None:
+            make_ecosse_files(site_obj, climgen, soil_defn, fert_recs, plant_day, harvest_day,
+                                                            yield_val, hist_lta_recs, met_fnames, shard=shard)
+            if journal is not None:
+                journal.record_cell(lat_indx, lon_indx)
+        else:
+            # cell is journaled by the writer thread once its files have been written
+            # ========================================================================
+            jobs = make_ecosse_files(site_obj, climgen, soil_defn, fert_recs, plant_day, harvest_day,
+                                                yield_val, hist_lta_recs, met_fnames, defer_flag=True, shard=shard)
+            if journal is not None:
+                jobs.append((journal.record_cell, (lat_indx, lon_indx)))
+            writer.submit(jobs)
+        counters['ncompleted'] += 1
+
+    if cell_quota is not None:
+        _release_cell_claim(cell_quota, quota_ncmpltd, counters)
+
+    if writer is not None:
+        writer.end_band()
+
+    if shard is not None:
+        shard.close()
+
+    return ngrow_this_band, last_time, band_done_flag
+
+def _claim_cell(cell_quota, max_cells):
+    """
+    reserve one of the max_cells shared by all workers - returns False if none remain
+    """
+    with cell_quota.get_lock():
+        if cell_quota.value >= max_cells:
+            return False
+        cell_quota.value += 1
+
+    return True
+
+def _release_cell_claim(cell_quota, quota_ncmpltd, counters):
+    """
+    return the cell last claimed to the shared quota if it was skipped rather than completed
+    """
+    if quota_ncmpltd is not None and counters['ncompleted'] == quota_ncmpltd:
+        with cell_quota.get_lock():
+            cell_quota.value -= 1
+
     return
+
+def _generate_bands_in_pool(form, climgen, hwsd, proj_data_defns, band_parms, lat_indices, counters, n_workers,
+                                                                                                        journal):
+    """
+    spread latitude bands across a pool of worker processes, each of which opens its own HWSD and netCDF handles
+    counters from each band are accumulated as bands complete - completed bands are journaled by the main process
+    the maximum number of cells is enforced across all workers by a shared count of completed cells
+    NB  each worker keeps its own list of bad mu globals so soils may be retried which a serial run would skip
+    """
+    nbands = len(lat_indices)
+    max_cells = band_parms['max_cells']
+    band_grow_counts = band_parms['band_grow_counts']
+    mask_defn = proj_data_defns[0]
+    wrkr_defns = detach_proj_NC_sets(*proj_data_defns)
+
+    last_time = time()
+    strt_time = last_time
+    ngrow_done, ngrow_remain = 0, band_parms['ntotal_grow']
+    pending_indices = []
+    for lat_indx in lat_indices:
+        if lat_indx in journal.bands_done:
+            for key in counters:
+                counters[key] += journal.bands_done[lat_indx][key]
+            ngrow_remain -= band_grow_counts.get(lat_indx, 0)
+            nbands -= 1
+        else:
+            pending_indices.append(lat_indx)
+
+    cell_quota = Value('l', counters['ncompleted'])
+    executor = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_band_worker,
+                            initargs=(FormSnapshot(form), climgen, wrkr_defns, band_parms, journal, cell_quota))
+    try:
+        futures = {}
+        for lat_indx in pending_indices:
+            futures[executor.submit(_run_band, lat_indx)] = lat_indx
+
+        nbands_done = 0
+        for future in as_completed(futures):
+            lat_indx = futures[future]
+            band_counters, ngrow_this_band, band_done_flag, bad_muglobals = future.result()
+            for key in counters:
+                counters[key] += band_counters[key]
+
+            if band_done_flag:
+                journal.record_band(lat_indx, band_counters)
+
+            for mu_global in bad_muglobals:
+                if mu_global not in hwsd.bad_muglobals:
+                    hwsd.bad_muglobals.append(mu_global)
+
+            # finished this band - report progress
+            # ====================================
+            ngrow_done += band_grow_counts.get(lat_indx, 0)
+            ngrow_remain -= band_grow_counts.get(lat_indx, 0)
+            mess = 'Processed band {} of {} bands for lat: {}\t'.format(nbands_done, nbands, mask_defn.lats[lat_indx])
+            mess += 'N growing locations: {}\t'.format(ngrow_this_band)
+            mess += band_eta_mess(strt_time, ngrow_done, ngrow_remain)
+            form.lgr.info(mess)
+            report_progress('band', lat=float(mask_defn.lats[lat_indx]), nband=nbands_done, nbands=nbands,
+                        ngrow_this_band=ngrow_this_band, ngrow_done=ngrow_done, ngrow_remain=ngrow_remain, **counters)
+            nbands_done += 1
+
+            last_time = update_progress(last_time, counters['ncompleted'], counters['nskipped'],
+                                        band_parms['ntotal_grow'], counters['ngrowing'], counters['nno_grow'], hwsd)
+            if counters['ncompleted'] >= max_cells:
+                print('\nFinishing run after {} cells completed'.format(counters['ncompleted']))
+                for pending in futures:
+                    pending.cancel()
+                break
+
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return
+
+# state of each worker process, assigned by _init_band_worker
+# ===========================================================
+_band_wrkr = {}
+
+def _init_band_worker(form_snpsht, climgen, proj_data_defns, band_parms, journal, cell_quota):
+    """
+    each worker process requires its own HWSD_bil object, netCDF handles and fertiliser cubes
+    """
+    open_proj_NC_sets(*proj_data_defns)
+    form_snpsht.reopen_nc_dsets()
+    preload_fert_cubes(proj_data_defns[3], proj_data_defns[0], *band_parms['aoi_indices'])
+
+    _band_wrkr['form'] = form_snpsht
+    _band_wrkr['climgen'] = climgen
+    _band_wrkr['hwsd'] = HWSD_bil(form_snpsht.lgr, form_snpsht.setup['hwsd_dir'])
+    _band_wrkr['soil_defn'] = HWSD_soil_defn(form_snpsht.lgr)
+    _band_wrkr['proj_data_defns'] = proj_data_defns
+    _band_wrkr['band_parms'] = band_parms
+    _band_wrkr['journal'] = journal     # read-only copy
+    _band_wrkr['cell_quota'] = cell_quota
+    if form_snpsht.setup['n_writer_threads'] > 0:
+        _band_wrkr['writer'] = AsyncWriter(form_snpsht.setup['n_writer_threads'])
+    else:
+        _band_wrkr['writer'] = None
+
+def _run_band(lat_indx):
+    """
+    process a single latitude band within a worker and return counters for accumulation by the main process
+    """
+    counters = {'ncompleted': 0, 'nskipped': 0, 'warning_count': 0, 'no_wthr': 0, 'ngrowing': 0, 'nno_grow': 0}
+    hwsd = _band_wrkr['hwsd']
+    ngrow_this_band, dummy, band_done_flag = _generate_band(_band_wrkr['form'], _band_wrkr['climgen'], hwsd,
+                _band_wrkr['soil_defn'], _band_wrkr['proj_data_defns'], _band_wrkr['band_parms'], lat_indx, counters,
+                                        None, _band_wrkr['journal'], _band_wrkr['writer'], _band_wrkr['cell_quota'])
+
+    return counters, ngrow_this_band, band_done_flag, list(hwsd.bad_muglobals)
+
@@ -15,19 +15,18 @@ __author__ = 's03mm5'
 
 from os.path import exists, join, split
 from json import load as json_load
-from sys import stdout
+from sys import stdout, modules
 from time import time
-from netCDF4 import Dataset
 from datetime import timedelta, date
-from pandas import DataFrame, Series
 from glob import glob
 from copy import copy
 from numpy.ma.core import MaskedConstant, MaskError
-from numpy import int32
+from numpy import array, float64, full, int32, int64, isin, ma, ndarray, unique
 from locale import LC_ALL, setlocale, format_string
-from PyQt5.QtWidgets import QApplication
+from json import dumps as json_dumps
 
 from make_site_spec_files_classes import FertiliserApplication
+from bbox_index_class import BboxGridIndex
 
 GRANULARITY = 120
 WARNING_STR = '*** Warning *** '
@@ -167,79 +166,87 @@ def check_cultiv_json_fname(form):
 
     return mess
 
-def Cell_hwsd_data_frame(lggr, hwsd):
+def Cell_hwsd_data_frame(lggr, hwsd, counts_only=False):
     """
     set values within the HWSD grid to zero if they fall outside the shapefile polygon
     Argument description:
        hwsd:   HWSD object comprising a grid of mu_globals
+       counts_only: if True then return dictionary of mu_globals and their number of occurrences instead of data frame
+    NB  bad mu_globals are zeroed in place in the HWSD grid
     """
     func_name =  __prog__ + '  dump_AOI'
 
     total_number_cells = hwsd.nlats*hwsd.nlons
-    data_frame = DataFrame()
-
     lggr.info('Function: {}\ttotal number of cells: {}'.format(func_name, total_number_cells))
 
-    # now take each soil coord (integers)
-    # move north to south and west to east (decreasing latitude and increasing longitude)
-    # build list of mu_globals with their coordinates (granular and lat lon)
-    num_zeros_before = 0    # from HWSD
-    num_zeros_added = 0     # counter for points outside of main boundary
-    num_points_ok = 0   # points inside
-    num_boundary_bad = 0   # boundary violations
-
-    gran_lats = []
-    gran_lons = []
-    mu_globals = []
-    latitudes = []
-    longitudes = []
-    land_uses = []
-    for iyhws, irow in enumerate(range(hwsd.nrow1, hwsd.nrow2 + 1)):
-
-        for ixhws, icol in enumerate(range(hwsd.ncol1, hwsd.ncol2 + 1)):
-
-            # skip if mu_global is 0 (usually sea)
-            # ====================================
-            mu_global = hwsd.rows[iyhws][ixhws]
-            if mu_global == 0:
-                num_zeros_before += 1
-            elif mu_global in hwsd.bad_muglobals:
-                hwsd.rows[iyhws][ixhws] = 0
-                num_zeros_added += 1
-            else:
-                latitude = 90.0 - irow/hwsd.granularity
-                longitude = icol/hwsd.granularity - 180.0
-
-                # build lists - TODO
-                # ==================
-                gran_lats.append(irow)
-                gran_lons.append(icol)
-                mu_globals.append(mu_global)
-                latitudes.append(latitude)
-                longitudes.append(longitude)
-                land_uses.append(-999)
-                num_points_ok += 1
-
-    # create data frame
-    # =================
-    data_frame['gran_lat']  = Series(gran_lats)
-    data_frame['gran_lon']  = Series(gran_lons)
-    data_frame['mu_global'] = Series(mu_globals)
-    data_frame['latitude']  = Series(latitudes)
-    data_frame['longitude'] = Series(longitudes)
-    data_frame['land_use']  = Series(land_uses)
+    # work on the HWSD grid as an array so that bad mu_globals can be zeroed in place
+    # ================================================================================
+    if not isinstance(hwsd.rows, ndarray):
+        hwsd.rows = array(hwsd.rows)
+    rows = hwsd.rows[:hwsd.nrow2 - hwsd.nrow1 + 1, :hwsd.ncol2 - hwsd.ncol1 + 1]
+
+    # skip if mu_global is 0 (usually sea)
+    # ====================================
+    zero_mask = rows == 0
+    bad_mask = isin(rows, hwsd.bad_muglobals) & ~zero_mask
+    rows[bad_mask] = 0
+    ok_mask = ~(zero_mask | bad_mask)
+
+    num_zeros_before = int(zero_mask.sum())    # from HWSD
+    num_zeros_added = int(bad_mask.sum())      # counter for points outside of main boundary
+    num_points_ok = int(ok_mask.sum())         # points inside
+
+    if counts_only:
+        mu_globals, counts = unique(rows[ok_mask], return_counts=True)
+        return {int(mu_global): int(count) for mu_global, count in zip(mu_globals, counts)}
+
+    # take each soil coord (integers) moving north to south and west to east (decreasing latitude and increasing
+    # longitude) - build columns of mu_globals with their coordinates (granular and lat lon)
+    # ==========================================================================================================
+    iyhws, ixhws = ok_mask.nonzero()
+    gran_lats = iyhws + hwsd.nrow1
+    gran_lons = ixhws + hwsd.ncol1
+
+    from pandas import DataFrame, Series     # deferred so that start up does not load pandas
+
+    data_frame = DataFrame()
+    data_frame['gran_lat']  = Series(gran_lats, dtype=int64)
+    data_frame['gran_lon']  = Series(gran_lons, dtype=int64)
+    data_frame['mu_global'] = Series(rows[ok_mask], dtype=int64)
+    data_frame['latitude']  = Series(90.0 - gran_lats/hwsd.granularity, dtype=float64)
+    data_frame['longitude'] = Series(gran_lons/hwsd.granularity - 180.0, dtype=float64)
+    data_frame['land_use']  = Series(full(num_points_ok, -999), dtype=int64)
 
     return data_frame
 
-def _bbox_locate(cntry_bboxes, lat, lon):
+def make_bbox_indices(n_inpts_obj):
     """
-    locate lat lon from dictionary of countries or provinces and their respective bounding boxes
+    grid bucket indices of country bounding boxes and of province bounding boxes for each major state
+    built once and attached to the N inputs object
     """
-    cntry_list = []
-    for cntry in cntry_bboxes:
-        iso, lon_ll, lat_ll, lon_ur, lat_ur = cntry_bboxes[cntry][:5]
-        if (lat >= lat_ll and lat <= lat_ur) and (lon >= lon_ll and lon <= lon_ur):
-            cntry_list.append(cntry)
+    if getattr(n_inpts_obj, 'cntry_index', None) is None:
+        cntry_bboxes = n_inpts_obj.cntry_bboxes
+        n_inpts_obj.cntry_index = BboxGridIndex({cntry: cntry_bboxes[cntry][1:5] for cntry in cntry_bboxes})
+
+        prvnc_bboxes = n_inpts_obj.prvnc_bboxes
+        n_inpts_obj.prvnc_indices = {cntry: BboxGridIndex({prvnce: prvnc_bboxes[cntry][prvnce][:4]
+                                                    for prvnce in prvnc_bboxes[cntry]}) for cntry in prvnc_bboxes}
+
+    return n_inpts_obj.cntry_index, n_inpts_obj.prvnc_indices
+
+def _bbox_locate(cntry_bboxes, lat, lon, cntry_index=None):
+    """
+    locate lat lon from dictionary of countries or provinces and their respective bounding boxes
+    cntry_index: optional grid bucket index of the same bounding boxes
+    """
+    if cntry_index is None:
+        cntry_list = []
+        for cntry in cntry_bboxes:
+            iso, lon_ll, lat_ll, lon_ur, lat_ur = cntry_bboxes[cntry][:5]
+            if (lat >= lat_ll and lat <= lat_ur) and (lon >= lon_ll and lon <= lon_ur):
+                cntry_list.append(cntry)
+    else:
+        cntry_list = cntry_index.locate(lat, lon)
 
     ncntrys = len(cntry_list)
     if ncntrys == 0:
@@ -253,32 +260,50 @@ def _bbox_locate(cntry_bboxes, lat, lon):
 
     return cntry_list[0]
 
-def _major_states_lookup(lggr, glbl_n_inpts, prvnc_bboxes, cntry, lat, lon):
+def _major_states_lookup(lggr, prvnc_amnts, prvnc_index, cntry, lat, lon):
     """
-    locate province using lat/lon bounding boxes
+    locate province using grid bucket index of lat/lon bounding boxes
+    prvnc_amnts: mean N application for each province of this country
     """
     glbl_amt = None
     mess = 'Major country: ' + cntry + '\tLat/lon: {} {}'.format(lat, lon)
     found_flag = False
 
-    for prvnce in prvnc_bboxes[cntry]:
-        lon_ll, lat_ll, lon_ur, lat_ur, area = prvnc_bboxes[cntry][prvnce]
-        if (lat >= lat_ll and lat <= lat_ur) and (lon >= lon_ll and lon <= lon_ur):
+    for prvnce in prvnc_index.locate(lat, lon):
 
-            # identify province
-            # =================
-            mess += '\tcould not locate province: ' + prvnce + ' in lookup table'
-            for rec_prvnc in glbl_n_inpts[cntry]:
-                if prvnce == rec_prvnc[0]:
-                    glbl_amt = rec_prvnc[2]
-                    found_flag = True
-                    break
-
-        if found_flag:
+        # identify province
+        # =================
+        mess += '\tcould not locate province: ' + prvnce + ' in lookup table'
+        if prvnce in prvnc_amnts:
+            glbl_amt = prvnc_amnts[prvnce]
+            found_flag = True
             break
 
     return glbl_amt, found_flag, mess
 
+def _glbl_n_lookups(n_inpts_obj):
+    """
+    dictionaries of World records keyed by country and of mean N application keyed by province for each major state
+    built on first use and attached to the N inputs object - the first of any duplicate records is retained
+    """
+    if getattr(n_inpts_obj, 'world_recs', None) is None:
+        glbl_n_inpts = n_inpts_obj.glbl_n_inpts
+        world_recs = {}
+        for rec in glbl_n_inpts['World']:
+            world_recs.setdefault(rec[0], rec)
+
+        prvnc_amnts = {}
+        for cntry in n_inpts_obj.major_states:
+            prvnc_amnts[cntry] = {}
+            if cntry in glbl_n_inpts:
+                for rec_prvnc in glbl_n_inpts[cntry]:
+                    prvnc_amnts[cntry].setdefault(rec_prvnc[0], rec_prvnc[2])
+
+        n_inpts_obj.world_recs = world_recs
+        n_inpts_obj.prvnc_amnts = prvnc_amnts
+
+    return n_inpts_obj.world_recs, n_inpts_obj.prvnc_amnts
+
 def _fetch_glbl_amnt(lggr, n_inpts_obj, glbl_n_flag, lat, lon):
     """
     n_inpts_obj - object consisting of all components of global N application
@@ -298,7 +323,8 @@ def _fetch_glbl_amnt(lggr, n_inpts_obj, glbl_n_flag, lat, lon):
 
         # locate country using bounding boxes
         # ===================================
-        cntry = _bbox_locate(n_inpts_obj.cntry_bboxes, lat, lon)
+        cntry_index, prvnc_indices = make_bbox_indices(n_inpts_obj)
+        cntry = _bbox_locate(n_inpts_obj.cntry_bboxes, lat, lon, cntry_index)
     else:
         try:
             cntry = n_inpts_obj.cntry_dict[cntry_indx]
@@ -306,24 +332,22 @@ def _fetch_glbl_amnt(lggr, n_inpts_obj, glbl_n_flag, lat, lon):
             print('\n' + WARNING_STR + 'No country found for lat/long: {} {} {}'.format(lat, lon, str(err)))
             return glbl_amt
 
-    glbl_n_inpts = n_inpts_obj.glbl_n_inpts
+    world_recs, prvnc_amnts = _glbl_n_lookups(n_inpts_obj)
     major_states = n_inpts_obj.major_states
-    prvnc_bboxes = n_inpts_obj.prvnc_bboxes
+    cntry_index, prvnc_indices = make_bbox_indices(n_inpts_obj)
 
     # set defaults in case of failure
     # ===============================
     found_flag = False
     mess = 'Country ' + cntry + ' in soils NC file not found in Excel World sheet'
 
-    for rec in glbl_n_inpts['World']:
-        if cntry == rec[0]:
-            if cntry in major_states:
-                glbl_amt, found_flag, mess = _major_states_lookup(lggr, glbl_n_inpts, prvnc_bboxes, cntry, lat, lon)
-                break
-            else:
-                glbl_amt = rec[2]   # mean N Application
-                found_flag = True
-                break
+    if cntry in world_recs:
+        if cntry in major_states:
+            glbl_amt, found_flag, mess = _major_states_lookup(lggr, prvnc_amnts[cntry], prvnc_indices[cntry], cntry,
+                                                                                                            lat, lon)
+        else:
+            glbl_amt = world_recs[cntry][2]   # mean N Application
+            found_flag = True
 
     if not found_flag:
         lggr.info(mess)
@@ -349,6 +373,8 @@ def make_fert_recs(lggr, fert_defns, lat, lon, sim_strt_year, sim_end_year, year
     NO3_input_ver1	    NO3_input	                600	months kg-N ha-1	0.0 to 9.5 mean 0.043
     Ninput_date_ver1	N_input_date	            12	        day of year		# Timesteps to fertiliser application
     TN_input_1961_2010	Annual N fertilizer rates	50 years	Amount of fertiliser applied [kg-N ha-1]
+
+    NB  time series are served from AOI cubes if these have been preloaded - see preload_fert_cubes
     """
     func_name =  __prog__ + ' make_fert_recs'
     mess = ERROR_STR + 'in ' + func_name
@@ -363,7 +389,7 @@ def make_fert_recs(lggr, fert_defns, lat, lon, sim_strt_year, sim_end_year, year
     # ===================================================
     metric = 'TN_input_1961_2010'
     var_name = fert_defns[metric].var_names[0]
-    amounts = fert_defns[metric].nc_dset.variables[var_name][:, lat_indx, lon_indx]
+    amounts = fert_defns[metric].fetch_aoi_series(var_name, lat_indx, lon_indx)
     if type(amounts[0]) is MaskedConstant:
         mess += ' fertiliser amount has type of MaskedConstant, should be float32'
         lggr.info(mess + ' Lat: {} {}\tLon: {} {}'.format(lat, lat_indx, lon, lon_indx))
@@ -373,7 +399,7 @@ def make_fert_recs(lggr, fert_defns, lat, lon, sim_strt_year, sim_end_year, year
     # =========================================================================
     metric = 'Ninput_date_ver1'
     var_name = fert_defns[metric].var_names[0]
-    days_of_year = fert_defns[metric].nc_dset.variables[var_name][:, lat_indx, lon_indx]
+    days_of_year = fert_defns[metric].fetch_aoi_series(var_name, lat_indx, lon_indx)
 
     doy_flag = False
     for doy in days_of_year:
@@ -393,7 +419,7 @@ def make_fert_recs(lggr, fert_defns, lat, lon, sim_strt_year, sim_end_year, year
     var_name = fert_defns[metric].var_names[0]  # only one variable for this dataset
     fert_strt_year = fert_defns[metric].start_year
     fert_end_year  = fert_defns[metric].end_year
-    nh4_fractions  = fert_defns[metric].nc_dset.variables[var_name][:, lat_indx, lon_indx]
+    nh4_fractions  = fert_defns[metric].fetch_aoi_series(var_name, lat_indx, lon_indx)
 
     # generate fertilizer applications for fertilizer years
     # =====================================================
@@ -419,6 +445,8 @@ def make_fert_recs(lggr, fert_defns, lat, lon, sim_strt_year, sim_end_year, year
     sim_fert_objs = []
     mnths_sim = 0
     fert_year_indx = 0
+    glbl_fert_amnt = None
+    glbl_amnt_fetched = False
     for iyr, year in enumerate(range(sim_strt_year, sim_end_year + 1)):
 
         app_moy = None
@@ -428,9 +456,11 @@ def make_fert_recs(lggr, fert_defns, lat, lon, sim_strt_year, sim_end_year, year
                 app_moy = 3     # simulate perennial grassland or pasture
 
             if glbl_n_flag:
-                # retrieve global estimated fertiliser amount
-                # ===========================================
-                glbl_fert_amnt = _fetch_glbl_amnt(lggr, glbl_n_inpts, glbl_n_flag, lat, lon)
+                # retrieve global estimated fertiliser amount - same for every year so only fetched once per cell
+                # ================================================================================================
+                if not glbl_amnt_fetched:
+                    glbl_fert_amnt = _fetch_glbl_amnt(lggr, glbl_n_inpts, glbl_n_flag, lat, lon)
+                    glbl_amnt_fetched = True
                 fert_amnt = glbl_fert_amnt
 
         if year < fert_strt_year:
@@ -460,7 +490,9 @@ def make_fert_recs(lggr, fert_defns, lat, lon, sim_strt_year, sim_end_year, year
 
 def check_run_mask(mask_defn, lon_ll_indx, lat_ll_indx, lon_ur_indx, lat_ur_indx):
     """
-
+    use row sums of the crop mask for the AOI to find the start band and number of growing cells
+    returns adjusted lat_ur_indx, total growing cells and dictionary of growing cells keyed by latitude index
+    NB  mask set must be open - the mask is taken from the AOI slab if this has been read, see preload_proj_NC_slabs
     """
     setlocale(LC_ALL, '')
 
@@ -469,29 +501,18 @@ def check_run_mask(mask_defn, lon_ll_indx, lat_ll_indx, lon_ur_indx, lat_ur_indx
     lon_indx_min = lon_ll_indx
     lon_indx_max = lon_ur_indx + 1
 
-    nc_dset = Dataset(mask_defn.nc_fname, mode='r')
+    run_mask = mask_defn.fetch_aoi_array('cropmask', lat_ll_indx, lat_ur_indx, lon_ll_indx, lon_ur_indx)
 
-    # run_mask = nc_dset.variables['cropmask'][lat_indx_min:lat_indx_max, lon_indx_min:lon_indx_max]
+    row_sums = (ma.filled(run_mask, 0) != 0).sum(axis=1)
+    band_grow_counts = {lat_indx_min + irow: int(ncells) for irow, ncells in enumerate(row_sums) if ncells > 0}
 
     # adjust lat_ur_indx so that main loop starts at beginning of crop area
     # =====================================================================
-    for lat_indx in range(lat_ur_indx, lat_ll_indx + 1, -1):
-        arr = nc_dset.variables['cropmask'][lat_indx, lon_ll_indx:lon_ur_indx]
-        num_non_zeros = len(arr.nonzero()[0])
-        if num_non_zeros > 0:
-            lat_ur_indx = lat_indx
-            break
+    if len(band_grow_counts) > 0:
+        lat_ur_indx = max(band_grow_counts)
 
-    # sum total number of active cells
-    # ================================
-    ngrow_cells = 0
-    for lat_indx in range(lat_ur_indx, lat_ll_indx + 1, -1):
-        arr = nc_dset.variables['cropmask'][lat_indx, lon_ll_indx:lon_ur_indx]
-        num_non_zeros = len(arr.nonzero()[0])
-        ngrow_cells += num_non_zeros
-
-    start_lat = nc_dset.variables['lat'][lat_ur_indx]
-    nc_dset.close()
+    ngrow_cells = int(row_sums.sum())
+    start_lat = mask_defn.lats[lat_ur_indx]
 
     ntotal = (lon_indx_max - lon_indx_min)*(lat_indx_max - lat_indx_min)
 
@@ -501,12 +522,14 @@ def check_run_mask(mask_defn, lon_ll_indx, lat_ll_indx, lon_ur_indx, lat_ur_indx
     mess += '\t\tN cells for crop growing: ' + ngrow_cells_str + '\tfrom total of ' + ntotal_str + ' cells (includes sea)'
     print(mess)
 
-    return lat_ur_indx, ngrow_cells
+    return lat_ur_indx, ngrow_cells, band_grow_counts
 
 def generate_cells(form):
     """
 
     """
+    from netCDF4 import Dataset
+
     func_name =  __prog__ + ' generate_cells'
 
     project_path = form.setup['proj_loc']
@@ -521,6 +544,36 @@ def generate_cells(form):
 
     return
 
+# progress is written either as text for the console or, for headless runs, as one JSON record per line
+# =====================================================================================================
+_progress = {'json_flag': False, 'fobj': stdout}
+
+def set_progress_json(json_flag, fobj=None):
+    """
+    fobj: file to which JSON records are written, by default stdout
+    """
+    _progress['json_flag'] = json_flag
+    _progress['fobj'] = stdout if fobj is None else fobj
+
+def report_progress(event, mess=None, **values):
+    """
+    write progress message or, if JSON progress is requested, a record comprising the event, time and values
+    """
+    if _progress['json_flag']:
+        rec = dict({'event': event, 'time': round(time(), 1)}, **values)
+        _progress['fobj'].write(json_dumps(rec, default=str) + '\n')
+        _progress['fobj'].flush()
+    elif mess is not None:
+        stdout.flush()
+        stdout.write(mess)
+
+def process_events():
+    """
+    let the GUI respond during long runs - does nothing for headless runs where PyQt5 has not been imported
+    """
+    if 'PyQt5.QtWidgets' in modules:
+        modules['PyQt5.QtWidgets'].QApplication.processEvents()
+
 def update_progress(last_time, ncompleted, nskipped, ntotal_grow, ngrowing, nno_grow, hwsd = None):
     """
     Update progress bar
@@ -536,12 +589,23 @@ def update_progress(last_time, ncompleted, nskipped, ntotal_grow, ngrowing, nno_
             bad_muglobals = hwsd.bad_muglobals
         mess += ' Skipped: {:=5d} Bad mu globals: {:=5d}'.format(nskipped, len(bad_muglobals))
         mess += ' Remaining: {:=6d}'.format(ntotal_grow - ncompleted)
-        stdout.flush()
-        stdout.write(mess)
+        report_progress('cells', mess, ncompleted=ncompleted, ngrowing=ngrowing, nno_grow=nno_grow,
+                    nskipped=nskipped, nbad_muglobals=len(bad_muglobals), nremaining=ntotal_grow - ncompleted)
         last_time = new_time
 
     return last_time
 
+def band_eta_mess(strt_time, ngrow_done, ngrow_remain):
+    """
+    estimate of time remaining based on the rate at which growing cells of completed bands have been processed
+    """
+    if ngrow_done == 0:
+        return 'ETA: unknown'
+
+    secs_remain = int(ngrow_remain*(time() - strt_time)/ngrow_done)
+
+    return 'ETA: {}\tremaining growing cells: {}'.format(timedelta(seconds=secs_remain), ngrow_remain)
+
 def update_soc_rothc_progress(last_time, nmasked, ncompleted, nskipped, icount):
     """
     Update progress bar
@@ -565,7 +629,7 @@ def update_wthr_rothc_progress(last_time, noutbnds, nnodata, ncmpltd, nskipped,
     new_time = time()
     cancel_flag = False
     if new_time - last_time > 5:
-        QApplication.processEvents()
+        process_events()
         if w_abandon.isChecked():
             cancel_flag = True
 
@@ -588,8 +652,8 @@ def update_wthr_progress(last_time, ncompleted, nskipped, ntotal_grow, ngrowing,
         mess = '\rCompleted: {:=6d} Growing cells: {:=6d} No grow cells: {:=6d}'.format(ncompleted, ngrowing, nno_grow)
         mess += ' Skipped: {:=5d} Region: {:15s}'.format(nskipped, region)
         mess += ' Remaining: {:=6d}'.format(ntotal_grow - ncompleted)
-        stdout.flush()
-        stdout.write(mess)
+        report_progress('wthr_cells', mess, region=region, ncompleted=ncompleted, ngrowing=ngrowing,
+                                        nno_grow=nno_grow, nskipped=nskipped, nremaining=ntotal_grow - ncompleted)
         last_time = new_time
 
     return last_time
@@ -602,8 +666,7 @@ def update_avemet_progress(last_time, wthr_rsrce, scnr, region, nwrote):
     if new_time - last_time > 5:
         mess = '\rWrote: {:=6d} Avemet files\t'.format(nwrote)
         mess += '\twthr_rsrce: {}\tscnr:{}\tregion: {}'.format(wthr_rsrce, scnr, region)
-        stdout.flush()
-        stdout.write(mess)
+        report_progress('avemet', mess, wthr_rsrce=wthr_rsrce, scnr=scnr, region=region, nwrote=nwrote)
         last_time = new_time
 
     return last_time
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        headless_form_class.py
+# Purpose:     Qt free equivalent of the main form, initialised from the setup and study configuration files,
+#              for runs of the simulation and weather generation pipelines without a display
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'headless_form_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from initialise_funcs import initiation, read_config_file, change_config_file
+from form_helper_fns import resolutions, calculate_grid_cell, fetch_wthr_detail
+from form_snapshot_class import WidgetValue, button_group
+
+ERROR_STR = '*** Error *** '
+
+# widgets of the GUI which hold text or a check state and are not populated with items
+# ====================================================================================
+TEXT_WIDGETS = ['w_study', 'w_ur_lon', 'w_ur_lat', 'w_ll_lon', 'w_ll_lat', 'lbl03', 'w_equimode', 'w_max_cells',
+                'w_yr_from', 'w_lbl13', 'w_lbl14', 'w_lbl16', 'w_lbl17', 'lbl16a']
+CHECK_WIDGETS = ['w_all_regions', 'w_all_crops', 'w_use_dom_soil', 'w_use_high_cover', 'w_glbl_n_inpts',
+                 'w_use_peren', 'w_daily', 'w_mnthly', 'w_auto_run_ec', 'w_run_ecosse', 'w_resume', 'w_strt_1801',
+                 'w_fert', 'w_manure', 'w_crop_rota']
+
+class HeadlessForm(object):
+    """
+    widgets are replaced by WidgetValue objects which are populated and set as by the GUI, in the same order, so
+    that generate_banded_sims, all_generate_banded_sims and generate_all_weather behave as if run from the GUI
+    """
+    def __init__(self, setup_file=None, study=None):
+        """
+        study: name of study whose configuration file is read, by default the first found as for the GUI
+        """
+        self.version = 'HWSD_grid'
+        initiation(self, setup_file, gui_flag=False)
+
+        for attrib in TEXT_WIDGETS + CHECK_WIDGETS:
+            setattr(self, attrib, WidgetValue())
+
+        self.w_combo00s = WidgetValue(items=self.studies)
+        self.w_combo00a = WidgetValue(items=self.regions)
+        self.w_combo00b = WidgetValue(items=list(self.setup['crops']))
+
+        button_group(self.w_daily, self.w_mnthly)
+        self.w_mnthly.setChecked(True)
+
+        # weather resource and simulation period - see commonSection
+        # ===========================================================
+        hist_syears, hist_eyears, fut_syears, fut_eyears = fetch_wthr_detail(self)
+        self.w_combo10w = WidgetValue(items=self.wthr_gcms)
+        self.w_combo10 = WidgetValue(items=[str(scen) for scen in self.wthr_scenarios])
+        self.w_combo09s = WidgetValue(items=[str(year) for year in hist_syears])
+        self.w_combo09e = WidgetValue(items=[str(year) for year in hist_eyears])
+        self.w_combo11s = WidgetValue(items=[str(year) for year in fut_syears])
+        self.w_combo11e = WidgetValue(items=[str(year) for year in fut_eyears])
+
+        button_group(self.w_fert, self.w_manure)
+        self.w_manure.setChecked(True)
+
+        # grid coarseness
+        # ===============
+        self.w_combo16 = WidgetValue(items=[str(resolutions[resol]) for resol in sorted(resolutions, reverse=True)])
+
+        # reads and set values from last run
+        # ==================================
+        if study is None:
+            read_config_file(self)
+        else:
+            change_config_file(self, study)
+
+        self.change_region()  # populates lat/long boxes
+
+    def update(self):
+        """
+        stands in for QWidget.update
+        """
+        pass
+
+    def change_region(self, region=None):
+        """
+        select region, if supplied, and set bounding box and weather directory as for the GUI
+        """
+        if region is not None:
+            indx = self.w_combo00a.findText(region)
+            if indx == -1:
+                print(ERROR_STR + 'region {} must be one of: {}'.format(region, ', '.join(self.regions)))
+                return False
+            self.w_combo00a.setCurrentIndex(indx)
+
+        irow = self.w_combo00a.currentIndex()
+        ll_lon, ur_lon, ll_lat, ur_lat, wthr_dir = self.regions_df.iloc[irow][1:]
+        self.w_ll_lon.setText(str(ll_lon))
+        self.w_ll_lat.setText(str(ll_lat))
+        self.w_ur_lon.setText(str(ur_lon))
+        self.w_ur_lat.setText(str(ur_lat))
+        self.setup['region_wthr_dir'] = wthr_dir        # see also def set_region_study
+
+        return True
+
+    def change_crop(self, crop_name):
+        """
+        C
+        """
+        indx = self.w_combo00b.findText(crop_name)
+        if indx == -1:
+            print(ERROR_STR + 'crop {} must be one of: {}'.format(crop_name, ', '.join(self.setup['crops'])))
+            return False
+
+        self.w_combo00b.setCurrentIndex(indx)
+
+        return True
+
+    def validate_sims(self):
+        """
+        checks made by the GUI before simulation files are created - also sets study and grid resolution
+        """
+        if int(self.w_combo09s.currentText()) > int(self.w_combo09e.currentText()):
+            print('Historic end year must be greater or equal to the start year')
+            return False
+
+        if int(self.w_combo11s.currentText()) > int(self.w_combo11e.currentText()):
+            print('Simulation end year must be greater or equal to the start year')
+            return False
+
+        if self.cultiv_pattern is None:
+            print(ERROR_STR + 'No cultivation - cannot proceed')
+            return False
+
+        self.setup['study'] = self.w_combo00a.currentText().replace(' ', '_')
+        calculate_grid_cell(self)
+
+        return True
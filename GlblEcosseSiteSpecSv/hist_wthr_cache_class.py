@@ -0,0 +1,133 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        hist_wthr_cache_class.py
+# Purpose:     disk backed store of historic weather and long term averages for each cell of a region so that these
+#              are read from the historic dataset once and reused for all GCMs and scenarios
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'hist_wthr_cache_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from os import getpid, makedirs
+from os.path import isdir, join
+from glob import glob
+from io import BytesIO
+from zipfile import ZipFile, ZIP_DEFLATED, BadZipFile
+from numpy import asarray, load as np_load, savez
+
+WARNING_STR = '*** Warning *** '
+
+LTA_KEYS = ['lta_precip', 'lta_tmean']
+SHARD_PREFIX = 'hist_'
+
+class HistWthrCache(object,):
+    """
+    the cache is a directory of zip shards in which each cell is one member, named after its granule coordinate,
+    holding the arrays of that cell; members are read only when requested and new cells are appended
+    each process appends to its own shard so that concurrent processes do not write to the same file
+    cells for which the historic dataset has no data are also recorded, as members without arrays
+    """
+    def __init__(self, cache_dir):
+        """
+        C
+        """
+        self.cache_dir = cache_dir
+        self.shard_fn = join(cache_dir, SHARD_PREFIX + '{}.zip'.format(getpid()))
+        self.shards = []        # zip files opened for reading
+        self.index = {}         # key: granule coordinate, value: shard holding the cell
+        self.added = set()      # cells appended by this cache which are not yet in the index
+        self.zip_obj = None     # shard of this process opened for appending
+        self.nadded = 0
+        self._load()
+
+    def _load(self):
+        """
+        index the members of every shard - only the central directory of each shard is read
+        """
+        if not isdir(self.cache_dir):
+            return
+
+        for shard_fn in sorted(glob(join(self.cache_dir, SHARD_PREFIX + '*.zip'))):
+            try:
+                shard = ZipFile(shard_fn, 'r')
+            except (OSError, BadZipFile) as err:
+                # shard may be part way through being appended by another process
+                # ===================================================================
+                print(WARNING_STR + str(err) + ' reading historic weather cache ' + shard_fn + ' - shard ignored')
+                continue
+
+            self.shards.append(shard)
+            for gran_coord in shard.namelist():
+                self.index.setdefault(gran_coord, shard)
+
+    def fetch(self, gran_coord):
+        """
+        return None if cell is not cached, otherwise historic weather and long term average precipitation and
+        temperature; historic weather is None for cells without data
+        values are returned as lists of array elements so that their type and formatting are as originally supplied
+        """
+        if gran_coord not in self.index:
+            return None
+
+        try:
+            with np_load(BytesIO(self.index[gran_coord].read(gran_coord))) as npz_obj:
+                cell = {key: npz_obj[key] for key in npz_obj.files}
+        except (OSError, BadZipFile, KeyError, ValueError) as err:
+            print(WARNING_STR + str(err) + ' reading cell ' + gran_coord + ' from historic weather cache')
+            return None
+
+        if len(cell) == 0:
+            return None, None, None
+
+        pettmp_hist = {key: list(cell[key]) for key in cell if key not in LTA_KEYS}
+
+        return pettmp_hist, list(cell['lta_precip']), list(cell['lta_tmean'])
+
+    def add(self, gran_coord, pettmp_hist, lta_precip=None, lta_tmean=None):
+        """
+        append cell to the shard of this process - pettmp_hist is None for cells without data
+        """
+        if gran_coord in self.index or gran_coord in self.added:
+            return
+
+        cell = {}
+        if pettmp_hist is not None:
+            cell = {metric: asarray(pettmp_hist[metric]) for metric in pettmp_hist}
+            cell['lta_precip'] = asarray(lta_precip)
+            cell['lta_tmean'] = asarray(lta_tmean)
+
+        buffer = BytesIO()
+        savez(buffer, **cell)
+
+        if self.zip_obj is None:
+            if not isdir(self.cache_dir):
+                makedirs(self.cache_dir, exist_ok=True)
+            self.zip_obj = ZipFile(self.shard_fn, 'a', compression=ZIP_DEFLATED)
+
+        self.zip_obj.writestr(gran_coord, buffer.getvalue())
+        self.added.add(gran_coord)
+        self.nadded += 1
+
+    def flush(self):
+        """
+        closing the shard writes its central directory so that cells appended so far are recoverable
+        """
+        if self.zip_obj is not None:
+            self.zip_obj.close()
+            self.zip_obj = None
+        self.nadded = 0
+
+    def close(self):
+        """
+        C
+        """
+        self.flush()
+        for shard in self.shards:
+            shard.close()
+        self.shards = []
+        self.index = {}
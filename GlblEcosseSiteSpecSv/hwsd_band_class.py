@@ -0,0 +1,106 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        hwsd_band_class.py
+# Purpose:     read the HWSD grid once for a latitude band and derive mu_global counts for each cell of the band
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'hwsd_band_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from numpy import arange, array, asarray, flatnonzero, diff, int64, r_, unique, split as np_split
+
+from glbl_ecsse_low_level_fns import Cell_hwsd_data_frame
+
+MU_GLOBAL_LIMIT = 10**6     # exceeds largest mu_global, used to form combined cell and mu_global keys
+
+class HwsdBand(object,):
+    """
+    mu_global grid for the cells of a latitude band, each cell comprising a square block of HWSD granules
+    """
+    def __init__(self, hwsd, lat, lons, resol_deg):
+        """
+        lons are the centres of the cells to be visited, in ascending order
+        """
+        resol_d2 = resol_deg/2
+        granularity = hwsd.granularity
+        self.ngrans = int(round(resol_deg*granularity))     # granules along each side of a cell
+        self.cell_pairs = {}
+
+        self.nrow1 = int(round((90.0 - (lat + resol_d2))*granularity))
+        self.ncol1s = array([int(round((180.0 + lon - resol_d2)*granularity)) for lon in lons], dtype=int64)
+        self.cell_indices = {int(ncol1): icell for icell, ncol1 in enumerate(self.ncol1s)}
+        self.grid = None
+        if len(lons) == 0:
+            return
+
+        # single read of the HWSD grid for the band
+        # ==========================================
+        hwsd.read_bbox_mu_globals([lons[0] - resol_d2, lat - resol_d2, lons[-1] + resol_d2, lat + resol_d2])
+        grid = asarray(hwsd.rows)
+        if grid.ndim != 2:
+            return
+
+        self.grid = grid
+        self.row_offset = self.nrow1 - hwsd.nrow1
+        self.col_offsets = self.ncol1s - hwsd.ncol1
+
+        nrows, ncols = self.grid.shape
+        if self.row_offset < 0 or self.row_offset + self.ngrans > nrows or \
+                            self.col_offsets.min() < 0 or self.col_offsets.max() + self.ngrans > ncols:
+            self.grid = None
+            return
+
+        self._make_cell_pairs()
+
+    def _make_cell_pairs(self):
+        """
+        mu_global counts for every cell using a single np.unique on combined cell and mu_global keys
+        """
+        ngrans = self.ngrans
+        ncells = len(self.col_offsets)
+        strip = self.grid[self.row_offset:self.row_offset + ngrans]
+
+        col_indices = self.col_offsets[:, None] + arange(ngrans)
+        blocks = strip[:, col_indices].transpose(1, 0, 2).reshape(ncells, ngrans*ngrans)
+
+        cell_nums, grans = (blocks > 0).nonzero()
+        keys = cell_nums*MU_GLOBAL_LIMIT + blocks[cell_nums, grans].astype(int64)
+        keys, counts = unique(keys, return_counts=True)
+        if len(keys) == 0:
+            return
+
+        key_cells = keys//MU_GLOBAL_LIMIT
+        mu_globals = keys % MU_GLOBAL_LIMIT
+        brks = flatnonzero(diff(key_cells)) + 1
+        for icell, cell_mu_globals, cell_counts in zip(key_cells[r_[0, brks]], np_split(mu_globals, brks),
+                                                                                            np_split(counts, brks)):
+            self.cell_pairs[int(self.ncol1s[icell])] = \
+                        {int(mu_global): int(count) for mu_global, count in zip(cell_mu_globals, cell_counts)}
+
+    def get_mu_globals_dict(self, lggr, hwsd, bbox):
+        """
+        substitute for hwsd.read_bbox_mu_globals followed by hwsd.get_mu_globals_dict
+        the HWSD object is given the grid for this cell so that Cell_hwsd_data_frame can be used as before
+        cells outside the band grid are read individually and counted without building a data frame
+        """
+        ncol1 = int(round((180.0 + bbox[0])*hwsd.granularity))
+        if self.grid is None or ncol1 not in self.cell_indices:
+            hwsd.read_bbox_mu_globals(bbox)
+            mu_global_pairs = Cell_hwsd_data_frame(lggr, hwsd, counts_only=True)
+            if len(mu_global_pairs) == 0:
+                return None
+
+            return mu_global_pairs
+
+        col_offset = self.col_offsets[self.cell_indices[ncol1]]
+        hwsd.rows = self.grid[self.row_offset:self.row_offset + self.ngrans, col_offset:col_offset + self.ngrans].copy()
+        hwsd.nrow1, hwsd.ncol1 = self.nrow1, ncol1
+        hwsd.nrow2, hwsd.ncol2 = self.nrow1 + self.ngrans - 1, ncol1 + self.ngrans - 1
+        hwsd.nlats, hwsd.nlons = self.ngrans, self.ngrans
+
+        return self.cell_pairs.get(ncol1)
@@ -14,24 +14,21 @@ __version__ = '0.0.0'
 # ---------------
 # 
 from os.path import join, normpath, exists, isfile, isdir, split, splitext, splitdrive
-from os import makedirs, getcwd, name as os_name
+from os import makedirs, getcwd, listdir, name as os_name
 from json import load as json_load, dump as json_dump
 from json.decoder import JSONDecodeError
 from glob import glob
-from time import sleep
+from time import sleep, time
 from sys import exit
-from pandas import read_excel
-from xlrd import XLRDError
-from PyQt5.QtWidgets import QApplication
+from copy import deepcopy
 
 from set_up_logging import set_up_logging
-from glbl_ecss_cmmn_cmpntsGUI import print_resource_locations
-from glbl_ecsse_low_level_fns import check_cultiv_json_fname, check_rotation_json_fname
-from shape_funcs import format_bbox, calculate_area
+from glbl_ecsse_low_level_fns import check_cultiv_json_fname, check_rotation_json_fname, process_events
+import weather_datasets_ltd_data
 from weather_datasets_ltd_data import read_weather_dsets_detail, change_weather_resource, record_weather_settings
 from hwsd_bil import check_hwsd_integrity
-from hwsd_mu_globals_fns import HWSD_mu_globals_csv
-from mngmnt_fns_and_class import ManagementSet
+from file_link_fns import LINK_MODES
+from startup_cache_class import StartupCache
 
 APPLIC_STR = 'glbl_ecss_site_spec_sv'
 ERROR_STR = '*** Error *** '
@@ -54,12 +51,20 @@ CMN_GUI_LIST = ['cruStrtYr', 'cruEndYr', 'climScnr', 'futStrtYr', 'futEndYr', 'c
 
 ROTHC_KEYS = ['prjDir', 'outDir',  'simStrtYr', 'simEndYr', 'readAllWthrFlag', 'hwsdCsvFname', 'useHwsdFlag']
 
+# form attributes assigned by read_weather_dsets_detail and held in the startup cache
+# ==================================================================================
+WTHR_DETAIL_ATTRIBS = ['wthr_sets', 'wthr_gcms', 'wthr_settings_prev', 'weather_set_linkages',
+                                                                                            'weather_rsrce_generic']
+
 sleepTime = 5
 
-def initiation(form):
+def initiation(form, setup_file=None, gui_flag=True):
     """
     initialise the programme
+    setup_file: path of setup file, by default that in the current directory
+    gui_flag: set False for headless runs so that no module which imports PyQt5 is loaded
     """
+    strt_time = time()
 
     # avoids errors when exiting
     # ==========================
@@ -69,7 +74,7 @@ def initiation(form):
     form.rota_pattern = None
     form.glbl_n_inpts = None
 
-    settings = _read_setup_file(APPLIC_STR)
+    settings = _read_setup_file(APPLIC_STR, setup_file, gui_flag)
     form.setup = settings['setup']
     form.settings = settings['setup']   # TODO: duplication but necessary for logging
 
@@ -80,10 +85,14 @@ def initiation(form):
     form.regions_df = settings['regions_df']
     form.fobjs = None
     form.zeros_file = None
-
-    # check weather data
-    # ==================
-    read_weather_dsets_detail(form)
+    startup_cache = settings['startup_cache']
+
+    # check weather data - reading dataset details is slow so these are cached
+    # ========================================================================
+    wthr_detail = startup_cache.fetch('wthr_detail', _wthr_detail_sources(form.setup), _read_wthr_detail, form)
+    for attrib in wthr_detail['form']:
+        setattr(form, attrib, deepcopy(wthr_detail['form'][attrib]))    # cached entry must not change with the form
+    form.setup.update(deepcopy(wthr_detail['setup']))
     wthr_rsrce_generic = form.settings['weather_resource']
     form.wthr_rsrces_generic = wthr_rsrce_generic
     if wthr_rsrce_generic == 'WrldClim':
@@ -124,7 +133,8 @@ def initiation(form):
             exit(0)
 
     form.config_files = config_files
-    form.crop_defns = _read_crop_defns(form.dflt_ecosse_fnames['crop_sun'])
+    crop_sun_fname = form.dflt_ecosse_fnames['crop_sun']
+    form.crop_defns = startup_cache.fetch('crop_defns', [crop_sun_fname], _read_crop_defns, crop_sun_fname)
 
     # Look for and create definition for countries file
     # =================================================
@@ -132,10 +142,16 @@ def initiation(form):
     soil_dir = join(glec_dir, 'Soil')
     states_fn = join(soil_dir, 'all_Countries.nc')
     if isfile(states_fn):
+        from mngmnt_fns_and_class import ManagementSet
+
         form.cntries_defn = ManagementSet(states_fn, 'countries')
     else:
         form.cntries_defn = None
 
+    startup_cache.save()
+    form.startup_secs = time() - strt_time
+    print('Initialisation took {:.1f} seconds - startup cache hits: {} misses: {}'
+                                    .format(form.startup_secs, startup_cache.nhits, startup_cache.nmisses))
     return
 
 def change_config_file(form, new_study=None):
@@ -155,7 +171,7 @@ def change_config_file(form, new_study=None):
         read_config_file(form)
         form.setup['study'] = new_study
         form.w_study.setText(new_study)
-        QApplication.processEvents()
+        process_events()
         return
     else:
         print(WARNING_STR + 'Could not locate ' + config_file)
@@ -187,6 +203,46 @@ def build_and_display_studies(form):
 
     return config_files
 
+def _wthr_detail_sources(setup):
+    """
+    weather dataset details depend on the setup file, the module which reads them, the dataset directories and
+    the NetCDF files within these, which may be replaced without changing the modification time of their directory
+    """
+    weather_dir = setup['weather_dir']
+    sources = [setup['setup_file'], weather_datasets_ltd_data.__file__, weather_dir]
+    try:
+        fnames = sorted(listdir(weather_dir))
+    except OSError as err:
+        print(WARNING_STR + str(err) + ' listing weather datasets')
+        return sources
+
+    for fname in fnames:
+        dset_dir = join(weather_dir, fname)
+        if isdir(dset_dir):
+            sources.append(dset_dir)
+            sources += sorted(glob(join(dset_dir, '**', '*.nc'), recursive=True))
+
+    return sources
+
+def _read_wthr_detail(form):
+    """
+    return copies of the form attributes listed in WTHR_DETAIL_ATTRIBS and of setup items whose values are
+    changed by read_weather_dsets_detail
+    """
+    setup_prev = deepcopy(form.setup)
+    read_weather_dsets_detail(form)
+
+    wthr_detail = {'form': {}, 'setup': {}}
+    for attrib in WTHR_DETAIL_ATTRIBS:
+        if hasattr(form, attrib):
+            wthr_detail['form'][attrib] = deepcopy(getattr(form, attrib))
+
+    for key, val in form.setup.items():
+        if key not in setup_prev or setup_prev[key] != val:
+            wthr_detail['setup'][key] = deepcopy(val)
+
+    return wthr_detail
+
 def _read_crop_defns(crop_pars_fname):
     """
     read crop names and their corresponding codes
@@ -246,7 +302,7 @@ def _read_site_specific_parms():
 
     return parms_settings
 
-def _read_setup_file(applic_str):
+def _read_setup_file(applic_str, setup_file=None, gui_flag=True):
     """
     # read settings used for programme from the setup file, if it exists,
     # or create setup file using default values if file does not exist
@@ -254,8 +310,9 @@ def _read_setup_file(applic_str):
 
     # validate setup file
     # ===================
-    fname_setup = applic_str + '_setup.json'
-    setup_file = join(getcwd(), fname_setup)
+    if setup_file is None:
+        fname_setup = applic_str + '_setup.json'
+        setup_file = join(getcwd(), fname_setup)
 
     if exists(setup_file):
         print('Opening setup file ' + setup_file)
@@ -293,6 +350,57 @@ def _read_setup_file(applic_str):
     # ======================
     settings[grp]['last_gcm_only_flag'] = settings['run_settings']['last_gcm_only_flag']
 
+    # optional number of worker processes used when generating simulation files - 1 means run in main process
+    # ========================================================================================================
+    if 'n_workers' in settings['run_settings']:
+        settings[grp]['n_workers'] = max(1, int(settings['run_settings']['n_workers']))
+    else:
+        settings[grp]['n_workers'] = 1
+
+    # optional compact weather store - one zip file per region and scenario rather than a directory per cell
+    # ======================================================================================================
+    if 'wthr_store_flag' in settings['run_settings']:
+        settings[grp]['wthr_store_flag'] = bool(settings['run_settings']['wthr_store_flag'])
+    else:
+        settings[grp]['wthr_store_flag'] = False
+
+    # optional batch mode for writing AVEMET.DAT files - PET is computed for all cells of a region at once
+    # ====================================================================================================
+    if 'avemet_batch_flag' in settings['run_settings']:
+        settings[grp]['avemet_batch_flag'] = bool(settings['run_settings']['avemet_batch_flag'])
+    else:
+        settings[grp]['avemet_batch_flag'] = False
+
+    # optional means of placing default ECOSSE files and AVEMET.DAT in simulation directories
+    # =======================================================================================
+    link_mode = settings['run_settings'].get('link_mode', 'copy')
+    if link_mode not in LINK_MODES:
+        print(WARNING_STR + 'link_mode {} must be one of {} - will copy files'.format(link_mode, LINK_MODES))
+        link_mode = 'copy'
+    settings[grp]['link_mode'] = link_mode
+
+    # optional number of threads which write simulation files while the next cells are prepared - 0 means no threads
+    # ==============================================================================================================
+    if 'n_writer_threads' in settings['run_settings']:
+        settings[grp]['n_writer_threads'] = max(0, int(settings['run_settings']['n_writer_threads']))
+    else:
+        settings[grp]['n_writer_threads'] = 0
+
+    # optional sharded archive of simulation directories - one zip file per latitude band rather than many small files
+    # ================================================================================================================
+    if 'sims_archive_flag' in settings['run_settings']:
+        settings[grp]['sims_archive_flag'] = bool(settings['run_settings']['sims_archive_flag'])
+    else:
+        settings[grp]['sims_archive_flag'] = False
+
+    # optional cache of regions, weather dataset details and crop definitions - rebuilt when its sources change
+    # =========================================================================================================
+    if 'startup_cache_flag' in settings['run_settings']:
+        settings[grp]['startup_cache_flag'] = bool(settings['run_settings']['startup_cache_flag'])
+    else:
+        settings[grp]['startup_cache_flag'] = True
+    settings[grp]['setup_file'] = setup_file
+
     # initialise vars
     # ===============
     config_dir = settings[grp]['config_dir']
@@ -310,7 +418,7 @@ def _read_setup_file(applic_str):
     print('Checking drives, this may take a while...')
     for path_name in list([log_dir, config_dir, sims_dir, regions_fname, weather_dir]):
         drv_nm, tail_nm = splitdrive(path_name)
-        if not isdir(drv_nm):
+        if drv_nm != '' and not isdir(drv_nm):     # paths have no drive on Linux e.g. cluster nodes
             print(ERROR_STR + 'Drive {} for {} does not exist'.format(drv_nm, path_name))
             sleep(sleepTime)
             exit(0)
@@ -329,10 +437,17 @@ def _read_setup_file(applic_str):
             sleep(sleepTime)
             exit(0)
 
+    if settings[grp]['startup_cache_flag']:
+        startup_cache = StartupCache(config_dir)
+    else:
+        startup_cache = StartupCache()
+    settings['startup_cache'] = startup_cache
+
     # file comprising world regions
     # ============================
     if isfile(regions_fname):
-        settings['regions'], settings['regions_abbrv'], settings['regions_df'] = _read_regions_file(regions_fname)
+        settings['regions'], settings['regions_abbrv'], settings['regions_df'] = \
+                                    startup_cache.fetch('regions', [regions_fname], _read_regions_file, regions_fname)
     else:
         print(ERROR_STR + 'reading {}\tregions definition file {} must exist'.format(setup_file, regions_fname))
         sleep(sleepTime)
@@ -356,7 +471,14 @@ def _read_setup_file(applic_str):
     settings[grp]['max_countries'] = MAX_COUNTRIES
 
     lta_nc_fname = None
-    print_resource_locations(setup_file, config_dir, hwsd_dir, weather_dir, lta_nc_fname, sims_dir, log_dir)
+    if gui_flag:
+        from glbl_ecss_cmmn_cmpntsGUI import print_resource_locations
+
+        print_resource_locations(setup_file, config_dir, hwsd_dir, weather_dir, lta_nc_fname, sims_dir, log_dir)
+    else:
+        for descr, path_name in zip(['setup file', 'configuration files', 'HWSD', 'weather', 'simulations', 'logs'],
+                                        [setup_file, config_dir, hwsd_dir, weather_dir, sims_dir, log_dir]):
+            print('Location of {}: {}'.format(descr, path_name))
 
     return settings
 
@@ -410,13 +532,20 @@ def _write_default_setup_file(setup_file):
             'weather_dir': 'E:\\GlobalEcosseData'
         },
         'run_settings': {
+            'avemet_batch_flag': False,
             'completed_max': 5000000000,
             'check_space_every': 10,
             'kml_flag': True,
             'last_gcm_only_flag': True,
+            'link_mode': 'copy',
             "max_countries": 350,
+            'n_workers': 1,
+            'n_writer_threads': 0,
+            'sims_archive_flag': False,
             'space_remaining_limit': 1270,
+            'startup_cache_flag': True,
             'soil_test_flag': False,
+            'wthr_store_flag': False,
             'zeros_file': False
         }
     }
@@ -508,6 +637,11 @@ def read_config_file(form):
     else:
         glbl_n_flag = config[grp]['glblNflag']
 
+    if 'resumeFlag' not in config[grp]:
+        resume_flag = False
+    else:
+        resume_flag = config[grp]['resumeFlag']
+
     # cultivation and crop rotation
     # =============================
     form.w_lbl13.setText(cultiv_json_fname)
@@ -571,6 +705,8 @@ def read_config_file(form):
                                                                             sim_strt_year, sim_end_year)
     # bounding box set up
     # ===================
+    from shape_funcs import format_bbox, calculate_area
+
     area = calculate_area(form.setup['bbox'])
     ll_lon, ll_lat, ur_lon, ur_lat = form.setup['bbox']
     form.w_ll_lon.setText(str(ll_lon))
@@ -605,6 +741,12 @@ def read_config_file(form):
     else:
         form.w_glbl_n_inpts.setCheckState(0)
 
+    if hasattr(form, 'w_resume'):
+        if resume_flag:
+            form.w_resume.setCheckState(2)
+        else:
+            form.w_resume.setCheckState(0)
+
     if daily_mode:
         form.w_daily.setChecked(True)
     else:
@@ -717,6 +859,9 @@ def write_config_file(form):
             'wthrRsrce': form.w_combo10w.currentText()
         }
     }
+    if hasattr(form, 'w_resume'):
+        config['minGUI']['resumeFlag'] = form.w_resume.isChecked()
+
     if isfile(config_file):
         descriptor = 'Overwrote existing'
     else:
@@ -735,6 +880,9 @@ def _read_regions_file(regions_fname):
     """
 
     """
+    from pandas import read_excel
+    from xlrd import XLRDError
+
     print('Will use regions definition file: ' + regions_fname)
     try:
         datafr = read_excel(io=regions_fname, sheet_name='Regions', usecols='A:F')
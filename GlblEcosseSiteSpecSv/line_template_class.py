@@ -0,0 +1,60 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        line_template_class.py
+# Purpose:     precompiled templates for the data and comment lines of ECOSSE input files
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'line_template_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+MIN_SPACER_LEN = 2
+
+class LineTemplate(object):
+    """
+    comment column of each line is formatted once; lines are then produced from values alone and are identical
+    to those from MakeSiteFiles._line i.e. data, a spacer of at least two spaces, then # and the comment
+    """
+    def __init__(self, spacer_len, comments):
+        """
+        C
+        """
+        self.width = spacer_len
+        self.pad = ' '*MIN_SPACER_LEN
+        self.suffixes = ['# {}\n'.format(comment) for comment in comments]
+
+    def fill(self, values):
+        """
+        return buffer comprising one line for each value - values are formatted as by str.format
+        """
+        assert len(values) == len(self.suffixes), 'expected {} values, got {}'.format(len(self.suffixes), len(values))
+        width, pad = self.width, self.pad
+
+        return ''.join([(format(value) + pad).ljust(width) + suffix for value, suffix in zip(values, self.suffixes)])
+
+# templates held by this process
+# ==============================
+_line_templates = {}
+
+def fetch_line_template(spacer_len, key, make_comments=None):
+    """
+    return template identified by key, calling make_comments to build the list of comments only on first use
+    if make_comments is not supplied then the key is the tuple of comments
+    """
+    tmplt_key = (spacer_len, key)
+    if tmplt_key not in _line_templates:
+        comments = key if make_comments is None else make_comments()
+        _line_templates[tmplt_key] = LineTemplate(spacer_len, comments)
+
+    return _line_templates[tmplt_key]
+
+def fetch_numbered_template(spacer_len, comment_fmt, nlines):
+    """
+    template for lines whose comments differ only by line number e.g. Met file for year 1, 2, 3...
+    """
+    return fetch_line_template(spacer_len, (comment_fmt, nlines),
+                                                lambda: [comment_fmt.format(iline + 1) for iline in range(nlines)])
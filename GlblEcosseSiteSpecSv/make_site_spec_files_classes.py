@@ -12,52 +12,74 @@ __version__ = '1.0.00'
 from os.path import join, normpath
 from datetime import timedelta, date
 from calendar import month_abbr
-from shutil import copyfile
 
 from pedotransfer import boelter, bss
-
-def _crop_rotation(iyr, climgen, rota_pattern, rota_flag):
+from line_template_class import fetch_line_template, fetch_numbered_template
+from file_link_fns import link_or_copy
+from run_settings_class import RunSettings
+
+# comment columns of fixed stanzas of the management, site and soil files
+# =======================================================================
+MNGMNT_HDR_COMMENTS = ('Soil code number', 'Drainage class (1=low, 2=moderate, 3=high) Not currently implemented.',
+    'Depth to impermeable layer (1=50cm, 2=100cm, 3=150cm)', 'Previous crop code', 'Yield of previous crop [t/ha]',
+    'Atmospheric N deposition [kg N/ha]', 'Date field reaches field capacity (1=01/01; 2=01/06)',
+    'Timestep (0=30 min, 1=daily, 2=weekly, 3=monthly)', 'Crop model type (0=SUNDIAL, 1=MAGEC)',
+    'Number of years in simulation', 'Timesteps from 01/01 to harvest of previous crop', 'First year of simulation',
+    'End of simulation [number of timesteps]', 'Fixed end of simulation? (0=no, 1=yes)', 'Latitude [decimal degrees]',
+    'Water table depth [cm], if > 150 cm there is no effect')
+
+CROP_COMMENTS = ('Timesteps to sowing date from 01/01/01', 'Crop N uptake at harvest (0=calculate internally) [kg N/ha]',
+    'Timesteps to harvest date from 01/01/01', 'Expected yield [t/ha]', 'Crop residues incorporated (0=No, 1=Yes',
+    'Number of fertiliser applications', 'Number of organic manure applications')
+
+FERT_COMMENTS = ('Amount of fertiliser applied [kg N/ha]', 'Timesteps to fertiliser application', 'Percentage NO3',
+    'Percentage NH4', 'Percentage urea',
+    'Does fert.contain ammonium salts other than ammonium sulphate (0=No, 1=Yes)',
+    'Has fertiliser been labelled (0=No, 1=Yes)')
+
+MANURE_COMMENTS = ('Amount of manure applied [kg N/ha]', 'Timesteps to manure application', 'Type of manure',
+    'Has manure been labelled (0=No, 1=Yes)')
+
+CULT_COMMENTS = ('Timesteps from 01/01 when cultivation occurred', 'Type of cultivation', 'Vigour of cultivation')
+
+SITE_OTHER_COMMENTS = ('Latitude [decimal deg]', 'Water table depth at start [cm]', 'Drainage class',
+    'C accumulated before change [kgC/ha/yr] (only for mode 4 - if not use a dummy a value)',
+    'CH4 emission before change [kgC/ha/yr] (not used yet)', 'CO2 emission before change [kgC/ha/yr] (not used yet)',
+    'DOC loss before change [kgC/ha/yr] (not used yet)', 'Number of growing seasons to simulate')
+
+SOIL_COMMENTS = ('Soil name', 'Soil code (used in management file)',
+    'Available water content at field capacity [mm/0-25cm]', 'Stable N:C of biomass and humus pools',
+    'Fraction of BIO + HUM formed: (BIO + HUM) / Total decomposition',
+    'Biomass/Humus produced from biomass decomposition', 'Biomass/Humus produced from humus decomposition',
+    'Fraction of biomass in total organic C', 'Minimum level of nitrate in soil [kgN/ha/50cm layer]',
+    'Rate constant for biomass decomposition [/year]', 'Rate constant for humus decomposition [/year]',
+    'Total organic C in top 50 cm of soil [kgC/ha]', 'Inert organic matter in top 50 cm of soil [kgC/ha]',
+    'Land use before equilibrium run (1=arable, 2=grass, 3=forestry, 4=natural', 'Clay content [proportion]',
+    'Depth of soil used in initialisation [cm]', 'pH of soil ', 'pH at which decomposition has declined to zero',
+    'pH at which decomposition starts to decline', 'bulk denisty [g/cm3]',
+    'Available water content at saturation [mm/0-25cm]', 'Water content at wilting point [mm/0-25cm]')
+
+def _write_buffer(path, buffer, newline=None):
     """
-    return crop name and code for this year
+    write a file whose contents have already been formatted
     """
-    crop_code = climgen.crop_codes[0]
-    crop_name = climgen.crop_names[0]
-
-    if rota_pattern is not None and rota_flag:
-        if iyr >= rota_pattern['start_year']:
-
-            crop_names = list(rota_pattern['crops'].keys())
-            n_rota_crops = len(crop_names)
-            i_rota = iyr % n_rota_crops
-
-            crop_name = crop_names[i_rota]
-            crop_code = rota_pattern['crops'][crop_name]
-
-    return crop_name, crop_code
+    with open(path, 'w', newline=newline) as fobj:
+        fobj.write(buffer)
 
-def _residues_incorporate(cultiv_pattern, nyears):
+def _site_lyr_comments(key, nlyrs):
     """
-    return list of residues incorporated flags for each year
+    comments for the six soil properties of each SOM layer under this land use
     """
-    residues_incorp = []
-    if cultiv_pattern is None:
-        return residues_incorp
-
-    cultiv_iter = iter(cultiv_pattern.keys())
-    change_year = 0  # initialise to zero to force a read of the cultivation pattern
-    this_key = next(cultiv_iter)
-    for iyr in range(nyears):
-        if iyr >= change_year:
-            dummy, dummy, residue_incorp = cultiv_pattern[this_key]  # read the cultivation pattern
-            try:
-                this_key = next(cultiv_iter)  # get the next year when there is a change
-                change_year = int(this_key)
-            except StopIteration:
-                change_year = 99999
-
-        residues_incorp.append(residue_incorp)
-
-    return residues_incorp
+    comments = []
+    for lyr_num in range(nlyrs):
+        comments += ['C content [kgC/ha] for this soil under {} in SOM layer {}'.format(key, lyr_num + 1),
+                     'Bulk density [g/cm3] for this soil under {} in SOM layer {}'.format(key, lyr_num + 1),
+                     'pH for this soil under {} in SOM layer {}'.format(key, lyr_num + 1),
+                     '% clay by weight for this soil under {} in SOM layer {}'.format(key, lyr_num + 1),
+                     '% silt by weight for this soil under {} in SOM layer {}'.format(key, lyr_num + 1),
+                     '% sand by weight for this soil under {} in SOM layer {}'.format(key, lyr_num + 1)]
+
+    return comments
 
 class MakeSiteFiles(object):
     """
@@ -66,40 +88,36 @@ class MakeSiteFiles(object):
     _luts = ['ara', 'gra', 'for', 'nat', 'mis', 'src']
     months = list(month_abbr[1:])
 
-    def __init__(self, form,  climgen, comments = True, spacer_len = 12, nan = -999):
+    def __init__(self, run_settings,  climgen, comments = True, spacer_len = 12, nan = -999):
         """
-
+        run_settings: RunSettings object with tables for this climgen, normally created once per run;
+                      a form is accepted but its widgets are then read for each object
         """
-        if hasattr(form, 'w_equimode'):
-            equil_mode = form.w_equimode.text()
-            manure_flag = form.w_manure.isChecked()
-        else:
-            equil_mode = form.equimode
-            manure_flag = False
+        if not isinstance(run_settings, RunSettings):
+            run_settings = RunSettings(run_settings).with_tables(climgen)
 
-        if hasattr(form, 'w_crop_rota'):
-            rotation_flag = form.w_crop_rota.isChecked()
-        else:
-            rotation_flag = False
-        self.rota_flag = rotation_flag
+        self.rota_flag = run_settings.rota_flag
 
         self.comments = comments      # True = write comments, False = leave them out
         self.spacer_len = spacer_len  # Number of spaces between data and comment
         self.nan = nan
-        self.sims_dir = form.setup['sims_dir']
-        self.wthr_prj_dir = form.setup['wthr_prj_dir']
-        self.equil_mode    = equil_mode         # Mode of equilibrium run
-        self.manure_flag   = manure_flag
-        self.dflt_ecosse_fnames = form.dflt_ecosse_fnames
-
-        nyears              = climgen.sim_end_year - climgen.sim_start_year + 1     # Number of years in simulation
+        self.sims_dir = run_settings.sims_dir
+        self.wthr_prj_dir = run_settings.wthr_prj_dir
+        self.equil_mode    = run_settings.equil_mode     # Mode of equilibrium run
+        self.manure_flag   = run_settings.manure_flag
+        self.dflt_ecosse_fnames = run_settings.dflt_ecosse_fnames
+        self.link_mode     = run_settings.link_mode      # how default and AVEMET.DAT files are placed in sim dirs
+
+        nyears              = run_settings.nyears        # Number of years in simulation
         self.nyears         = nyears
         self.start_year     = climgen.sim_start_year     # start year of simulation
         self.ncrops         = nyears  # Number of crops - one crop per year
         self.ncultivations  = nyears  # one cultivation per year
-        self.cultiv_pattern = form.cultiv_pattern
-        self.rota_pattern = form.rota_pattern
-        self.residues_incorp = _residues_incorporate(form.cultiv_pattern, nyears)
+        self.cultiv_pattern = run_settings.cultiv_pattern
+        self.rota_pattern = run_settings.rota_pattern
+        self.residues_incorp = run_settings.residues_incorp     # shared, read only, tables for each year
+        self.crop_rotation = run_settings.crop_rotation
+        self.cultiv_table = run_settings.cultivations
         self.hwsd_ref_depths = [30, 100]  # see HWSD manual
 
         #-----------------------------------------------------------------------
@@ -194,16 +212,8 @@ class MakeSiteFiles(object):
 
         # adjust planting and harvest day to simulate perennial crops
         # ===========================================================
-        year_from = int(form.w_yr_from.text())
-        if form.w_use_peren.isChecked():
-            self.peren_yr = year_from
-        else:
-            self.peren_yr = None
-
-        if form.w_manure.isChecked():
-            self.manure_yr = year_from
-        else:
-            self.manure_yr = 0
+        self.peren_yr = run_settings.peren_yr
+        self.manure_yr = run_settings.manure_yr
 
     def create_site_soil_layers(self, soil_list):
         """
@@ -337,7 +347,7 @@ class MakeSiteFiles(object):
             harvest_ts   = naccum_tsteps + harvest_date.month
 
             crop = Crop()
-            crop.crop_name, crop.code = _crop_rotation(iyr, climgen, self.rota_pattern, self.rota_flag)
+            crop.crop_name, crop.code = self.crop_rotation[iyr]
             crop.sowing_doy  = sowing_ts
             crop.harvest_doy = harvest_ts
             crop.n_uptake    = n_uptake
@@ -376,9 +386,6 @@ class MakeSiteFiles(object):
         # ==================
         cultiv_day = max(0, plant_day - 31)  # always one month ahead
 
-        cultiv_iter = iter(self.cultiv_pattern.keys())    # create an iterator
-        change_year = 0     # initialise to zero to force a read of the cultivation pattern
-        this_key = next(cultiv_iter)
         naccum_tsteps = 0
         sbtrct_mnth = 0
         for iyr in range(self.ncultivations):
@@ -392,14 +399,7 @@ class MakeSiteFiles(object):
                 else:
                     sbtrct_mnth = 0
 
-            if iyr >= change_year:
-                cult_type, cult_vigor, dummy = self.cultiv_pattern[this_key]   # read the cultivation pattern
-                try:
-                    this_key = next(cultiv_iter)  # get the next year when there is a change
-                    change_year = int(this_key)
-                except StopIteration:
-                    change_year = 99999
-
+            cult_type, cult_vigor = self.cultiv_table[iyr]
             cult_date = date(year, 1, 1) + timedelta(cultiv_day)  # Tillage one month before sowing
             cult_ts = naccum_tsteps + cult_date.month - sbtrct_mnth
             cultivation = Cultivation(cult_ts, cult_type, cult_vigor)
@@ -439,10 +439,8 @@ class MakeSiteFiles(object):
         C
         """
         # self._write_fnames_file(directory)
-        self._write_management_file(directory, met_rel_path)
-        self._write_soil_file(directory)
-        self._write_site_file(directory, hist_weather_recs)
-        self._copy_avemet_file(directory, met_rel_path)
+        for func, args in self.sim_file_jobs(directory, soil, hist_weather_recs, met_rel_path):
+            func(*args)
         '''
         write_crop_sun_file(directory)
         write_crop_pars(directory)  # crop_pars for limited data only
@@ -450,13 +448,37 @@ class MakeSiteFiles(object):
         write_nitpars(directory)
         '''
 
+    def sim_file_buffers(self, hist_weather_recs, met_rel_path):
+        """
+        file name, formatted contents and newline argument for open of the management, soil and site files
+        """
+        return [('management.txt', self._management_buffer(met_rel_path), None),
+                ('soil.txt', self._soil_buffer(), None),
+                ('site.txt', self._site_buffer(hist_weather_recs), '')]
+
+    def sim_file_jobs(self, directory, soil, hist_weather_recs, met_rel_path):
+        """
+        contents of the management, soil and site files are formatted now but writing is deferred so that it can be
+        done by another thread - each job is a function and its arguments
+        """
+        jobs = [(_write_buffer, (join(normpath(directory), fname), buffer, newline))
+                                for fname, buffer, newline in self.sim_file_buffers(hist_weather_recs, met_rel_path)]
+        jobs.append((self._copy_avemet_file, (directory, met_rel_path)))
+
+        return jobs
+
+    def avemet_source(self, met_rel_path):
+        """
+        AVEMET.DAT of the weather cell
+        """
+        return join(self.wthr_prj_dir, met_rel_path[6:], 'AVEMET.DAT')
+
     def _copy_avemet_file(self, directory, met_rel_path):
         """
 
         """
-        avemet_from = join(self.wthr_prj_dir, met_rel_path[6:], 'AVEMET.DAT')
         avemet_to = join(directory, 'AVEMET.DAT')
-        copyfile(avemet_from, avemet_to)
+        link_or_copy(self.avemet_source(met_rel_path), avemet_to, self.link_mode)
 
     def _write_fnames_file(self, directory):
         """
@@ -501,120 +523,93 @@ class MakeSiteFiles(object):
 
     def _write_management_file(self, directory, met_rel_path):
         """
+        C
+        """
+        _write_buffer(join(directory, 'management.txt'), self._management_buffer(met_rel_path))
 
+    def _management_buffer(self, met_rel_path):
+        """
+        lines are produced from precompiled templates - see line_template_class
         """
-        _line = self._line  # Optimisation
-        lines = []
-        lines.append(self._line('{}'.format(self.soil_code),  'Soil code number'))
-        lines.append(self._line('{}'.format(self.drain_class),'Drainage class (1=low, 2=moderate, 3=high) '
-                                                                                        'Not currently implemented.'))
-        lines.append(self._line('{}'.format(self.depth_imperm_lyr),
-                                                            'Depth to impermeable layer (1=50cm, 2=100cm, 3=150cm)'))
-        lines.append(self._line('{}'.format(self.prev_crop_code),  'Previous crop code'))
-        lines.append(self._line('{}'.format(self.yield_prev_crop), 'Yield of previous crop [t/ha]'))
-        lines.append(self._line('{}'.format(self.atmos_n_dep),     'Atmospheric N deposition [kg N/ha]'))
-        lines.append(self._line('{}'.format(self.date_reaches_fc),
-                                                              'Date field reaches field capacity (1=01/01; 2=01/06)'))
-        lines.append(self._line('{}'.format(self.timestep),   'Timestep (0=30 min, 1=daily, 2=weekly, 3=monthly)'))
-        lines.append(self._line('{}'.format(self.crop_model), 'Crop model type (0=SUNDIAL, 1=MAGEC)'))
-        lines.append(self._line('{}'.format(self.nyears),     'Number of years in simulation'))
-        lines.append(self._line('{}'.format(int(self.prev_crop_harvest_doy - self.start_doy)),
-                                                                'Timesteps from 01/01 to harvest of previous crop'))
-        lines.append(self._line('{}'.format(self.start_year),   'First year of simulation'))
-        lines.append(self._line('{}'.format(self.ntime_steps),  'End of simulation [number of timesteps]'))
-        lines.append(self._line('{}'.format(self.fixed_sim_end),'Fixed end of simulation? (0=no, 1=yes)'))
-        lines.append(self._line('{}'.format(self.lat),          'Latitude [decimal degrees]'))
-        lines.append(self._line('{}'.format(self.wtr_tbl_dpth),
-                                                 'Water table depth [cm], if > 150 cm there is no effect'))
-        for iyr, fname in enumerate(self.met_fnames):
-            lines.append(self._line("'{}{}'".format(met_rel_path, fname), 'Met file for year {}'.format(iyr+1)))
-        lines.append(self._line('{}'.format(self.ncrops), 'Number of crops'))
+        spacer_len = self.spacer_len
+        _line = self._line
+        buffers = []
+        buffers.append(fetch_line_template(spacer_len, MNGMNT_HDR_COMMENTS).fill([self.soil_code, self.drain_class,
+                    self.depth_imperm_lyr, self.prev_crop_code, self.yield_prev_crop, self.atmos_n_dep,
+                    self.date_reaches_fc, self.timestep, self.crop_model, self.nyears,
+                    int(self.prev_crop_harvest_doy - self.start_doy), self.start_year, self.ntime_steps,
+                    self.fixed_sim_end, self.lat, self.wtr_tbl_dpth]))
+
+        nmet_fnames = len(self.met_fnames)
+        buffers.append(fetch_numbered_template(spacer_len, 'Met file for year {}', nmet_fnames)
+                                .fill(["'{}{}'".format(met_rel_path, fname) for fname in self.met_fnames]))
+        buffers.append(_line('{}'.format(self.ncrops), 'Number of crops'))
 
         # stanza to permit timing of crops and numbers of fertiliser and manure application
         # =================================================================================
+        crop_tmplt = fetch_line_template(spacer_len, CROP_COMMENTS)
+        fert_tmplt = fetch_line_template(spacer_len, FERT_COMMENTS)
+        manure_tmplt = fetch_line_template(spacer_len, MANURE_COMMENTS)
         for cropnum, crop in enumerate(self.crops):
-            lines.append(self._line('{}'.format(crop.code),
-                                                    'CROP {}\t\tsequence {}'.format(crop.crop_name, cropnum + 1)))
-            lines.append(self._line('{}'.format(int(crop.sowing_doy)), 'Timesteps to sowing date from 01/01/01'))
-            lines.append(self._line('{}'.format(round(crop.n_uptake,2)),
-                                                    'Crop N uptake at harvest (0=calculate internally) [kg N/ha]'))
-            lines.append(self._line('{}'.format(int(crop.harvest_doy)), 'Timesteps to harvest date from 01/01/01'))
-            lines.append(self._line('{}'.format(crop.exp_yield),        'Expected yield [t/ha]'))
-            lines.append(self._line('{}'.format(crop.residues_inc),     'Crop residues incorporated (0=No, 1=Yes'))
-            lines.append(self._line('{}'.format(crop.nfert_apps),       'Number of fertiliser applications'))
-            lines.append(self._line('{}'.format(crop.nmanure_apps),     'Number of organic manure applications'))
+            buffers.append(_line('{}'.format(crop.code), 'CROP {}\t\tsequence {}'.format(crop.crop_name, cropnum + 1)))
+            buffers.append(crop_tmplt.fill([int(crop.sowing_doy), round(crop.n_uptake,2), int(crop.harvest_doy),
+                                    crop.exp_yield, crop.residues_inc, crop.nfert_apps, crop.nmanure_apps]))
 
             # stanza for fertiliser applications
             # ==================================
             if crop.nfert_apps >= 1:
                 for fert in crop.fert_apps:
-                    lines.append(_line('{}'.format(round(fert.amount,2)), 'Amount of fertiliser applied [kg N/ha]'))
-                    lines.append(_line('{}'.format(int(fert.app_moy)),    'Timesteps to fertiliser application'))
-                    lines.append(_line('{}'.format(fert.no3_pc),          'Percentage NO3'))
-                    lines.append(_line('{}'.format(fert.nh4_pc),          'Percentage NH4'))
-                    lines.append(_line('{}'.format(fert.urea_pc),         'Percentage urea'))
-                    lines.append(_line('{}'.format(fert.non_amm_sulphate_salts),
-                                        'Does fert.contain ammonium salts other than ammonium sulphate (0=No, 1=Yes)'))
-                    lines.append(_line('{}'.format(fert.labelled),        'Has fertiliser been labelled (0=No, 1=Yes)'))
+                    buffers.append(fert_tmplt.fill([round(fert.amount,2), int(fert.app_moy), fert.no3_pc, fert.nh4_pc,
+                                                    fert.urea_pc, fert.non_amm_sulphate_salts, fert.labelled]))
 
             # stanza for manure applications
             # ==============================
             if crop.nmanure_apps >= 1:
                 for manure in crop.manure_apps:
-                    lines.append(_line('{}'.format(round(manure.amount,2)), 'Amount of manure applied [kg N/ha]'))
-                    lines.append(_line('{}'.format(int(manure.app_moy)),    'Timesteps to manure application'))
-                    lines.append(_line('{}'.format(manure.type),            'Type of manure'))
-                    lines.append(_line('{}'.format(manure.labelled),        'Has manure been labelled (0=No, 1=Yes)'))
+                    buffers.append(manure_tmplt.fill([round(manure.amount,2), int(manure.app_moy), manure.type,
+                                                                                                manure.labelled]))
 
         # stanza for cultivations
         # =======================
-        lines.append(self._line('{}'.format(self.ncultivations), 'Number of cultivations'))
+        buffers.append(_line('{}'.format(self.ncultivations), 'Number of cultivations'))
+        cult_tmplt = fetch_line_template(spacer_len, CULT_COMMENTS)
         for icult, cult in enumerate(self.cultivations):
-            lines.append(_line('{}'.format(int(cult.cult_doy)),  'Timesteps from 01/01 when cultivation occurred'))
-            lines.append(_line('{}'.format(cult.cult_type),      'Type of cultivation'))
-            lines.append(_line('{}'.format(cult.cult_vigor),     'Vigour of cultivation'))
+            buffers.append(cult_tmplt.fill([int(cult.cult_doy), cult.cult_type, cult.cult_vigor]))
 
-        with open(join(directory, 'management.txt'), 'w') as fhand:
-            fhand.writelines(lines)
+        return ''.join(buffers)
 
     def _write_site_file(self, directory, hist_weather_recs, site_filename='site.txt'):
         """
+        C
+        """
+        _write_buffer(join(normpath(directory), site_filename), self._site_buffer(hist_weather_recs), '')
 
+    def _site_buffer(self, hist_weather_recs):
         """
+        lines are produced from precompiled templates - see line_template_class
+        """
+        spacer_len = self.spacer_len
         _line = self._line
         output = []
         # Soil parameters
         output.append(_line('{0}'.format(self.equil_mode), 'Mode of equilibrium run'))
         output.append(_line('{0}'.format(self.nlyrs),      'Number of soil layers (max 10)'))
-        for lyr_num, lyr_depth in enumerate(self.lyr_depths):
-            output.append(_line('{0}'.format(lyr_depth),   'Depth of bottom of SOM layer {} [cm]'.format(lyr_num+1)))
+        output.append(fetch_numbered_template(spacer_len, 'Depth of bottom of SOM layer {} [cm]',
+                                                                    len(self.lyr_depths)).fill(self.lyr_depths))
         for key in self._luts:
+            lyr_tmplt = fetch_line_template(spacer_len, ('site_lyrs', key, self.nlyrs),
+                                                                lambda: _site_lyr_comments(key, self.nlyrs))
+            lyr_vals = []
             for lyr_num in range(self.nlyrs):
-                output.append(_line('{}'.format(self.soil_lyrs[key][lyr_num].soc),
-                              'C content [kgC/ha] for this soil under {} in SOM layer {}'.format(key, lyr_num + 1)))
-
-                bulk_dens = round(float(self.soil_lyrs[key][lyr_num].bulk_dens), 3)
-                output.append(_line('{}'.format(bulk_dens),
-                              'Bulk density [g/cm3] for this soil under {} in SOM layer {}'.format(key, lyr_num+1)))
-
-                ph = round(float(self.soil_lyrs[key][lyr_num].ph), 1)
-                output.append(_line('{}'.format(ph),
-                               'pH for this soil under {} in SOM layer {}'.format(key, lyr_num+1)))
-
-                clay_pc = round(float(self.soil_lyrs[key][lyr_num].clay_pc), 1)
-                output.append(_line('{}'.format(clay_pc),
-                                '% clay by weight for this soil under {} in SOM layer {}'.format(key, lyr_num+1)))
-
-                silt_pc = round(float(self.soil_lyrs[key][lyr_num].silt_pc), 1)
-                output.append(_line('{}'.format(silt_pc),
-                                '% silt by weight for this soil under {} in SOM layer {}'.format(key, lyr_num+1)))
+                soil_lyr = self.soil_lyrs[key][lyr_num]
+                lyr_vals += [soil_lyr.soc, round(float(soil_lyr.bulk_dens), 3), round(float(soil_lyr.ph), 1),
+                             round(float(soil_lyr.clay_pc), 1), round(float(soil_lyr.silt_pc), 1),
+                             round(float(soil_lyr.sand_pc), 1)]
+            output.append(lyr_tmplt.fill(lyr_vals))
 
-                sand_pc = round(float(self.soil_lyrs[key][lyr_num].sand_pc), 1)
-                output.append(_line('{}'.format(sand_pc),
-                                '% sand by weight for this soil under {} in SOM layer {}'.format(key, lyr_num+1)))
-        for key in self._luts:
-            output.append(_line('{0}'.format(self.plant_inputs[key]),
-                          '{} long term average plant C input [kgC/ha/yr] (used in modes 1 & 3 only)'.format(key)))
+        output.append(fetch_line_template(spacer_len, ('plant_inputs',) + tuple(self._luts),
+                lambda: ['{} long term average plant C input [kgC/ha/yr] (used in modes 1 & 3 only)'.format(key)
+                                    for key in self._luts]).fill([self.plant_inputs[key] for key in self._luts]))
 
         # Long term average climate
         # =========================
@@ -630,18 +625,9 @@ class MakeSiteFiles(object):
         '''
         # Other bits and bobs
         # ===================
-        output.append(_line('{}'.format(self.lat),              'Latitude [decimal deg]'))
-        output.append(_line('{}'.format(self.wtr_tbl_dpth),     'Water table depth at start [cm]'))
-        output.append(_line('{}'.format(self.drain_class),      'Drainage class'))
-        output.append(_line('{}'.format(self.c_accum_b4_change),
-                            'C accumulated before change [kgC/ha/yr] (only for mode 4 - if not use a dummy a value)'))
-        output.append(_line('{}'.format(self.ch4_b4_change),
-                            'CH4 emission before change [kgC/ha/yr] (not used yet)'))
-        output.append(_line('{}'.format(self.co2_b4_change),
-                            'CO2 emission before change [kgC/ha/yr] (not used yet)'))
-        output.append(_line('{}'.format(self.doc_loss_b4_change),
-                            'DOC loss before change [kgC/ha/yr] (not used yet)'))
-        output.append(_line('{}'.format(self.nyears),           'Number of growing seasons to simulate'))
+        output.append(fetch_line_template(spacer_len, SITE_OTHER_COMMENTS).fill([self.lat, self.wtr_tbl_dpth,
+                    self.drain_class, self.c_accum_b4_change, self.ch4_b4_change, self.co2_b4_change,
+                    self.doc_loss_b4_change, self.nyears]))
 
         # Future land use and plant inputs - used to read "If plant input set to zero it is obtained from RothC instead"
         # =============================================================================================================
@@ -650,54 +636,35 @@ class MakeSiteFiles(object):
         plant_input = 1000.0*self.yield_prev_crop
         # pi = 0.0
 
-        for yr_num in range(self.nyears):
-            output.append(_line('{}, {}'.format(land_use, round(plant_input,1)),
-                            'Year {} land use and plant C input [kgC/ha/yr] (Not used in mode 7)'.format(yr_num + 1)))
-            yr_num += 1
+        lu_pi = '{}, {}'.format(land_use, round(plant_input,1))
+        output.append(fetch_numbered_template(spacer_len,
+                            'Year {} land use and plant C input [kgC/ha/yr] (Not used in mode 7)', self.nyears)
+                                                                                    .fill(self.nyears*[lu_pi]))
 
         # Climate file names
         # ==================
-        for year_num, fname in enumerate(self.met_fnames):
-            output.append(_line('{}'.format(fname), 'Year {} climate file'.format(year_num + 1)))
+        output.append(fetch_numbered_template(spacer_len, 'Year {} climate file', len(self.met_fnames))
+                                                                                            .fill(self.met_fnames))
 
-        path = join(normpath(directory), site_filename)
-        with open(path, 'w', newline='') as file:
-            file.writelines(output)
+        return ''.join(output)
 
     def _write_soil_file(self, directory):
         """
+        C
+        """
+        _write_buffer(join(directory, 'soil.txt'), self._soil_buffer())
 
+    def _soil_buffer(self):
         """
-        lines = []
-        lines.append(self._line('{}'.format(self.soil_name),         'Soil name'))
-        lines.append(self._line('{}'.format(self.soil_code),         'Soil code (used in management file)'))
-        lines.append(self._line('{}'.format(self.awc_fc),
-                                        'Available water content at field capacity [mm/0-25cm]'))
-        lines.append(self._line('{}'.format(self.biohum_stable_n2c), 'Stable N:C of biomass and humus pools'))
-        lines.append(self._line('{}'.format(self.biohum_frac),
-                                        'Fraction of BIO + HUM formed: (BIO + HUM) / Total decomposition'))
-        lines.append(self._line('{}'.format(self.biohum_from_bio), 'Biomass/Humus produced from biomass decomposition'))
-        lines.append(self._line('{}'.format(self.biohum_from_hum), 'Biomass/Humus produced from humus decomposition'))
-        lines.append(self._line('{}'.format(self.bio_frac),        'Fraction of biomass in total organic C'))
-        lines.append(self._line('{}'.format(self.min_n_lvl),
-                                        'Minimum level of nitrate in soil [kgN/ha/50cm layer]'))
-        lines.append(self._line('{}'.format(self.k_bio),         'Rate constant for biomass decomposition [/year]'))
-        lines.append(self._line('{}'.format(self.k_hum),         'Rate constant for humus decomposition [/year]'))
-        lines.append(self._line('{}'.format(self.soc),           'Total organic C in top 50 cm of soil [kgC/ha]'))
-        lines.append(self._line('{}'.format(self.iom_c),         'Inert organic matter in top 50 cm of soil [kgC/ha]'))
-        lines.append(self._line('{}'.format(self.prev_lu),
-                                        'Land use before equilibrium run (1=arable, 2=grass, 3=forestry, 4=natural'))
-        lines.append(self._line('{}'.format(round(float(self.clay),1)), 'Clay content [proportion]'))
-        lines.append(self._line('{}'.format(self.soil_depth),           'Depth of soil used in initialisation [cm]'))
-        lines.append(self._line('{}'.format(round(float(self.ph),1)),   'pH of soil '))
-        lines.append(self._line('{}'.format(self.ph_zero_decomp), 'pH at which decomposition has declined to zero'))
-        lines.append(self._line('{}'.format(self.ph_decline_decomp), 'pH at which decomposition starts to decline'))
-        lines.append(self._line('{}'.format(round(float(self.bulk_dens),1)), 'bulk denisty [g/cm3]'))
-        lines.append(self._line('{}'.format(self.awc_sat),        'Available water content at saturation [mm/0-25cm]'))
-        lines.append(self._line('{}'.format(self.wc_wp),          'Water content at wilting point [mm/0-25cm]'))
-
-        with open(join(directory, 'soil.txt'), 'w') as file:
-            file.writelines(lines)
+        lines are produced from a precompiled template - see line_template_class
+        """
+        lines = fetch_line_template(self.spacer_len, SOIL_COMMENTS).fill([self.soil_name, self.soil_code,
+                    self.awc_fc, self.biohum_stable_n2c, self.biohum_frac, self.biohum_from_bio, self.biohum_from_hum,
+                    self.bio_frac, self.min_n_lvl, self.k_bio, self.k_hum, self.soc, self.iom_c, self.prev_lu,
+                    round(float(self.clay),1), self.soil_depth, round(float(self.ph),1), self.ph_zero_decomp,
+                    self.ph_decline_decomp, round(float(self.bulk_dens),1), self.awc_sat, self.wc_wp])
+
+        return lines
 '''
 other classes
 =============
@@ -14,11 +14,16 @@ __version__ = '0.0.0'
 # ---------------
 # 
 from os.path import join, normpath, split, splitext
+from copy import copy
 from netCDF4 import Dataset
 from glob import glob
 
 WARNING_STR = '*** Warning *** '
 
+# fertiliser datasets read for each cell by make_fert_recs - these are not crop specific
+# =====================================================================================
+FERT_PRELOAD_METRICS = list(['TN_input_1961_2010', 'Ninput_date_ver1', 'NH4_fraction_ver1'])
+
 def create_proj_data_defns(project_path, crop_name, req_resol_deg):
     """
 
@@ -90,6 +95,96 @@ def open_proj_NC_sets(mask_defn, yield_defn, dates_defn, fert_defns):
 
     return
 
+def _aoi_window(defn, lat_min, lat_max, lon_min, lon_max):
+    """
+    return the index window, padded by one cell and clipped to the dataset extent, which encloses the AOI
+    """
+    lat_indx1, lon_indx1, dummy = defn.get_nc_coords(lat_min, lon_min)
+    lat_indx2, lon_indx2, dummy = defn.get_nc_coords(lat_max, lon_max)
+
+    lat_indx_min = max(min(lat_indx1, lat_indx2) - 1, 0)
+    lat_indx_max = min(max(lat_indx1, lat_indx2) + 1, defn.max_lat_indx)
+    lon_indx_min = max(min(lon_indx1, lon_indx2) - 1, 0)
+    lon_indx_max = min(max(lon_indx1, lon_indx2) + 1, defn.max_lon_indx)
+
+    return lat_indx_min, lat_indx_max, lon_indx_min, lon_indx_max
+
+def _aoi_extent(mask_defn, lat_ll_indx, lon_ll_indx, lat_ur_indx, lon_ur_indx):
+    """
+    return latitude and longitude limits of the AOI from mask indices
+    """
+    lat_min = min(mask_defn.lats[lat_ll_indx], mask_defn.lats[lat_ur_indx])
+    lat_max = max(mask_defn.lats[lat_ll_indx], mask_defn.lats[lat_ur_indx])
+    lon_min = min(mask_defn.lons[lon_ll_indx], mask_defn.lons[lon_ur_indx])
+    lon_max = max(mask_defn.lons[lon_ll_indx], mask_defn.lons[lon_ur_indx])
+
+    return lat_min, lat_max, lon_min, lon_max
+
+def preload_proj_NC_slabs(mask_defn, yield_defn, dates_defn, lat_ll_indx, lon_ll_indx, lat_ur_indx, lon_ur_indx):
+    """
+    read the mask, yield and sowing/harvest layers once for the AOI so that per cell lookups are served from memory
+    NB  sets must already be open; indices are those of the mask which the yields share
+    """
+    lat_min, lat_max, lon_min, lon_max = _aoi_extent(mask_defn, lat_ll_indx, lon_ll_indx, lat_ur_indx, lon_ur_indx)
+
+    for defn, var_names in zip(list([mask_defn, yield_defn, dates_defn]),
+                                                    list([['cropmask'], [yield_defn.var_name], ['plant', 'harvest']])):
+        window = _aoi_window(defn, lat_min, lat_max, lon_min, lon_max)
+        defn.read_aoi_slabs(var_names, *window)
+
+    return
+
+# fertiliser cubes held by this process, keyed by NC file name, variable name and AOI window
+# ==========================================================================================
+_fert_cubes = {}
+
+def preload_fert_cubes(fert_defns, mask_defn, lat_ll_indx, lon_ll_indx, lat_ur_indx, lon_ur_indx):
+    """
+    read the full time series of each fertiliser dataset used by make_fert_recs once for the AOI
+    cubes are retained so that subsequent runs for other crops over the same AOI do not read them again
+    NB  sets must already be open; indices are those of the mask
+    """
+    lat_min, lat_max, lon_min, lon_max = _aoi_extent(mask_defn, lat_ll_indx, lon_ll_indx, lat_ur_indx, lon_ur_indx)
+
+    for metric in FERT_PRELOAD_METRICS:
+        if metric not in fert_defns:
+            continue
+
+        defn = fert_defns[metric]
+        var_name = defn.var_names[0]
+        window = _aoi_window(defn, lat_min, lat_max, lon_min, lon_max)
+        key = (defn.nc_fname, var_name, window)
+        if key not in _fert_cubes:
+            for old_key in [old_key for old_key in _fert_cubes if old_key[:2] == key[:2]]:
+                del _fert_cubes[old_key]    # only the most recent AOI is retained
+
+            _fert_cubes[key] = defn.read_aoi_cube(var_name, *window)
+
+        defn.aoi_cubes[var_name] = window, _fert_cubes[key]
+
+    return
+
+def detach_proj_NC_sets(mask_defn, yield_defn, dates_defn, fert_defns):
+    """
+    return copies of the project definitions, including any AOI slabs, without netCDF handles
+    so that they can be passed to worker processes which then open their own sets
+    fertiliser cubes are not copied since these are large - each worker reads its own, see preload_fert_cubes
+    """
+    defns = []
+    for defn in list([mask_defn, yield_defn, dates_defn]):
+        defn = copy(defn)
+        defn.nc_dset = None
+        defns.append(defn)
+
+    wrkr_fert_defns = {}
+    for metric in fert_defns:
+        wrkr_fert_defns[metric] = copy(fert_defns[metric])
+        wrkr_fert_defns[metric].nc_dset = None
+        wrkr_fert_defns[metric].aoi_cubes = {}
+    defns.append(wrkr_fert_defns)
+
+    return tuple(defns)
+
 def close_proj_NC_sets(mask_defn, yield_defn, dates_defn, fert_defns):
 
     mask_defn.nc_dset.close()
@@ -176,6 +271,12 @@ class ManagementSet(object, ):
                     self.var_name = var_name
         self.nc_dset   = None
 
+        # AOI slabs held in memory - see read_aoi_slabs
+        # =============================================
+        self.aoi_slabs  = {}
+        self.aoi_window = None
+        self.aoi_cubes  = {}        # time series for the AOI - see read_aoi_cube
+
         # resolutions
         # ===========
         self.resol_lon = (lons[-1] - lons[0])/(len(lons) - 1)
@@ -203,3 +304,64 @@ class ManagementSet(object, ):
             ret_code = WARNING_STR + 'longitude index {} out of bounds for longitude {}\tmax indx: {}'.format(lon_indx,
                                                                                 round(longitude, 4), self.max_lon_indx)
         return lat_indx, lon_indx, ret_code
+
+    def read_aoi_slabs(self, var_names, lat_indx_min, lat_indx_max, lon_indx_min, lon_indx_max):
+        """
+        read each variable for the AOI window in a single call, retaining masked values
+        """
+        lat_indx_min, lon_indx_min = max(lat_indx_min, 0), max(lon_indx_min, 0)
+        lat_indx_max, lon_indx_max = min(lat_indx_max, self.max_lat_indx), min(lon_indx_max, self.max_lon_indx)
+
+        self.aoi_slabs = {}
+        self.aoi_window = lat_indx_min, lat_indx_max, lon_indx_min, lon_indx_max
+        for var_name in var_names:
+            self.aoi_slabs[var_name] = \
+                    self.nc_dset.variables[var_name][lat_indx_min:lat_indx_max + 1, lon_indx_min:lon_indx_max + 1]
+
+    def fetch_aoi_array(self, var_name, lat_indx_min, lat_indx_max, lon_indx_min, lon_indx_max):
+        """
+        return window of variable, inclusive of the maximum indices, taken from the AOI slab if it encloses the window
+        """
+        if var_name in self.aoi_slabs:
+            wndw_lat_min, wndw_lat_max, wndw_lon_min, wndw_lon_max = self.aoi_window
+            if wndw_lat_min <= lat_indx_min and lat_indx_max <= wndw_lat_max and \
+                                                    wndw_lon_min <= lon_indx_min and lon_indx_max <= wndw_lon_max:
+                return self.aoi_slabs[var_name][lat_indx_min - wndw_lat_min:lat_indx_max - wndw_lat_min + 1,
+                                                lon_indx_min - wndw_lon_min:lon_indx_max - wndw_lon_min + 1]
+
+        return self.nc_dset.variables[var_name][lat_indx_min:lat_indx_max + 1, lon_indx_min:lon_indx_max + 1]
+
+    def fetch_aoi_val(self, var_name, lat_indx, lon_indx):
+        """
+        return value for this cell from the AOI slab, falling back to the NC file if cell lies outside the window
+        """
+        if var_name in self.aoi_slabs:
+            lat_indx_min, lat_indx_max, lon_indx_min, lon_indx_max = self.aoi_window
+            if lat_indx_min <= lat_indx <= lat_indx_max and lon_indx_min <= lon_indx <= lon_indx_max:
+                return self.aoi_slabs[var_name][lat_indx - lat_indx_min, lon_indx - lon_indx_min]
+
+        return self.nc_dset.variables[var_name][lat_indx, lon_indx]
+
+    def read_aoi_cube(self, var_name, lat_indx_min, lat_indx_max, lon_indx_min, lon_indx_max):
+        """
+        read all time steps of a variable for the AOI window in a single call, retaining masked values
+        """
+        lat_indx_min, lon_indx_min = max(lat_indx_min, 0), max(lon_indx_min, 0)
+        lat_indx_max, lon_indx_max = min(lat_indx_max, self.max_lat_indx), min(lon_indx_max, self.max_lon_indx)
+
+        window = lat_indx_min, lat_indx_max, lon_indx_min, lon_indx_max
+        cube = self.nc_dset.variables[var_name][:, lat_indx_min:lat_indx_max + 1, lon_indx_min:lon_indx_max + 1]
+        self.aoi_cubes[var_name] = window, cube
+
+        return cube
+
+    def fetch_aoi_series(self, var_name, lat_indx, lon_indx):
+        """
+        return time series for this cell as a view of the AOI cube, falling back to the NC file if cell lies outside
+        """
+        if var_name in self.aoi_cubes:
+            (lat_indx_min, lat_indx_max, lon_indx_min, lon_indx_max), cube = self.aoi_cubes[var_name]
+            if lat_indx_min <= lat_indx <= lat_indx_max and lon_indx_min <= lon_indx <= lon_indx_max:
+                return cube[:, lat_indx - lat_indx_min, lon_indx - lon_indx_min]
+
+        return self.nc_dset.variables[var_name][:, lat_indx, lon_indx]
@@ -0,0 +1,57 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        pet_batch_fns.py
+# Purpose:     Thornthwaite (1948) potential evapotranspiration for many cells in a single set of NumPy operations
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'pet_batch_fns.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from numpy import arange, arccos, array, asarray, clip, cumsum, deg2rad, errstate, pi, power, sin, tan, where, zeros
+
+MONTH_DAYS = array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+def monthly_mean_daylight_hours(lats):
+    """
+    mean daylight hours for each month of a non leap year, one row per latitude in degrees
+    from the solar declination and sunset hour angle for each day of the year as in FAO-56
+    """
+    lats_rad = deg2rad(asarray(lats, dtype=float))
+    doys = arange(1, 366)
+    sol_decs = 0.409*sin((2*pi/365)*doys - 1.39)
+
+    sunset_angles = arccos(clip(-tan(lats_rad)[:, None]*tan(sol_decs)[None, :], -1.0, 1.0))
+    daylight_hrs = (24.0/pi)*sunset_angles
+
+    mnth_ends = cumsum(MONTH_DAYS)
+    mnth_strts = mnth_ends - MONTH_DAYS
+    mean_dlh = zeros((len(lats_rad), 12))
+    for imnth, (strt, end) in enumerate(zip(mnth_strts, mnth_ends)):
+        mean_dlh[:, imnth] = daylight_hrs[:, strt:end].mean(axis=1)
+
+    return mean_dlh
+
+def thornthwaite_batch(tmeans, lats):
+    """
+    tmeans: monthly mean temperatures [deg C], one row of 12 values per cell
+    lats: latitude of each cell [deg]
+    returns monthly PET [mm] with the same shape as tmeans; negative temperatures contribute no PET
+    """
+    tmeans = clip(asarray(tmeans, dtype=float), 0.0, None)
+    mean_dlh = monthly_mean_daylight_hours(lats)
+
+    heat_indx = power(tmeans/5.0, 1.514).sum(axis=1)
+    expnt = (6.75e-07*heat_indx**3) - (7.71e-05*heat_indx**2) + (1.792e-02*heat_indx) + 0.49239
+
+    # cells with no month above zero have no PET
+    # ==========================================
+    with errstate(divide='ignore', invalid='ignore'):
+        ratio = where(heat_indx[:, None] > 0.0, 10.0*tmeans/heat_indx[:, None], 0.0)
+        pet = 1.6*(mean_dlh/12.0)*(MONTH_DAYS/30.0)*power(ratio, expnt[:, None])*10.0
+
+    return pet
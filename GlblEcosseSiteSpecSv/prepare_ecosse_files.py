@@ -11,17 +11,32 @@ __version__ = '1.0.00'
 __prog__ = 'prepare_ecosse_files.py'
 
 from os import makedirs
+from copy import deepcopy
 from os.path import isdir, basename, join, isdir
-from shutil import copyfile
 from glbl_ecss_cmmn_funcs import write_kml_file, write_signature_file, write_manifest_file
+from file_link_fns import link_or_copy
+from async_writer_class import run_jobs
+
+def _make_sim_dir(sim_dir):
+    """
+    C
+    """
+    if not isdir(sim_dir):
+        makedirs(sim_dir)
 
 def make_ecosse_files(site, climgen, soil_defn, fert_recs, plant_day, harvest_day, yield_val,
-                                                                                hist_lta_recs, met_fnames):
+                                                            hist_lta_recs, met_fnames, defer_flag=False, shard=None):
     """
     generate sets of Ecosse files for each site
     where each site has one or more soils and each soil can have one or more dominant soils
     pettmp_grid_cell is climate data for this soil grid point
+    file contents are formatted as jobs which are run here or, if defer_flag is set, returned for an AsyncWriter
+    deferred jobs are given copies of the soil records since soil_defn is repopulated for the next cell
+    if a shard is supplied then management, soil and site files are written directly to the shard and remaining
+    files of the simulation directories of this cell, written by common functions, are moved to it
     """
+    jobs = []
+    sim_dirs = []
     gran_lat = soil_defn.gran_lat
     gran_lon = soil_defn.gran_lon
     lat = float(soil_defn.lat)
@@ -50,37 +65,54 @@ def make_ecosse_files(site, climgen, soil_defn, fert_recs, plant_day, harvest_da
             print('Error {} processing cell at lat: {} Lon: {}'.format(err, lat, lon))
             continue
 
+        if defer_flag:
+            soil_list = deepcopy(soil_list)
+
         for soil_num, soil in enumerate(soil_list):
             identifer = 'lat{0:0=7d}_lon{1:0=7d}_mu{2:0=5d}_s{3:0=2d}'.format(gran_lat, gran_lon,
                                                                               mu_global, soil_num + 1)
             sim_dir = join(site.sims_dir, climgen.region_study, identifer)
-            if not isdir(sim_dir):
-                makedirs(sim_dir)
+            jobs.append((_make_sim_dir, (sim_dir,)))
+            sim_dirs.append(sim_dir)
 
             site.create_site_soil_layers(soil)
             if soil_num == 0:       # MJM 2021_05_14 - only required once
                 site.data_modify_mnthly(lat, lon, climgen, met_fnames, fert_recs, plant_day, harvest_day, yield_val)
-            site.write_sim_files(sim_dir, soil, hist_lta_recs, met_rel_path)
+            if shard is None:
+                jobs += site.sim_file_jobs(sim_dir, soil, hist_lta_recs, met_rel_path)
+            else:
+                jobs.append((shard.add_sim_buffers, (identifer, site.sim_file_buffers(hist_lta_recs, met_rel_path),
+                                                                                site.avemet_source(met_rel_path))))
 
             # write kml and signature files
             # ==============================
             if soil_num == 0:
-                write_kml_file(sim_dir, str(mu_global), mu_global, lat, lon)
+                jobs.append((write_kml_file, (sim_dir, str(mu_global), mu_global, lat, lon)))
 
-            write_signature_file(sim_dir, mu_global, soil, lat, lon, climgen.region)
+            jobs.append((write_signature_file, (sim_dir, mu_global, soil, lat, lon, climgen.region)))
+
+            # copy or link across Ecosse dat files - these are placed when a shard is unpacked
+            # ================================================================================
+            if shard is not None:
+                continue
 
-            # copy across Ecosse dat files
-            # ============================
             for key_fname in site.dflt_ecosse_fnames.items():
                 key, inp_fname = key_fname
                 out_fname = join(sim_dir, basename(inp_fname))
-                copyfile(inp_fname, out_fname)
+                jobs.append((link_or_copy, (inp_fname, out_fname, site.link_mode)))
 
         # manifest file is essential for subsequent processing
         # ====================================================
-        write_manifest_file(climgen.region_study, climgen.fut_clim_scen, sim_dir,
-                                            soil_list, mu_global, lat, lon, area_for_soil)
+        jobs.append((write_manifest_file, (climgen.region_study, climgen.fut_clim_scen, sim_dir,
+                                            soil_list, mu_global, lat, lon, area_for_soil)))
     # end of Soil loop
     # ================
+    if shard is not None:
+        jobs.append((shard.add_sim_dirs, (sim_dirs, list(site.dflt_ecosse_fnames.values()))))
+
+    if defer_flag:
+        return jobs
+
+    run_jobs(jobs)
 
     return
@@ -0,0 +1,141 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        run_settings_class.py
+# Purpose:     immutable snapshot of the run settings, taken once per run, from which ClimGenNC and MakeSiteFiles
+#              objects are created without reading Qt widgets
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'run_settings_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from copy import copy
+
+def _crop_rotation(iyr, climgen, rota_pattern, rota_flag):
+    """
+    return crop name and code for this year
+    """
+    crop_code = climgen.crop_codes[0]
+    crop_name = climgen.crop_names[0]
+
+    if rota_pattern is not None and rota_flag:
+        if iyr >= rota_pattern['start_year']:
+
+            crop_names = list(rota_pattern['crops'].keys())
+            n_rota_crops = len(crop_names)
+            i_rota = iyr % n_rota_crops
+
+            crop_name = crop_names[i_rota]
+            crop_code = rota_pattern['crops'][crop_name]
+
+    return crop_name, crop_code
+
+def _cultivations_by_year(cultiv_pattern, nyears):
+    """
+    return cultivation type, vigour and residues incorporated flag for each year
+    """
+    cultivs = []
+    if cultiv_pattern is None:
+        return cultivs
+
+    cultiv_iter = iter(cultiv_pattern.keys())
+    change_year = 0  # initialise to zero to force a read of the cultivation pattern
+    this_key = next(cultiv_iter)
+    for iyr in range(nyears):
+        if iyr >= change_year:
+            cultiv = tuple(cultiv_pattern[this_key])  # read the cultivation pattern
+            try:
+                this_key = next(cultiv_iter)  # get the next year when there is a change
+                change_year = int(this_key)
+            except StopIteration:
+                change_year = 99999
+
+        cultivs.append(cultiv)
+
+    return cultivs
+
+class RunSettings(object):
+    """
+    widget values and setup items are read once; per year tables, which depend on the simulation years and crop,
+    are added by with_tables once the ClimGenNC object exists
+    attributes cannot be assigned after creation so that one snapshot can be shared by all cells, threads and workers
+    """
+    def __init__(self, form):
+        """
+        C
+        """
+        values = {}
+        if hasattr(form, 'w_equimode'):
+            values['equil_mode'] = form.w_equimode.text()
+            values['manure_flag'] = form.w_manure.isChecked()
+        else:
+            values['equil_mode'] = form.equimode
+            values['manure_flag'] = False
+
+        if hasattr(form, 'w_crop_rota'):
+            values['rota_flag'] = form.w_crop_rota.isChecked()
+        else:
+            values['rota_flag'] = False
+
+        # adjust planting and harvest day to simulate perennial crops
+        # ===========================================================
+        year_from = int(form.w_yr_from.text())
+        values['year_from'] = year_from
+        values['peren_yr'] = year_from if form.w_use_peren.isChecked() else None
+        values['manure_yr'] = year_from if form.w_manure.isChecked() else 0
+
+        # weather
+        # =======
+        values['sim_mnthly_flag'] = form.w_mnthly.isChecked()
+        values['wthr_rsrce'] = form.w_combo10w.currentText()
+        values['fut_clim_scen'] = form.w_combo10.currentText()
+        values['hist_start_year'] = int(form.w_combo09s.currentText())
+        values['hist_end_year'] = int(form.w_combo09e.currentText())
+
+        values['sims_dir'] = form.setup['sims_dir']
+        values['wthr_prj_dir'] = form.setup['wthr_prj_dir']
+        values['link_mode'] = form.setup['link_mode']
+        values['dflt_ecosse_fnames'] = form.dflt_ecosse_fnames
+        values['cultiv_pattern'] = form.cultiv_pattern
+        values['rota_pattern'] = form.rota_pattern
+
+        # per year tables - see with_tables
+        # =================================
+        values['nyears'] = None
+        values['residues_incorp'] = None
+        values['crop_rotation'] = None
+        values['cultivations'] = None
+
+        self.__dict__.update(values)
+
+    def __setattr__(self, name, value):
+        """
+        C
+        """
+        raise AttributeError('run settings are read only - cannot assign ' + name)
+
+    def with_tables(self, climgen):
+        """
+        return copy of these settings with residue, rotation and cultivation tables for each simulation year
+        rotation table is only required, and can only be made, when the ClimGenNC object is for a crop
+        """
+        nyears = climgen.sim_end_year - climgen.sim_start_year + 1
+        cultivs = _cultivations_by_year(self.cultiv_pattern, nyears)
+        if climgen.crop_codes is None:
+            crop_rotation = None
+        else:
+            crop_rotation = tuple([_crop_rotation(iyr, climgen, self.rota_pattern, self.rota_flag)
+                                                                                        for iyr in range(nyears)])
+        tables = {'nyears': nyears,
+                  'residues_incorp': tuple([residue_incorp for dummy, dummy, residue_incorp in cultivs]),
+                  'crop_rotation': crop_rotation,
+                  'cultivations': tuple([(cult_type, cult_vigor) for cult_type, cult_vigor, dummy in cultivs])}
+
+        run_settings = copy(self)
+        run_settings.__dict__.update(tables)
+
+        return run_settings
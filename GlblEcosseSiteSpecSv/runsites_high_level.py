@@ -14,10 +14,13 @@ __version__ = '0.0.0'
 # Version history
 # ---------------
 # 
-from os.path import join, normpath
+from os.path import join, normpath, isdir
 from os import system
+from shutil import rmtree
 from json import load as json_load, dump as json_dump
 
+from sims_archive_class import SimsArchive, RUN_SUFFIX
+
 def run_ecosse_wrapper(form):
     """
     C
@@ -25,15 +28,55 @@ def run_ecosse_wrapper(form):
 
     # components of the command string exist have been checked at initiation
     # ======================================================================
-    write_runsites_config_file(form)
+    cmd_str = form.setup['python_exe'] + ' ' + form.setup['runsites_py'] + ' ' + form.setup['runsites_config_file']
+
+    if form.setup['sims_archive_flag']:
+        _run_ecosse_by_shard(form, cmd_str)
+        return
 
     # run the script which runs ECOSSE with the simulation files
-    cmd_str = form.setup['python_exe'] + ' ' + form.setup['runsites_py'] + ' ' + form.setup['runsites_config_file']
+    write_runsites_config_file(form)
     system(cmd_str)
 
-def write_runsites_config_file(form):
+def _run_ecosse_by_shard(form, cmd_str):
     """
-    C
+    simulations held in a sharded archive must be unpacked since ECOSSE reads simulation directories - to limit
+    disk usage each shard is unpacked to a run directory, run and its outputs moved to the study directory
+    """
+    study_dir = normpath(join(form.setup['sims_dir'], form.setup['region_study']))
+    run_dir = study_dir + RUN_SUFFIX
+    sims_archive = SimsArchive(study_dir)
+
+    for identifiers in sims_archive.shard_identifiers():
+        if isdir(run_dir):
+            rmtree(run_dir)
+
+        sim_dirs = {}
+        for identifier in identifiers:
+            sim_dir = sims_archive.extract_sim(identifier, form.setup['link_mode'], out_dir=run_dir)
+            if sim_dir is not None:
+                sim_dirs[identifier] = sim_dir
+
+        if len(sim_dirs) == 0:
+            continue
+
+        print('Unpacked {} simulations from archive to {}'.format(len(sim_dirs), run_dir))
+        if not write_runsites_config_file(form, run_dir):
+            break
+        system(cmd_str)
+
+        for identifier, sim_dir in sim_dirs.items():
+            sims_archive.retire_sim(identifier, sim_dir)
+
+    sims_archive.close()
+    if isdir(run_dir):
+        rmtree(run_dir)
+
+    write_runsites_config_file(form)    # leave config referring to the study directory
+
+def write_runsites_config_file(form, sims_dir=None):
+    """
+    sims_dir, if supplied, replaces the study directory as the simulation location
     """
 
     # read the runsites config file and edit one line
@@ -49,7 +92,8 @@ def write_runsites_config_file(form):
 
     # overwrite config file  TODO:  # config['Simulations']['resume_frm_prev'] = form.w_skip_sites.isChecked()
     # =====================
-    sims_dir = normpath(join(form.setup['sims_dir'], form.setup['region_study']))
+    if sims_dir is None:
+        sims_dir = normpath(join(form.setup['sims_dir'], form.setup['region_study']))
     crop_name = form.w_combo00b.currentText()
     config['General']['cropName'] = crop_name
     config['Simulations']['sims_dir'] = sims_dir
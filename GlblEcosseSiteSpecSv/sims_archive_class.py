@@ -0,0 +1,269 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        sims_archive_class.py
+# Purpose:     sharded archive of simulation directories - one zip file, with an index, for each latitude band
+#              in place of a directory of small files for each soil, together with unpack on demand for ECOSSE runs
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'sims_archive_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from os import listdir, makedirs, remove, replace, linesep
+from os.path import basename, isdir, isfile, join, normpath
+from shutil import rmtree
+from zipfile import ZipFile, ZIP_DEFLATED, BadZipFile
+from json import dump as json_dump, load as json_load, JSONDecodeError
+from threading import Lock
+from locale import getpreferredencoding
+
+from file_link_fns import link_or_copy
+
+WARNING_STR = '*** Warning *** '
+
+SHARDS_SUFFIX = '_shards'
+SHARD_SUFFIX = '.zip'
+INDEX_SUFFIX = '_index.json'
+PART_SUFFIX = '.part'
+RUN_SUFFIX = '_run'
+
+def _shards_dir(study_dir):
+    """
+    shards are kept alongside, not within, the study directory so that they are not mistaken for simulations
+    """
+    return normpath(study_dir) + SHARDS_SUFFIX
+
+class SimsShard(object):
+    """
+    simulation files of one latitude band - management, soil and site files are added from their formatted contents
+    whereas files written by common functions are added once the directory is complete and the directory is then
+    removed; members are named identifier/file name
+    the shard is written to a .part file which is renamed, and its index written, only when the band is complete
+    """
+    def __init__(self, sims_dir, region_study, lat_indx):
+        """
+        C
+        """
+        study_dir = join(sims_dir, region_study)
+        shards_dir = _shards_dir(study_dir)
+        shard_root = join(shards_dir, '{}_band{:0=5d}'.format(basename(normpath(study_dir)), lat_indx))
+
+        self.shards_dir = shards_dir
+        self.shard_fn = shard_root + SHARD_SUFFIX
+        self.index_fn = shard_root + INDEX_SUFFIX
+        self.zip_obj = None
+        self.lock = Lock()      # directories may be added by writer threads
+        self.sims = {}          # key: simulation identifier, value: list of file names
+        self.avemet_fnames = {} # key: simulation identifier, value: AVEMET.DAT of weather cell
+        self.dflt_fnames = []   # default ECOSSE files which are placed in each simulation directory when unpacked
+
+    def _open(self):
+        """
+        call with lock held
+        """
+        if self.zip_obj is None:
+            if not isdir(self.shards_dir):
+                makedirs(self.shards_dir, exist_ok=True)
+            self.zip_obj = ZipFile(self.shard_fn + PART_SUFFIX, 'w', compression=ZIP_DEFLATED)
+
+    def add_sim_buffers(self, identifier, buffers, avemet_fname):
+        """
+        buffers: file name, contents and newline argument as would be passed to open - contents are encoded
+        as they would be written to a file; AVEMET.DAT is placed when the simulation is unpacked
+        """
+        encoding = getpreferredencoding(False)
+        contents = []
+        for fname, buffer, newline in buffers:
+            if newline is None:
+                buffer = buffer.replace('\n', linesep)
+            contents.append((fname, buffer.encode(encoding)))
+
+        with self.lock:
+            self._open()
+            for fname, content in contents:
+                self.zip_obj.writestr(identifier + '/' + fname, content)
+            self.sims.setdefault(identifier, []).extend([fname for fname, dummy in contents])
+            self.avemet_fnames[identifier] = avemet_fname
+
+    def add_sim_dirs(self, sim_dirs, dflt_fnames):
+        """
+        files written to the simulation directories e.g. kml, signature and manifest files
+        default ECOSSE files, being identical for all simulations, are not archived but recorded in the index
+        """
+        sim_files = []
+        for sim_dir in sim_dirs:
+            identifier = basename(normpath(sim_dir))
+            fnames = sorted(listdir(sim_dir))
+            contents = []
+            for fname in fnames:
+                with open(join(sim_dir, fname), 'rb') as fobj:
+                    contents.append(fobj.read())
+
+            sim_files.append((identifier, fnames, contents))
+
+        with self.lock:
+            self._open()
+            for identifier, fnames, contents in sim_files:
+                for fname, content in zip(fnames, contents):
+                    self.zip_obj.writestr(identifier + '/' + fname, content)
+                self.sims.setdefault(identifier, []).extend(fnames)
+            self.dflt_fnames = list(dflt_fnames)
+
+        for sim_dir in sim_dirs:
+            rmtree(sim_dir)
+
+    def close(self):
+        """
+        complete the shard and write its index - bands with no simulations have no shard
+        """
+        if self.zip_obj is None:
+            return
+
+        self.zip_obj.close()
+        self.zip_obj = None
+        replace(self.shard_fn + PART_SUFFIX, self.shard_fn)
+
+        index = {'shard_fn': basename(self.shard_fn), 'dflt_fnames': self.dflt_fnames, 'sims': self.sims,
+                 'avemet_fnames': self.avemet_fnames}
+        with open(self.index_fn, 'w') as findx:
+            json_dump(index, findx)
+
+class SimsArchive(object):
+    """
+    read only view of all shards of a study, for use by the ECOSSE runner, in which each simulation directory is
+    unpacked on demand from the shard identified by the shard indices
+    """
+    def __init__(self, study_dir):
+        """
+        C
+        """
+        self.study_dir = normpath(study_dir)
+        self.shards_dir = _shards_dir(study_dir)
+        self.shards = []        # shard index records
+        self.sims = {}          # key: simulation identifier, value: index into shards
+        self.zip_objs = {}      # shards opened so far
+
+        if not isdir(self.shards_dir):
+            print(WARNING_STR + 'no simulation archive for ' + self.study_dir)
+            return
+
+        for fname in sorted(listdir(self.shards_dir)):
+            if not fname.endswith(INDEX_SUFFIX):
+                continue
+
+            try:
+                with open(join(self.shards_dir, fname), 'r') as findx:
+                    index = json_load(findx)
+            except (OSError, IOError, JSONDecodeError) as err:
+                print(WARNING_STR + str(err) + ' reading shard index ' + fname)
+                continue
+
+            indx = len(self.shards)
+            self.shards.append(index)
+            for identifier in index['sims']:
+                self.sims[identifier] = indx
+
+    def _zip_obj(self, indx):
+        """
+        C
+        """
+        if indx not in self.zip_objs:
+            self.zip_objs[indx] = ZipFile(join(self.shards_dir, self.shards[indx]['shard_fn']), 'r')
+
+        return self.zip_objs[indx]
+
+    def extract_sim(self, identifier, link_mode='copy', out_dir=None):
+        """
+        write simulation directory from its shard, by default to the study directory, and return its path
+        or None if the simulation is not in the archive
+        """
+        if identifier not in self.sims:
+            return None
+
+        indx = self.sims[identifier]
+        index = self.shards[indx]
+        if out_dir is None:
+            out_dir = self.study_dir
+        sim_dir = join(out_dir, identifier)
+        if not isdir(sim_dir):
+            makedirs(sim_dir)
+
+        try:
+            zip_obj = self._zip_obj(indx)
+            for fname in index['sims'][identifier]:
+                with open(join(sim_dir, fname), 'wb') as fobj:
+                    fobj.write(zip_obj.read(identifier + '/' + fname))
+        except (OSError, IOError, BadZipFile, KeyError) as err:
+            print(WARNING_STR + str(err) + ' extracting simulation ' + identifier)
+            return None
+
+        for inp_fname in self._placed_fnames(index, identifier):
+            out_fname = join(sim_dir, basename(inp_fname))
+            if not isfile(out_fname):
+                link_or_copy(inp_fname, out_fname, link_mode)
+
+        return sim_dir
+
+    def _placed_fnames(self, index, identifier):
+        """
+        default ECOSSE files and AVEMET.DAT which are placed, rather than extracted, when a simulation is unpacked
+        """
+        inp_fnames = list(index['dflt_fnames'])
+        avemet_fnames = index.get('avemet_fnames', {})
+        if identifier in avemet_fnames:
+            inp_fnames.append(avemet_fnames[identifier])
+
+        return inp_fnames
+
+    def shard_identifiers(self):
+        """
+        return list of simulation identifiers for each shard i.e. latitude band
+        """
+        return [list(index['sims']) for index in self.shards]
+
+    def retire_sim(self, identifier, sim_dir):
+        """
+        remove files of an unpacked simulation which are held in, or placed by, the archive and move the remaining
+        files i.e. ECOSSE outputs to the study directory
+        """
+        index = self.shards[self.sims[identifier]]
+        fnames = index['sims'][identifier] + [basename(fname) for fname in self._placed_fnames(index, identifier)]
+        for fname in fnames:
+            if isfile(join(sim_dir, fname)):
+                remove(join(sim_dir, fname))
+
+        out_dir = join(self.study_dir, identifier)
+        if isdir(out_dir):
+            rmtree(out_dir)
+        elif not isdir(self.study_dir):
+            makedirs(self.study_dir)
+        replace(sim_dir, out_dir)
+
+    def close(self):
+        """
+        C
+        """
+        for zip_obj in self.zip_objs.values():
+            zip_obj.close()
+        self.zip_objs = {}
+
+def unpack_sims_archive(study_dir, identifiers=None, link_mode='copy'):
+    """
+    extract all simulations, or those listed, of a study to the study directory e.g. for runs of ECOSSE or other tools
+    """
+    sims_archive = SimsArchive(study_dir)
+    if identifiers is None:
+        identifiers = list(sims_archive.sims)
+
+    nextracted = 0
+    for identifier in identifiers:
+        if sims_archive.extract_sim(identifier, link_mode) is not None:
+            nextracted += 1
+
+    sims_archive.close()
+
+    return nextracted
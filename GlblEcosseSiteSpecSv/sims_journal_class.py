@@ -0,0 +1,130 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        sims_journal_class.py
+# Purpose:     append-only journal of completed bands and cells enabling interrupted runs to be resumed
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'sims_journal_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from os import fsync, makedirs
+from os.path import isdir, isfile, join
+from json import dumps as json_dumps, loads as json_loads, JSONDecodeError
+from time import strftime
+from threading import Lock
+
+WARNING_STR = '*** Warning *** '
+
+class SimsJournal(object,):
+    """
+    each line of the journal is a JSON record: a start record for each run, then one record for each completed
+    cell and one for each completed latitude band
+    """
+    def __init__(self, sims_dir, study, region, crop_name, resume_flag=False):
+        """
+        when resuming, records from the existing journal are read before it is reopened for appending
+        """
+        if not isdir(sims_dir):
+            makedirs(sims_dir)
+
+        self.fname = join(sims_dir, study + '_journal.txt')
+        self.run_id = {'study': study, 'region': region, 'crop': crop_name}
+        self.bands_done = {}    # key: latitude index, value: counters for the band
+        self.cells_done = {}    # key: latitude index, value: set of longitude indices
+
+        if resume_flag:
+            mode = 'a'
+            if isfile(self.fname):
+                self._read_journal()
+            nbands, ncells = len(self.bands_done), sum([len(lon_set) for lon_set in self.cells_done.values()])
+            print('Resuming from journal {} with {} completed bands and {} cells'.format(self.fname, nbands, ncells))
+        else:
+            mode = 'w'
+
+        self.lock = Lock()      # cells may be recorded by writer threads
+        self.fobj = open(self.fname, mode)
+        self._write_rec(dict(self.run_id, start=strftime('%Y-%m-%d %H:%M:%S')))
+
+    def __getstate__(self):
+        """
+        copies passed to worker processes are read-only since the journal is written only by the main process
+        """
+        state = self.__dict__.copy()
+        state['fobj'] = None
+        state['lock'] = None
+        return state
+
+    def _read_journal(self):
+        """
+        records are only accepted if they follow a start record for the same study, region and crop
+        """
+        accept_flag = False
+        with open(self.fname, 'r') as fobj:
+            for line in fobj:
+                try:
+                    rec = json_loads(line)
+                except JSONDecodeError:
+                    continue        # most likely a partial line written when the run was interrupted
+
+                if 'start' in rec:
+                    accept_flag = (rec['study'], rec['region'], rec['crop']) == \
+                                (self.run_id['study'], self.run_id['region'], self.run_id['crop'])
+                    if not accept_flag:
+                        print(WARNING_STR + 'ignoring journal records for region: {}\tcrop: {}'
+                                                                                .format(rec['region'], rec['crop']))
+                elif accept_flag:
+                    if 'band' in rec:
+                        self.bands_done[rec['band']] = rec['counters']
+                        self.cells_done.pop(rec['band'], None)
+                    elif 'cell' in rec:
+                        lat_indx, lon_indx = rec['cell']
+                        if lat_indx not in self.cells_done:
+                            self.cells_done[lat_indx] = set()
+                        self.cells_done[lat_indx].add(lon_indx)
+
+    def _write_rec(self, rec, sync_flag=False):
+        """
+        C
+        """
+        if self.fobj is None:
+            return
+
+        with self.lock:
+            self.fobj.write(json_dumps(rec) + '\n')
+            self.fobj.flush()
+            if sync_flag:
+                fsync(self.fobj.fileno())
+
+    def is_cell_done(self, lat_indx, lon_indx):
+        """
+        C
+        """
+        if lat_indx in self.cells_done:
+            return lon_indx in self.cells_done[lat_indx]
+        else:
+            return False
+
+    def record_cell(self, lat_indx, lon_indx):
+        """
+        C
+        """
+        self._write_rec({'cell': [int(lat_indx), int(lon_indx)]})
+
+    def record_band(self, lat_indx, band_counters):
+        """
+        band records are synced to disk as these enable whole bands to be skipped
+        """
+        self._write_rec({'band': int(lat_indx), 'counters': band_counters}, sync_flag=True)
+
+    def close(self):
+        """
+        C
+        """
+        if self.fobj is not None:
+            self.fobj.close()
+            self.fobj = None
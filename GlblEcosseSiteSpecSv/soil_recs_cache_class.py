@@ -0,0 +1,95 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        soil_recs_cache_class.py
+# Purpose:     bounded least recently used cache of HWSD soil records keyed by mu_global
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'soil_recs_cache_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from collections import OrderedDict
+from copy import deepcopy
+
+MAX_CACHE_SIZE = 50000      # number of mu_globals
+
+class SoilRecsCache(object,):
+    """
+    soil records for mu_globals which lack HWSD data are cached as None so that these are not looked up again
+    the cache outlives HWSD objects so such mu_globals are added to bad_muglobals of the HWSD object on each hit
+    """
+    def __init__(self, max_size=MAX_CACHE_SIZE):
+        """
+        C
+        """
+        self.max_size = max_size
+        self.soil_recs = OrderedDict()
+        self.nhits = 0
+        self.nmisses = 0
+
+    def get_soil_recs(self, hwsd, mu_global_pairs):
+        """
+        substitute for hwsd.get_soil_recs - only mu_globals not already cached are passed to the HWSD object
+        """
+        miss_pairs = {}
+        for mu_global in mu_global_pairs:
+            if mu_global in self.soil_recs:
+                self.soil_recs.move_to_end(mu_global)
+                self.nhits += 1
+                if self.soil_recs[mu_global] is None and mu_global not in hwsd.bad_muglobals:
+                    hwsd.bad_muglobals.append(mu_global)
+            else:
+                miss_pairs[mu_global] = mu_global_pairs[mu_global]
+                self.nmisses += 1
+
+        if len(miss_pairs) > 0:
+            new_recs = hwsd.get_soil_recs(miss_pairs)     # updates bad_muglobals
+            if new_recs is None:
+                new_recs = {}
+
+            for mu_global in miss_pairs:
+                self._add(mu_global, new_recs.get(mu_global))
+
+        # callers may modify soil records so copies are returned
+        # ======================================================
+        soil_recs = {}
+        for mu_global in mu_global_pairs:
+            recs = self.soil_recs.get(mu_global)
+            if recs is not None:
+                soil_recs[mu_global] = deepcopy(recs)
+
+        # as for hwsd.get_soil_recs, None signifies that the cell has no usable soil
+        # ===========================================================================
+        if len(soil_recs) == 0:
+            return None
+
+        return soil_recs
+
+    def _add(self, mu_global, recs):
+        """
+        C
+        """
+        self.soil_recs[mu_global] = recs
+        if len(self.soil_recs) > self.max_size:
+            self.soil_recs.popitem(last=False)
+
+    def stats_mess(self):
+        """
+        C
+        """
+        nlookups = self.nhits + self.nmisses
+        if nlookups == 0:
+            hit_rate = 0.0
+        else:
+            hit_rate = round(100*self.nhits/nlookups, 1)
+
+        return 'Soil records cache - size: {}\thits: {}\tmisses: {}\thit rate: {}%'\
+                                                .format(len(self.soil_recs), self.nhits, self.nmisses, hit_rate)
+
+# shared by all cells, bands and studies processed by this process
+# ================================================================
+soil_recs_cache = SoilRecsCache()
@@ -0,0 +1,105 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        startup_cache_class.py
+# Purpose:     cache of tables read at start up e.g. regions workbook, weather dataset details and crop definitions
+#              each entry is valid while the modification times and sizes of its source files are unchanged
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'startup_cache_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from os import stat, replace
+from os.path import join
+from pickle import (load as pickle_load, dump as pickle_dump, dumps as pickle_dumps, HIGHEST_PROTOCOL, PicklingError,
+                                                                                                    UnpicklingError)
+
+WARNING_STR = '*** Warning *** '
+
+CACHE_FNAME = 'glbl_ecss_startup_cache.pkl'     # must not match config file pattern glbl_ecss_site_spec_sv*.json
+CACHE_VERSION = 1
+
+def _source_stamps(source_fnames):
+    """
+    modification time and size of each file or directory - missing sources are recorded as such
+    """
+    stamps = []
+    for fname in source_fnames:
+        try:
+            fstat = stat(fname)
+            stamps.append((fname, fstat.st_mtime_ns, fstat.st_size))
+        except OSError:
+            stamps.append((fname, None, None))
+
+    return stamps
+
+class StartupCache(object):
+    """
+    entries are held as a dictionary, key: table name, value: source stamps and table
+    cache_dir: when None, tables are always read from their sources and nothing is written
+    """
+    def __init__(self, cache_dir=None):
+        """
+        C
+        """
+        self.cache_fname = None if cache_dir is None else join(cache_dir, CACHE_FNAME)
+        self.entries = {}
+        self.nhits = 0
+        self.nmisses = 0
+        self.dirty_flag = False
+
+        if self.cache_fname is None:
+            return
+
+        try:
+            with open(self.cache_fname, 'rb') as fcache:
+                cache = pickle_load(fcache)
+            if cache['version'] == CACHE_VERSION:
+                self.entries = cache['entries']
+        except FileNotFoundError:
+            pass
+        except (OSError, EOFError, UnpicklingError, AttributeError, ImportError, KeyError, TypeError) as err:
+            print(WARNING_STR + str(err) + ' reading startup cache ' + self.cache_fname + ' - will rebuild')
+
+    def fetch(self, key, source_fnames, read_func, *args):
+        """
+        return table from the cache if its sources are unchanged, otherwise read and cache it
+        """
+        stamps = _source_stamps(source_fnames)
+        if key in self.entries and self.entries[key]['stamps'] == stamps:
+            self.nhits += 1
+            return self.entries[key]['table']
+
+        self.nmisses += 1
+        table = read_func(*args)
+        if self.cache_fname is not None:
+            try:
+                pickle_dumps(table, protocol=HIGHEST_PROTOCOL)
+            except (AttributeError, PicklingError, TypeError) as err:
+                print(WARNING_STR + str(err) + ' - ' + key + ' will not be cached')
+                return table
+
+            self.entries[key] = {'stamps': stamps, 'table': table}
+            self.dirty_flag = True
+
+        return table
+
+    def save(self):
+        """
+        write to a temporary file then rename so that an interrupted write does not leave a corrupt cache
+        """
+        if not self.dirty_flag:
+            return
+
+        tmp_fname = self.cache_fname + '.tmp'
+        try:
+            with open(tmp_fname, 'wb') as fcache:
+                pickle_dump({'version': CACHE_VERSION, 'entries': self.entries}, fcache, protocol=HIGHEST_PROTOCOL)
+            replace(tmp_fname, self.cache_fname)
+            self.dirty_flag = False
+        except (OSError, AttributeError, PicklingError, TypeError) as err:
+            print(WARNING_STR + str(err) + ' writing startup cache ' + self.cache_fname)
@@ -0,0 +1,122 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        work_plan_fns.py
+# Purpose:     planning pass which identifies the growing cells of an AOI before simulation files are generated
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'work_plan_fns.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from locale import format_string
+from numpy import (array, diff, flatnonzero, int32, lexsort, load as np_load, logical_and, ma, nonzero, r_, rint,
+                                                                                    savez_compressed, split as np_split)
+from hwsd_soil_class import _gran_coords_from_lat_lon
+
+PLAN_KEYS = ['lat_indx', 'lon_indx', 'gran_lat', 'gran_lon', 'yield_ok', 'dates_ok']
+
+def make_work_plan(mask_defn, yield_defn, dates_defn, lat_ll_indx, lon_ll_indx, lat_ur_indx, lon_ur_indx):
+    """
+    return dictionary of arrays, one element per growing cell, ordered North to South then by longitude index
+    AOI slabs are used when these have been read, see preload_proj_NC_slabs, otherwise the NC sets must be open
+    """
+    lat_ll_indx, lon_ll_indx = max(lat_ll_indx, 0), max(lon_ll_indx, 0)
+    lat_ur_indx, lon_ur_indx = min(lat_ur_indx, mask_defn.max_lat_indx), min(lon_ur_indx, mask_defn.max_lon_indx)
+
+    mask = mask_defn.fetch_aoi_array('cropmask', lat_ll_indx, lat_ur_indx, lon_ll_indx, lon_ur_indx)
+    rows, cols = nonzero(ma.filled(mask, 0) != 0)
+
+    # yield has same resolution as mask
+    # =================================
+    yields = yield_defn.fetch_aoi_array(yield_defn.var_name, lat_ll_indx, lat_ur_indx, lon_ll_indx, lon_ur_indx)
+    yield_ok = ~ma.getmaskarray(yields)[rows, cols]
+
+    lat_indices = rows + lat_ll_indx
+    lon_indices = cols + lon_ll_indx
+    lats = array(mask_defn.lats)[lat_indices]
+    lons = array(mask_defn.lons)[lon_indices]
+
+    # sowing/harvest dates are only available for cells within the extent of the dates dataset
+    # ========================================================================================
+    lat_date_indx = rint((lats - dates_defn.lat_frst)/dates_defn.resol_lat).astype(int)
+    lon_date_indx = rint((lons - dates_defn.lon_frst)/dates_defn.resol_lon).astype(int)
+    dates_ok = logical_and(logical_and(lat_date_indx >= 0, lat_date_indx <= dates_defn.max_lat_indx),
+                           logical_and(lon_date_indx >= 0, lon_date_indx <= dates_defn.max_lon_indx))
+
+    # weather granule coordinates - latitude and longitude are independent so are evaluated per row and per column
+    # ============================================================================================================
+    lon_ref, lat_ref = mask_defn.lons[lon_ll_indx], mask_defn.lats[lat_ll_indx]
+    row_gran_lats = array([_gran_coords_from_lat_lon(lat, lon_ref)[0]
+                                                for lat in mask_defn.lats[lat_ll_indx:lat_ur_indx + 1]], dtype=int32)
+    col_gran_lons = array([_gran_coords_from_lat_lon(lat_ref, lon)[1]
+                                                for lon in mask_defn.lons[lon_ll_indx:lon_ur_indx + 1]], dtype=int32)
+
+    plan = {'lat_indx': lat_indices.astype(int32), 'lon_indx': lon_indices.astype(int32),
+            'gran_lat': row_gran_lats[rows], 'gran_lon': col_gran_lons[cols],
+            'yield_ok': yield_ok, 'dates_ok': dates_ok}
+
+    order = lexsort((plan['lon_indx'], -plan['lat_indx']))
+    for key in PLAN_KEYS:
+        plan[key] = plan[key][order]
+
+    return plan
+
+def band_cells_from_plan(plan):
+    """
+    return dictionary of longitude indices of planned cells with both yields and sowing/harvest dates, keyed by
+    latitude index, and dictionary of the number of cells lacking either, also keyed by latitude index
+    """
+    avail = logical_and(plan['yield_ok'], plan['dates_ok'])
+    band_nunavail = {}
+    for lat_indx in plan['lat_indx'][~avail].tolist():
+        band_nunavail[lat_indx] = band_nunavail.get(lat_indx, 0) + 1
+
+    lat_indices = plan['lat_indx'][avail]
+    if len(lat_indices) == 0:
+        return {}, band_nunavail
+
+    brks = flatnonzero(diff(lat_indices)) + 1
+    band_lat_indices = lat_indices[r_[0, brks]]
+    lon_groups = np_split(plan['lon_indx'][avail], brks)
+
+    band_cells = {int(lat_indx): lon_indices for lat_indx, lon_indices in zip(band_lat_indices, lon_groups)}
+
+    return band_cells, band_nunavail
+
+def report_work_plan(plan):
+    """
+    C
+    """
+    ncells = len(plan['lat_indx'])
+    nbands = len(set(plan['lat_indx'].tolist()))
+    ngrans = len(set(zip(plan['gran_lat'].tolist(), plan['gran_lon'].tolist())))
+    nno_yield = int((~plan['yield_ok']).sum())
+    nno_dates = int((~plan['dates_ok']).sum())
+
+    mess = 'Work plan comprises ' + format_string('%d', ncells, grouping=True) + ' growing cells in '
+    mess += '{} bands and {} weather cells\tcells lacking yields: {}\toutside dates extent: {}'\
+                                                                    .format(nbands, ngrans, nno_yield, nno_dates)
+    print(mess)
+
+    return
+
+def write_work_plan(plan_fname, plan):
+    """
+    C
+    """
+    savez_compressed(plan_fname, **plan)
+
+    return
+
+def read_work_plan(plan_fname):
+    """
+    C
+    """
+    with np_load(plan_fname) as npz_obj:
+        plan = {key: npz_obj[key] for key in PLAN_KEYS}
+
+    return plan
@@ -13,19 +13,31 @@ __version__ = '0.0.1'
 __author__ = 's03mm5'
 
 from time import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from locale import format_string
-from os.path import join, normpath, isdir, split
-from os import listdir, walk, makedirs
+from os.path import join, normpath, isdir, isfile, split, basename
+from os import scandir, makedirs, linesep
+from shutil import rmtree
+from tempfile import mkdtemp
 
 from getClimGenNC import ClimGenNC
 from getClimGenFns import (fetch_WrldClim_data, open_wthr_NC_sets, get_wthr_nc_coords, join_hist_fut_to_sim_wthr)
 from make_site_spec_files_classes import MakeSiteFiles
-from glbl_ecsse_low_level_fns import check_run_mask, set_region_study, update_wthr_progress, update_avemet_progress
+from glbl_ecsse_low_level_fns import (check_run_mask, set_region_study, update_wthr_progress, update_avemet_progress,
+                                                                                                    report_progress)
 from prepare_ecosse_low_level import fetch_long_term_ave_wthr_recs, make_met_files
-from mngmnt_fns_and_class import create_proj_data_defns, open_proj_NC_sets, close_proj_NC_sets
+from mngmnt_fns_and_class import create_proj_data_defns, open_proj_NC_sets, close_proj_NC_sets, detach_proj_NC_sets
+from form_snapshot_class import FormSnapshot
+from run_settings_class import RunSettings
 from hwsd_soil_class import _gran_coords_from_lat_lon
+from wthr_inventory_class import fetch_wthr_inventory, save_wthr_inventories
+from wthr_store_class import fetch_wthr_store, unpack_wthr_store, STORE_SUFFIX, ENCODING as STORE_ENCODING
+from wthr_strip_class import make_wthr_strip_dsets
+from hist_wthr_cache_class import HistWthrCache
 
+from numpy import allclose
 from thornthwaite import thornthwaite
+from pet_batch_fns import thornthwaite_batch
 
 ERROR_STR = '*** Error *** '
 WARNING_STR = '*** Warning *** '
@@ -37,10 +49,13 @@ MAX_BANDS = 500000
 LTA_RECS_FN = 'lta_ave.txt'
 
 SPACER_LEN = 12
+AVEMET_NTHREADS = 8     # threads used to read and write files in AVEMET batch mode
+PET_HOT_TMEAN = 26.5    # Thornthwaite uses a different relation above this monthly mean temperature [deg C]
+NPET_CHECKS = 16        # number of cells, spread by latitude and by temperature, whose batch PET is checked
 
 def generate_all_weather(form):
     """
-    C
+    returns False if weather generation could not proceed
     """
     all_regions = form.w_all_regions.isChecked()
     if all_regions:
@@ -58,7 +73,7 @@ def generate_all_weather(form):
     req_resol_deg = form.req_resol_deg
     if req_resol_deg not in permitted_resols:
         print('Only resolutions of ' + str(permitted_resols) + ' degrees are permitted')
-        return
+        return False
 
     resol_d2 = req_resol_deg/2
 
@@ -67,7 +82,7 @@ def generate_all_weather(form):
     proj_data_defns = create_proj_data_defns(form.setup['proj_path'], crop_name, req_resol_deg)
     if proj_data_defns is None:
         print(ERROR_STR + 'verifing NC files for study ' + form.setup['region_study'])
-        return
+        return False
 
     mask_defn, yield_defn, dates_defn, fert_defns = proj_data_defns
     del proj_data_defns
@@ -83,10 +98,11 @@ def generate_all_weather(form):
     fut_wthr_set = form.weather_set_linkages['WrldClim'][1]
     sim_end_year = form.wthr_sets[fut_wthr_set]['year_end']
 
-    # for each GCM and SSP dataset group e.g. UKESM1-0-LL 585
-    # =======================================================
+    # build list of (GCM, scenario, region) units for each GCM and SSP dataset group e.g. UKESM1-0-LL 585
+    # ======================================================================================================
     print('')
-    ntotal_wrttn = 0
+    run_settings = RunSettings(form)    # widgets are read once for all units
+    wthr_units = []
     for wthr_set in form.weather_set_linkages['WrldClim']:
         this_gcm, scnr = wthr_set.split('_')
         if scnr == 'hist':  # apply filter
@@ -106,137 +122,294 @@ def generate_all_weather(form):
                     print('Ignoring region: ' + region)
                     continue
 
-            mess = '\nProcessing weather set: ' + this_gcm + '\tScenario: ' + scnr + '\tRegion: ' + region
-            mess += '\tCrop: ' + crop_name
-            print(mess)
-
             lon_ll, lon_ur, lat_ll, lat_ur, wthr_dir_abbrv = form.regions_df.iloc[irow][1:]
             bbox = list([lon_ll, lat_ll, lon_ur, lat_ur])
 
             form.setup['region_wthr_dir'] = wthr_dir_abbrv
-            climgen = ClimGenNC(form, region, crop_name, sim_strt_year, sim_end_year, this_gcm, scnr)
-
-            # identify geo-extent for this run
-            # ================================
-            lat_ur_indx, lon_ur_indx, ret_code = mask_defn.get_nc_coords(lat_ur, lon_ur)
-            lat_ll_indx, lon_ll_indx, ret_code = mask_defn.get_nc_coords(lat_ll, lon_ll)
-            lat_ur_indx, ntotal_grow = check_run_mask(mask_defn, lon_ll_indx, lat_ll_indx, lon_ur_indx, lat_ur_indx)
-            if ntotal_grow == 0:
-                print('Nothing to grow for this AOI')
-                return
-
-            nbands = lat_ur_indx - lat_ll_indx + 1
-            print('Will process {} bands'.format(nbands))
-
-            #  open required NC sets
-            # ======================
-
-            open_proj_NC_sets(mask_defn, yield_defn, dates_defn, fert_defns)
-            hist_wthr_dsets, fut_wthr_dsets = open_wthr_NC_sets(climgen)
-            ncmpltd = 0
-            warning_count = 0
-            ngrowing = 0
-            nno_grow = 0
-            nalrdys = 0
-
-            # main AOI traversal loops - outer: North to South, inner: East to West
-            # ========================
-            last_time = time()
-            for nband, lat_indx in enumerate(range(lat_ur_indx, lat_ll_indx - 1, -1)):
-                if nband > MAX_BANDS:
-                    break
-
-                lat = mask_defn.lats[lat_indx]
-
-                ngrow_this_band, nalrdys_this_band, nnodata, noutbnds = 4*[0]
-
-                for lon_indx in range(lon_ll_indx, lon_ur_indx + 1):
-                    lon = mask_defn.lons[lon_indx]
-
-                    mask_val = mask_defn.nc_dset.variables['cropmask'][lat_indx, lon_indx]
-                    crop_grown = int(mask_val.item())
-                    if crop_grown == 0:
-                        nno_grow += 1
-                        continue
+            climgen = ClimGenNC(form, region, crop_name, sim_strt_year, sim_end_year, this_gcm, scnr, run_settings)
+            hist_cache_dir = _hist_cache_dirame(proj_dir, wthr_dir_abbrv, climgen)
+            wthr_units.append((climgen, bbox, hist_cache_dir))
 
-                    ngrow_this_band += 1
+        if QUICK_FLAG:
+            break
 
-                    alrdy_flag, dummy, met_fnames = _check_wthr_cell_exstnc(proj_dir, climgen, lat, lon)
-                    if alrdy_flag:
-                        nalrdys_this_band += 1
-                        continue
+    # each unit writes to its own region weather directory so units can be run in parallel
+    # the first unit of each region is run before the others so that these reuse its historic weather cache
+    # =====================================================================================================
+    unit_parms = {'max_cells': max_cells, 'resol_d2': resol_d2, 'proj_dir': proj_dir, 'crop_name': crop_name,
+                            'wthr_store_flag': form.setup['wthr_store_flag'], 'run_settings': run_settings}
+    proj_data_defns = mask_defn, yield_defn, dates_defn, fert_defns
+    n_workers = min(form.setup['n_workers'], len(wthr_units))
+    summaries = []
+    if n_workers > 1:
+        print('Will spread {} weather units across {} worker processes'.format(len(wthr_units), n_workers))
+        executor = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_wthr_worker,
+                                initargs=(FormSnapshot(form), detach_proj_NC_sets(*proj_data_defns), unit_parms))
+        try:
+            futures = {}
+            sibling_units = {}      # units awaiting the first unit of their region, keyed by historic weather cache
+            for wthr_unit in wthr_units:
+                hist_cache_dir = wthr_unit[2]
+                if hist_cache_dir in sibling_units:
+                    sibling_units[hist_cache_dir].append(wthr_unit)
+                else:
+                    sibling_units[hist_cache_dir] = []
+                    futures[executor.submit(_run_wthr_unit, *wthr_unit)] = hist_cache_dir
+
+            while len(futures) > 0:
+                done, dummy = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    hist_cache_dir = futures.pop(future)
+                    summary = future.result()
+                    summaries.append(summary)
+                    print('Completed {} of {} weather units - '.format(len(summaries), len(wthr_units)) +
+                                                                                            _wthr_unit_mess(summary))
+                    report_progress('wthr_unit', nunits_done=len(summaries), nunits=len(wthr_units), **summary)
+
+                    for wthr_unit in sibling_units.pop(hist_cache_dir, []):
+                        futures[executor.submit(_run_wthr_unit, *wthr_unit)] = None
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    else:
+        for climgen, bbox, hist_cache_dir in wthr_units:
+            summary = _generate_wthr_unit(form, climgen, bbox, hist_cache_dir, proj_data_defns, unit_parms)
+            summaries.append(summary)
+            print('Completed weather unit - ' + _wthr_unit_mess(summary) + '\n')
+            report_progress('wthr_unit', nunits_done=len(summaries), nunits=len(wthr_units), **summary)
+
+    # consolidated summary
+    # ====================
+    ntotal_wrttn = sum([summary['ncmpltd'] for summary in summaries])
+    nalrdys = sum([summary['nalrdys'] for summary in summaries])
+    nnodata = sum([summary['nnodata'] for summary in summaries])
+    nempty = len([summary for summary in summaries if summary['ntotal_grow'] == 0])
+    mess = 'Finished weather generation - total number of sets written: {}\talready existing: {}'\
+                                                                                        .format(ntotal_wrttn, nalrdys)
+    mess += '\tno data: {}\tunits: {}\tunits with nothing to grow: {}'.format(nnodata, len(summaries), nempty)
+    print(mess)
+
+    return True
+
+def _wthr_unit_mess(summary):
+    """
+    C
+    """
+    mess = 'weather set: ' + summary['gcm'] + '\tScenario: ' + summary['scnr'] + '\tRegion: ' + summary['region']
+    mess += '\twritten: {}\talready existing: {}\tno data: {}\tout of bounds: {}'\
+                    .format(summary['ncmpltd'], summary['nalrdys'], summary['nnodata'], summary['noutbnds'])
+    return mess
 
-                    form.setup['bbox'] = list([lon - resol_d2, lat - resol_d2, lon + resol_d2, lat + resol_d2])
+def _hist_cache_dirame(proj_dir, wthr_dir_abbrv, climgen):
+    """
+    historic weather cache, a directory of shards, is shared by all GCMs and scenarios of a region
+    """
+    if split(proj_dir)[1] == 'Wthr':
+        cache_dir = join(proj_dir, 'HistCache')
+    else:
+        cache_dir = join(proj_dir, 'Wthr', 'HistCache')
 
-                    # generate weather dataset indices which enclose the AOI for this band
-                    # ====================================================================
-                    hist_lat_indx, hist_lon_indx = get_wthr_nc_coords(climgen.hist_wthr_set_defn, lat, lon)
-                    fut_lat_indx, fut_lon_indx = get_wthr_nc_coords(climgen.fut_wthr_set_defn, lat, lon)
-                    if hist_lat_indx < 0 or fut_lat_indx < 0:
-                        noutbnds += 1
-                        continue
+    cache_name = '{}_{}_{}'.format(wthr_dir_abbrv, climgen.hist_start_year, climgen.hist_end_year)
 
-                    # Get future and historic weather data
-                    # ====================================
-                    pettmp_hist = fetch_WrldClim_data(form.lgr, lat, lon, climgen, hist_wthr_dsets,
-                                                                    hist_lat_indx, hist_lon_indx, hist_flag=True)
-                    if pettmp_hist is None:
-                        pettmp_fut = None
-                    else:
-                        pettmp_fut = fetch_WrldClim_data(form.lgr, lat, lon, climgen, fut_wthr_dsets,
-                                                                                        fut_lat_indx, fut_lon_indx)
-                    if pettmp_fut is None or pettmp_hist is None:
-                        nnodata += 1
-                        continue
-                    else:
-                        pettmp_sim = join_hist_fut_to_sim_wthr(climgen, pettmp_hist, pettmp_fut)
-
-                    # create weather
-                    # ==============
-                    site_obj = MakeSiteFiles(form, climgen)
-                    make_wthr_files(site_obj, lat, lon, climgen, pettmp_hist, pettmp_sim)
-                    ncmpltd += 1
-                    ntotal_wrttn += 1
-
-                    last_time = update_wthr_progress(last_time, ncmpltd, nnodata, ntotal_grow, ngrowing, nno_grow,
-                                                                                                                region)
-                    if ncmpltd >= max_cells:
-                        break
-
-                # finished this latitude band - report progress
-                # =============================================
-                ngrowing += ngrow_this_band
-                nalrdys += nalrdys_this_band
-                mess = '\tBand {} with lat: {}\t# growing locations: {}\t'.format(nband, lat, ngrow_this_band)
-                mess += 'already existing: {}\tskipped: {}'.format(nalrdys_this_band, nnodata)
-                form.lgr.info(mess)
-                print(mess)
-
-                if ncmpltd >= max_cells:
-                    print('\nFinished checking after {} cells completed\tband: {}'.format(ncmpltd, nband))
-                    break
-
-        # close NC files
-        # ==============
+    return normpath(join(cache_dir, cache_name))
+
+def _generate_wthr_unit(form, climgen, bbox, hist_cache_dir, proj_data_defns, unit_parms, verbose=True):
+    """
+    generate weather for each growing cell of a region for one GCM and scenario
+    per cell progress and band messages are reported only when verbose i.e. not by worker processes
+    """
+    mask_defn, yield_defn, dates_defn, fert_defns = proj_data_defns
+    max_cells = unit_parms['max_cells']
+    resol_d2 = unit_parms['resol_d2']
+    proj_dir = unit_parms['proj_dir']
+    region = climgen.region
+    lon_ll, lat_ll, lon_ur, lat_ur = bbox
+
+    run_settings = unit_parms['run_settings'].with_tables(climgen)
+    summary = {'gcm': climgen.wthr_rsrce, 'scnr': climgen.fut_clim_scen, 'region': region, 'ntotal_grow': 0,
+               'ngrowing': 0, 'nno_grow': 0, 'ncmpltd': 0, 'nalrdys': 0, 'nnodata': 0, 'noutbnds': 0}
+    if verbose:
+        mess = '\nProcessing weather set: ' + summary['gcm'] + '\tScenario: ' + summary['scnr'] + '\tRegion: '
+        mess += region + '\tCrop: ' + unit_parms['crop_name']
+        print(mess)
+
+    # identify geo-extent for this run
+    # ================================
+    lat_ur_indx, lon_ur_indx, ret_code = mask_defn.get_nc_coords(lat_ur, lon_ur)
+    lat_ll_indx, lon_ll_indx, ret_code = mask_defn.get_nc_coords(lat_ll, lon_ll)
+
+    #  open required NC sets - growing cells are then counted from the mask slab
+    # ==========================================================================
+    open_proj_NC_sets(mask_defn, yield_defn, dates_defn, fert_defns)
+    mask_defn.read_aoi_slabs(['cropmask'], lat_ll_indx, lat_ur_indx, lon_ll_indx, lon_ur_indx)
+    lat_ur_indx, ntotal_grow, dummy = check_run_mask(mask_defn, lon_ll_indx, lat_ll_indx, lon_ur_indx, lat_ur_indx)
+    summary['ntotal_grow'] = ntotal_grow
+    if ntotal_grow == 0:
+        print('Nothing to grow for this AOI')
         close_proj_NC_sets(mask_defn, yield_defn, dates_defn, fert_defns)
-        for metric in list(['precip', 'tas']):
-            hist_wthr_dsets[metric].close()
-            fut_wthr_dsets[metric].close()
+        return summary
+
+    nbands = lat_ur_indx - lat_ll_indx + 1
+    if verbose:
+        print('Will process {} bands'.format(nbands))
+
+    hist_wthr_dsets, fut_wthr_dsets = open_wthr_NC_sets(climgen)
+
+    # time series for each cell are served from strips read once per latitude row of each weather dataset
+    # =====================================================================================================
+    hist_strip_dsets = make_wthr_strip_dsets(hist_wthr_dsets, climgen.hist_wthr_set_defn, bbox)
+    fut_strip_dsets = make_wthr_strip_dsets(fut_wthr_dsets, climgen.fut_wthr_set_defn, bbox)
+    hist_cache = HistWthrCache(hist_cache_dir)
+    if unit_parms['wthr_store_flag']:
+        region_dir = _region_wthr_dir(proj_dir, climgen)
+        wthr_store = fetch_wthr_store(region_dir, create_flag=True)
+        makedirs(split(region_dir)[0], exist_ok=True)
+        scratch_dir = mkdtemp(prefix='scratch_', dir=split(region_dir)[0])   # reused by every cell of the unit
+    else:
+        wthr_store = None
+    ncmpltd = 0
+    ngrowing = 0
+    nno_grow = 0
+
+    # main AOI traversal loops - outer: North to South, inner: East to West
+    # ========================
+    last_time = time()
+    for nband, lat_indx in enumerate(range(lat_ur_indx, lat_ll_indx - 1, -1)):
+        if nband > MAX_BANDS:
+            break
+
+        lat = mask_defn.lats[lat_indx]
+
+        ngrow_this_band, nalrdys_this_band, nnodata, noutbnds = 4*[0]
+
+        for lon_indx in range(lon_ll_indx, lon_ur_indx + 1):
+            lon = mask_defn.lons[lon_indx]
+
+            mask_val = mask_defn.fetch_aoi_val('cropmask', lat_indx, lon_indx)
+            crop_grown = int(mask_val.item())
+            if crop_grown == 0:
+                nno_grow += 1
+                continue
+
+            ngrow_this_band += 1
+
+            alrdy_flag, dummy, met_fnames = _check_wthr_cell_exstnc(proj_dir, climgen, lat, lon)
+            if alrdy_flag:
+                nalrdys_this_band += 1
+                continue
+
+            form.setup['bbox'] = list([lon - resol_d2, lat - resol_d2, lon + resol_d2, lat + resol_d2])
+
+            # generate weather dataset indices which enclose the AOI for this band
+            # ====================================================================
+            hist_lat_indx, hist_lon_indx = get_wthr_nc_coords(climgen.hist_wthr_set_defn, lat, lon)
+            fut_lat_indx, fut_lon_indx = get_wthr_nc_coords(climgen.fut_wthr_set_defn, lat, lon)
+            if hist_lat_indx < 0 or fut_lat_indx < 0:
+                noutbnds += 1
+                continue
+
+            # Get future and historic weather data - historic weather is the same for all GCMs and scenarios
+            # ================================================================================================
+            gran_lat, gran_lon = _gran_coords_from_lat_lon(lat, lon)
+            gran_coord = '{0:0=5g}_{1:0=5g}'.format(gran_lat, gran_lon)
+            hist_wthr = hist_cache.fetch(gran_coord)
+            if hist_wthr is None:
+                pettmp_hist = fetch_WrldClim_data(form.lgr, lat, lon, climgen, hist_strip_dsets,
+                                                            hist_lat_indx, hist_lon_indx, hist_flag=True)
+                if pettmp_hist is None:
+                    hist_cache.add(gran_coord, None)
+                else:
+                    hist_lta_precip, hist_lta_tmean, dummy = fetch_long_term_ave_wthr_recs(climgen, pettmp_hist)
+                    hist_cache.add(gran_coord, pettmp_hist, hist_lta_precip, hist_lta_tmean)
+            else:
+                pettmp_hist, hist_lta_precip, hist_lta_tmean = hist_wthr
+
+            if pettmp_hist is None:
+                pettmp_fut = None
+            else:
+                pettmp_fut = fetch_WrldClim_data(form.lgr, lat, lon, climgen, fut_strip_dsets,
+                                                                                fut_lat_indx, fut_lon_indx)
+            if pettmp_fut is None or pettmp_hist is None:
+                nnodata += 1
+                continue
+            else:
+                pettmp_sim = join_hist_fut_to_sim_wthr(climgen, pettmp_hist, pettmp_fut)
+
+            # create weather
+            # ==============
+            site_obj = MakeSiteFiles(run_settings, climgen)
+            if wthr_store is None:
+                make_wthr_files(site_obj, lat, lon, climgen, pettmp_hist, pettmp_sim, (hist_lta_precip, hist_lta_tmean))
+            else:
+                wthr_store.add_cell_files(gran_coord, make_wthr_buffers(site_obj, lat, climgen, pettmp_sim,
+                                                                    (hist_lta_precip, hist_lta_tmean), scratch_dir))
+            ncmpltd += 1
 
+            if verbose:
+                last_time = update_wthr_progress(last_time, ncmpltd, nnodata, ntotal_grow, ngrowing, nno_grow, region)
+            if ncmpltd >= max_cells:
+                break
+
+        # finished this latitude band - report progress
+        # =============================================
+        if wthr_store is not None:
+            wthr_store.flush()
+        hist_cache.flush()
+        save_wthr_inventories()
+        ngrowing += ngrow_this_band
+        summary['nalrdys'] += nalrdys_this_band
+        summary['nnodata'] += nnodata
+        summary['noutbnds'] += noutbnds
+        mess = '\tBand {} with lat: {}\t# growing locations: {}\t'.format(nband, lat, ngrow_this_band)
+        mess += 'already existing: {}\tskipped: {}'.format(nalrdys_this_band, nnodata)
+        form.lgr.info(mess)
+        if verbose:
+            print(mess)
+
+        if ncmpltd >= max_cells:
+            print('\nFinished checking after {} cells completed\tband: {}'.format(ncmpltd, nband))
+            break
+
+    # close NC files
+    # ==============
+    hist_cache.close()
+    if wthr_store is not None:
+        wthr_store.flush()
+        rmtree(scratch_dir, ignore_errors=True)
+    close_proj_NC_sets(mask_defn, yield_defn, dates_defn, fert_defns)
+    for metric in list(['precip', 'tas']):
+        hist_wthr_dsets[metric].close()
+        fut_wthr_dsets[metric].close()
+
+    summary['ngrowing'], summary['nno_grow'], summary['ncmpltd'] = ngrowing, nno_grow, ncmpltd
+
+    if verbose:
         ntotal_str = format_string('%d', ntotal_grow, grouping=True)
         ntotal_prcnt = round(100 * (ngrowing / ntotal_grow), 2)
         mess = 'Completed Region: ' + region + '\tLocations - growing: '
         mess += '{}\tno grow: {}\ttotal: {}\t {}%'.format(ngrowing, nno_grow, ntotal_str, ntotal_prcnt)
         print(mess)
 
-        if QUICK_FLAG:
-            break
+    return summary
 
-        print('Completed weather set: ' + this_gcm + '\tScenario: ' + scnr + '\n')
+# state of each worker process, assigned by _init_wthr_worker
+# ===========================================================
+_wthr_wrkr = {}
 
-    print('Finished weather generation - total number of sets written: {}'.format(ntotal_wrttn))
+def _init_wthr_worker(form_snpsht, proj_data_defns, unit_parms):
+    """
+    C
+    """
+    form_snpsht.reopen_nc_dsets()
+    _wthr_wrkr['form'] = form_snpsht
+    _wthr_wrkr['proj_data_defns'] = proj_data_defns
+    _wthr_wrkr['unit_parms'] = unit_parms
 
-    return
+def _run_wthr_unit(climgen, bbox, hist_cache_dir):
+    """
+    C
+    """
+    return _generate_wthr_unit(_wthr_wrkr['form'], climgen, bbox, hist_cache_dir, _wthr_wrkr['proj_data_defns'],
+                                                                            _wthr_wrkr['unit_parms'], verbose=False)
 
 def make_avemet_file(clim_dir, lta_precip, lta_pet, lta_tmean):
     """
@@ -244,14 +417,43 @@ def make_avemet_file(clim_dir, lta_precip, lta_pet, lta_tmean):
     """
     avemet_dat = join(clim_dir, 'AVEMET.DAT')
     with open(avemet_dat, 'w') as fobj:
-        for imnth, (precip, pet, tmean) in enumerate(zip(lta_precip, lta_pet, lta_tmean)):
-            fobj.write('{} {} {} {}\n'.format(imnth + 1, precip, pet, tmean))
+        fobj.writelines(_avemet_lines(lta_precip, lta_pet, lta_tmean))
 
     return
 
-def make_wthr_files(site, lat, lon, climgen, pettmp_hist, pettmp_sim):
+def _avemet_lines(lta_precip, lta_pet, lta_tmean):
+    """
+    C
+    """
+    return ['{} {} {} {}\n'.format(imnth + 1, precip, pet, tmean)
+                                    for imnth, (precip, pet, tmean) in enumerate(zip(lta_precip, lta_pet, lta_tmean))]
+
+def make_wthr_buffers(site, lat, climgen, pettmp_sim, hist_lta, scratch_dir):
+    """
+    return dictionary of file names and contents of a weather cell for the weather store, as read by add_cell
+    met files are written by make_met_files to a scratch directory which is overwritten by each cell, rather than to
+    a cell directory which would then be removed; lta_ave.txt and AVEMET.DAT are formatted in memory
+    """
+    hist_lta_precip, hist_lta_tmean = hist_lta
+    met_fnames = make_met_files(scratch_dir, lat, climgen, pettmp_sim)
+
+    cell_files = {}
+    for met_fname in met_fnames:
+        with open(join(scratch_dir, basename(met_fname)), 'rb') as fobj:
+            cell_files[basename(met_fname)] = fobj.read().decode(STORE_ENCODING)
+
+    climgen.create_FutureAverages(scratch_dir, lat, site, hist_lta_precip, hist_lta_tmean, met_fnames)
+    lta_lines = _lta_lines(site)
+    if lta_lines is not None:
+        cell_files['lta_ave.txt'] = ''.join(lta_lines).replace('\n', linesep)   # as if written in text mode
+        cell_files['AVEMET.DAT'] = ''.join(_avemet_lines(site.lta_precip, site.lta_pet, site.lta_tmean))\
+                                                                                                .replace('\n', linesep)
+    return cell_files
+
+def make_wthr_files(site, lat, lon, climgen, pettmp_hist, pettmp_sim, hist_lta=None):
     """
     generate ECOSSE historic and future weather data
+    hist_lta: optional long term average historic precipitation and temperature, derived from pettmp_hist if absent
     """
     gran_lat, gran_lon = _gran_coords_from_lat_lon(lat, lon)
     gran_coord = '{0:0=5g}_{1:0=5g}'.format(gran_lat, gran_lon)
@@ -264,7 +466,10 @@ def make_wthr_files(site, lat, lon, climgen, pettmp_hist, pettmp_sim):
 
     # calculate historic average weather
     # ==================================
-    hist_lta_precip, hist_lta_tmean, hist_weather_recs = fetch_long_term_ave_wthr_recs(climgen, pettmp_hist)
+    if hist_lta is None:
+        hist_lta_precip, hist_lta_tmean, hist_weather_recs = fetch_long_term_ave_wthr_recs(climgen, pettmp_hist)
+    else:
+        hist_lta_precip, hist_lta_tmean = hist_lta
 
     # write a single set of met files for all simulations for this grid cell
     # ======================================================================
@@ -272,58 +477,100 @@ def make_wthr_files(site, lat, lon, climgen, pettmp_hist, pettmp_sim):
 
     # create additional weather related files from already existing met files
     # =======================================================================
-    irc = climgen.create_FutureAverages(clim_dir, lat, site, hist_lta_precip, hist_lta_tmean)
+    irc = climgen.create_FutureAverages(clim_dir, lat, site, hist_lta_precip, hist_lta_tmean, met_fnames)
     lta_ave_fn = _make_lta_file(site, clim_dir)
 
-    return
+    return clim_dir
 
 def fetch_hist_lta_from_lat_lon(proj_dir, climgen, lat, lon):
     """
-    check existence of weather cell
+    check existence of weather cell and return its long term average records
+    """
+    return _check_wthr_cell_exstnc(proj_dir, climgen, lat, lon, read_lta_flag=True)
+
+def _region_wthr_dir(proj_dir, climgen):
+    """
+    C
+    """
+    return _region_wthr_path(proj_dir, climgen.region_wthr_dir)
+
+def _region_wthr_path(proj_dir, region_wthr_dir):
+    """
+    proj_dir is either the project directory or its weather directory
+    """
+    if split(proj_dir)[1] == 'Wthr':
+        region_dir = normpath(join(proj_dir, region_wthr_dir))
+    else:
+        region_dir = normpath(join(proj_dir, 'Wthr', region_wthr_dir))
+
+    return region_dir
+
+def extract_wthr_cell(proj_dir, climgen, lat, lon):
+    """
+    write ECOSSE weather files for a cell held in the weather store so that simulations can refer to them
+    """
+    region_dir = _region_wthr_dir(proj_dir, climgen)
+    wthr_store = fetch_wthr_store(region_dir)
+    if wthr_store is None:
+        return
+
+    gran_lat, gran_lon = _gran_coords_from_lat_lon(lat, lon)
+    gran_coord = '{0:0=5g}_{1:0=5g}'.format(gran_lat, gran_lon)
+    wthr_store.extract_cell(gran_coord, join(region_dir, gran_coord))
+
+    return
+
+def unpack_wthr_stores(form):
+    """
+    extract the cells of each weather store of the project, or of the selected region, to their cell directories
+    e.g. before weather is used by tools which do not read stores - returns False if there are no stores
     """
-    read_lta_flag = True
-    integrity_flag, hist_lta_recs, met_fnames = _check_wthr_cell_exstnc(proj_dir, climgen, lat, lon, read_lta_flag)
+    proj_dir = form.setup['wthr_prj_dir']
+    if form.w_all_regions.isChecked():
+        irows = range(len(form.regions_df['Region']))
+    else:
+        irows = [list(form.regions_df['Region']).index(form.w_combo00a.currentText())]
+
+    # stores are named after the region abbreviation, GCM and scenario of each weather set
+    # ====================================================================================
+    region_dirs = []
+    for irow in irows:
+        lon_ll, lon_ur, lat_ll, lat_ur, wthr_dir_abbrv = form.regions_df.iloc[irow][1:]
+        for wthr_set in form.weather_set_linkages['WrldClim']:
+            wthr_rsrce, scnr = wthr_set.split('_')
+            if scnr == 'hist':
+                continue
+            region_dir = _region_wthr_path(proj_dir, wthr_dir_abbrv + wthr_rsrce + '_' + scnr)
+            if isfile(region_dir + STORE_SUFFIX):
+                region_dirs.append(region_dir)
 
-    return integrity_flag, hist_lta_recs, met_fnames
+    if len(region_dirs) == 0:
+        print(WARNING_STR + 'no weather stores in ' + _region_wthr_path(proj_dir, ''))
+        return False
+
+    for nstore, region_dir in enumerate(region_dirs):
+        nextracted = unpack_wthr_store(region_dir)
+        print('Unpacked {} weather cells to {}'.format(nextracted, region_dir))
+        report_progress('wthr_unpack', region_wthr_dir=basename(region_dir), ncells=nextracted,
+                                                                        nstores_done=nstore + 1, nstores=len(region_dirs))
+    return True
 
 def _check_wthr_cell_exstnc(proj_dir, climgen, lat, lon, read_lta_flag=False):
     """
     check existence and integrity of weather cell
     allowable criteria are 1) a full set of weather files, namely 300 met files e.g. met2014s.txt, lta_ave.txt and AVEMET.DAT
                            2) an empty directory
+    the weather store index, if a store exists for this region and scenario, or the region inventory is consulted
     """
-    integrity_flag = False
-    hist_lta_recs = None
-    met_fnames = None
     gran_lat, gran_lon = _gran_coords_from_lat_lon(lat, lon)
     gran_coord = '{0:0=5g}_{1:0=5g}'.format(gran_lat, gran_lon)
 
-    if split(proj_dir)[1] == 'Wthr':
-        clim_dir = normpath(join(proj_dir, climgen.region_wthr_dir, gran_coord))
-    else:
-        clim_dir = normpath(join(proj_dir, 'Wthr', climgen.region_wthr_dir, gran_coord))
-
-    if isdir(clim_dir):
-        fns = listdir(clim_dir)
-        nfiles = len(fns)
-        if nfiles == 0 or nfiles >= 302:
-            if nfiles == 0:
-                integrity_flag = True
-                hist_lta_recs, met_fnames = None, None
-            else:
-                if 'lta_ave.txt' in fns:
-                    if read_lta_flag:
-                        lta_ave_fn = join(clim_dir, 'lta_ave.txt')
-                        hist_lta_recs = []
-                        with open(lta_ave_fn, 'r') as fave:
-                            for line in fave:
-                                line = line.rstrip()  # strip out all tailing whitespace
-                                hist_lta_recs.append(line)
-
-                    integrity_flag = True
-                    met_fnames = fns[2:]
+    region_dir = _region_wthr_dir(proj_dir, climgen)
+    wthr_store = fetch_wthr_store(region_dir)
+    if wthr_store is not None and gran_coord in wthr_store.cells:
+        return wthr_store.check_cell(gran_coord, read_lta_flag)
 
-    return integrity_flag, hist_lta_recs, met_fnames
+    return fetch_wthr_inventory(region_dir).check_cell(gran_coord, read_lta_flag)
 
 def write_avemet_files(form):
     """
@@ -359,39 +606,29 @@ def write_avemet_files(form):
 
             # step through each directory comprising ECOSSE met files
             # =======================================================
-            last_time = time()
-            nwrote = 0
-            for drctry, subdirs, files in walk(clim_dir):
-                nfiles = len(files)
-                nsubdirs = len(subdirs)
-                if nsubdirs > 0:  # first directory has four scenarios e.g.  Y:\GlblEcssOutputsSv\EcosseSims\AfUKESM1-0-LL_126
-                    continue
-
-                # there should be 300 met files plus lta_ave.txt and AVEMET.DAT
-                # =============================================================
-                last_time = update_avemet_progress(last_time, wthr_rsrce, scnr, region, nwrote)
-                if nfiles >= NEXPCTD_MET_FILES:
-                    continue
-
-                # if lta_ave.txt is not present then something is wrong
-                # =====================================================
-                if LTA_RECS_FN in files:
-                    lta_ave_fn = join(drctry, LTA_RECS_FN)
-                    with open(lta_ave_fn, 'r') as flta_ave:
-
-                        lta_recs = flta_ave.readlines()
-                        vals = [float(rec.split('#')[0]) for rec in lta_recs]
-                        lta_precip, lta_tmean = vals[:12], vals[12:]
+            if form.setup['avemet_batch_flag']:
+                nwrote = _write_region_avemet_batch(clim_dir, wthr_rsrce, scnr, region)
+            else:
+                last_time = time()
+                nwrote = 0
+                for drctry, files in _leaf_wthr_dirs(clim_dir):
+
+                    # there should be 300 met files plus lta_ave.txt and AVEMET.DAT
+                    # =============================================================
+                    last_time = update_avemet_progress(last_time, wthr_rsrce, scnr, region, nwrote)
+                    if len(files) >= NEXPCTD_MET_FILES:
+                        continue
 
-                        gran_coord = split(drctry)[1]
-                        gran_lat = int(gran_coord.split('_')[0])
-                        cell_lat = 90.0 - gran_lat / NGRANULARITY
+                    # if lta_ave.txt is not present then something is wrong
+                    # =====================================================
+                    if LTA_RECS_FN in files:
+                        cell_lat, lta_precip, lta_tmean = _read_lta_ave_file(drctry)
                         lta_pet = thornthwaite(lta_tmean, cell_lat)
 
                         make_avemet_file(drctry, lta_precip, lta_pet, lta_tmean)
                         nwrote += 1
-                else:
-                    print(WARNING_STR + LTA_RECS_FN + ' file should be present in ' + drctry)
+                    else:
+                        print(WARNING_STR + LTA_RECS_FN + ' file should be present in ' + drctry)
 
             if nwrote >= max_cells:
                 print('\nFinished checking having written {} AVEMET.DAT files'.format(nwrote))
@@ -402,23 +639,117 @@ def write_avemet_files(form):
         print('Completed weather set: ' + wthr_rsrce + '\tScenario: ' + scnr + '\n')
 
     print('Finished AVEMET creation - checked: {} cells'.format(nwrote))
-    return
+    return True
 
-def _make_lta_file(site, clim_dir):
+def _leaf_wthr_dirs(top_dir):
     """
-    write long term average climate section of site.txt file
+    generator of leaf directories, i.e. weather cells, and their file names using scandir which, unlike walk,
+    does not need to stat each entry to distinguish files from directories
     """
+    subdirs = []
+    files = []
+    with scandir(top_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                subdirs.append(entry.path)
+            else:
+                files.append(entry.name)
 
-    lines = []
-    lta_precip, lta_tmean = site.lta_precip, site.lta_tmean
-    if lta_precip is None or lta_tmean is None:
-        return
+    if len(subdirs) == 0:
+        yield top_dir, files
+    else:
+        for subdir in subdirs:
+            yield from _leaf_wthr_dirs(subdir)
 
-    for precip, month in zip(lta_precip, site.months):
-        lines.append(_make_line('{}'.format(precip), '{} long term average monthly precipitation [mm]'.format(month)))
+def _read_lta_ave_file(drctry):
+    """
+    return latitude of the weather cell and its long term average precipitation and temperature
+    """
+    with open(join(drctry, LTA_RECS_FN), 'r') as flta_ave:
+        vals = [float(rec.split('#')[0]) for rec in flta_ave.readlines()]
 
-    for tmean, month in zip(lta_tmean, site.months):
-        lines.append(_make_line('{}'.format(tmean), '{} long term average monthly temperature [mm]'.format(month)))
+    gran_lat = int(split(drctry)[1].split('_')[0])
+    cell_lat = 90.0 - gran_lat / NGRANULARITY
+
+    return cell_lat, vals[:12], vals[12:]
+
+def _write_region_avemet_batch(clim_dir, wthr_rsrce, scnr, region):
+    """
+    batch mode: read lta_ave.txt files and write AVEMET.DAT files using a pool of threads and compute PET for
+    all cells of the region in one call
+    """
+    last_time = time()
+    drctries = []
+    for drctry, files in _leaf_wthr_dirs(clim_dir):
+        last_time = update_avemet_progress(last_time, wthr_rsrce, scnr, region, 0)
+        if len(files) >= NEXPCTD_MET_FILES:
+            continue
+
+        if LTA_RECS_FN in files:
+            drctries.append(drctry)
+        else:
+            print(WARNING_STR + LTA_RECS_FN + ' file should be present in ' + drctry)
+
+    if len(drctries) == 0:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=AVEMET_NTHREADS) as executor:
+        lta_vals = list(executor.map(_read_lta_ave_file, drctries))
+
+    cell_lats = [cell_lat for cell_lat, lta_precip, lta_tmean in lta_vals]
+    lta_pets = thornthwaite_batch([lta_tmean for cell_lat, lta_precip, lta_tmean in lta_vals], cell_lats).tolist()
+
+    # batch formulation omits the relation for hot months so these cells are computed by the thornthwaite function
+    # =============================================================================================================
+    hot_indices = set([indx for indx, (cell_lat, lta_precip, lta_tmean) in enumerate(lta_vals)
+                                                                                if max(lta_tmean) > PET_HOT_TMEAN])
+    for indx in hot_indices:
+        cell_lat, lta_precip, lta_tmean = lta_vals[indx]
+        lta_pets[indx] = thornthwaite(lta_tmean, cell_lat)
+
+    # guard against any difference between the batch and per cell PET formulations
+    # =============================================================================
+    for indx in _pet_check_indices(lta_vals, hot_indices):
+        cell_lat, lta_precip, lta_tmean = lta_vals[indx]
+        if not allclose(lta_pets[indx], thornthwaite(lta_tmean, cell_lat)):
+            print(WARNING_STR + 'batch PET differs from thornthwaite function at lat: {}, reverting to per cell PET'
+                                                                                                .format(cell_lat))
+            lta_pets = [thornthwaite(lta_tmean, cell_lat) for cell_lat, lta_precip, lta_tmean in lta_vals]
+            break
+
+    with ThreadPoolExecutor(max_workers=AVEMET_NTHREADS) as executor:
+        futures = [executor.submit(make_avemet_file, drctry, lta_precip, lta_pet, lta_tmean)
+                            for drctry, (cell_lat, lta_precip, lta_tmean), lta_pet in zip(drctries, lta_vals, lta_pets)]
+        for future in futures:
+            future.result()     # raises any exception from the writing thread
+
+    return len(drctries)
+
+def _pet_check_indices(lta_vals, hot_indices):
+    """
+    indices of cells evenly spaced when ordered by latitude and when ordered by annual mean temperature
+    together with the coldest, warmest, most southerly and most northerly cells
+    """
+    indices = [indx for indx in range(len(lta_vals)) if indx not in hot_indices]
+    if len(indices) == 0:
+        return []
+
+    check_indices = set()
+    for sort_key in (lambda indx: lta_vals[indx][0], lambda indx: sum(lta_vals[indx][2])):
+        ordered = sorted(indices, key=sort_key)
+        nordered = len(ordered)
+        for icheck in range(NPET_CHECKS):
+            check_indices.add(ordered[(icheck*(nordered - 1))//max(1, NPET_CHECKS - 1)])
+
+    return sorted(check_indices)
+
+def _make_lta_file(site, clim_dir):
+    """
+    write long term average climate section of site.txt file
+    """
+    lines = _lta_lines(site)
+    if lines is None:
+        return
 
     lta_ave_fn = join(clim_dir, 'lta_ave.txt')
     with open(lta_ave_fn, 'w') as fhand:
@@ -430,6 +761,23 @@ def _make_lta_file(site, clim_dir):
 
     return lta_ave_fn
 
+def _lta_lines(site):
+    """
+    return lines of long term average climate section of site.txt file or None if averages are absent
+    """
+    lines = []
+    lta_precip, lta_tmean = site.lta_precip, site.lta_tmean
+    if lta_precip is None or lta_tmean is None:
+        return None
+
+    for precip, month in zip(lta_precip, site.months):
+        lines.append(_make_line('{}'.format(precip), '{} long term average monthly precipitation [mm]'.format(month)))
+
+    for tmean, month in zip(lta_tmean, site.months):
+        lines.append(_make_line('{}'.format(tmean), '{} long term average monthly temperature [mm]'.format(month)))
+
+    return lines
+
 def _make_line(data, comment):
     """
 
@@ -0,0 +1,213 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        wthr_inventory_class.py
+# Purpose:     inventory of weather cell directories for a region, built once using scandir and persisted
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'wthr_inventory_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from os import scandir, stat, replace, getpid
+from os.path import isdir, isfile, join, normpath, split
+from json import dump as json_dump, load as json_load, JSONDecodeError
+
+WARNING_STR = '*** Warning *** '
+
+NEXPCTD_MET_FILES = 302
+LTA_RECS_FN = 'lta_ave.txt'
+REVALIDATE_SECS = 60    # interval after which the modification time of a weather store is checked again
+SAVE_EVERY = 1000       # number of cells rescanned after which the inventory is saved
+INVENTORY_VERSION = 2
+
+# states of weather cell directories - complete cells are recorded as indices into the list of met file name sets
+# ==============================================================================================================
+EMPTY = 'empty'
+INCOMPLETE = 'incomplete'
+
+def _cell_stamp(cell_dir):
+    """
+    modification time of cell directory, which changes when files are added or removed, or None if it is missing
+    """
+    try:
+        return stat(cell_dir).st_mtime_ns
+    except OSError:
+        return None
+
+class WthrInventory(object,):
+    """
+    records, for each granule coordinate, whether the weather cell directory is complete, empty or incomplete
+    together with the modification time of the cell directory when it was listed; each cell is listed again when
+    its modification time differs e.g. after AVEMET.DAT has been written or the cell was being written when scanned
+    weather cells absent from the inventory, with no directory, are missing
+    """
+    def __init__(self, region_dir):
+        """
+        the inventory is saved alongside the region weather directory
+        """
+        self.region_dir = region_dir
+        parent_dir, region_wthr_dir = split(region_dir)
+        self.inventory_fn = join(parent_dir, region_wthr_dir + '_wthr_inventory.json')
+        self.hist_lta_recs = {}
+        self.nrescans = 0       # cells listed since the inventory was last saved
+
+        if not self._read_inventory():
+            self._scan_region_dir()
+            self.save()
+
+    def _read_inventory(self):
+        """
+        cells are validated individually when checked
+        """
+        if not isdir(self.region_dir) or not isfile(self.inventory_fn):
+            return False
+
+        try:
+            with open(self.inventory_fn, 'r') as finv:
+                inventory = json_load(finv)
+        except (OSError, IOError, JSONDecodeError) as err:
+            print(WARNING_STR + str(err) + ' reading weather inventory ' + self.inventory_fn)
+            return False
+
+        if inventory.get('version') != INVENTORY_VERSION:
+            return False
+
+        self.met_fname_sets = inventory['met_fname_sets']
+        self.fname_set_indices = {tuple(met_fnames): indx for indx, met_fnames in enumerate(self.met_fname_sets)}
+        self.cells = inventory['cells']
+
+        return True
+
+    def _cell_state(self, fns):
+        """
+        identical lists of met file names are held once
+        """
+        nfiles = len(fns)
+        if nfiles == 0:
+            return EMPTY
+
+        if nfiles >= NEXPCTD_MET_FILES and LTA_RECS_FN in fns:
+            met_fnames = tuple(fns[2:])
+            if met_fnames not in self.fname_set_indices:
+                self.fname_set_indices[met_fnames] = len(self.met_fname_sets)
+                self.met_fname_sets.append(list(met_fnames))
+            return self.fname_set_indices[met_fnames]
+
+        return INCOMPLETE
+
+    def _scan_region_dir(self):
+        """
+        the stamp of each cell is taken before it is listed so that a cell written during the scan is listed again
+        """
+        self.met_fname_sets = []
+        self.fname_set_indices = {}
+        self.cells = {}
+        if not isdir(self.region_dir):
+            return
+
+        print('Building weather inventory for ' + self.region_dir)
+        with scandir(self.region_dir) as region_entries:
+            for region_entry in region_entries:
+                if not region_entry.is_dir():
+                    continue
+
+                stamp = _cell_stamp(region_entry.path)
+                with scandir(region_entry.path) as cell_entries:
+                    fns = [entry.name for entry in cell_entries]
+
+                self.cells[region_entry.name] = [stamp, self._cell_state(fns)]
+
+    def _rescan_cell(self, gran_coord, stamp):
+        """
+        C
+        """
+        self.hist_lta_recs.pop(gran_coord, None)
+        if stamp is None:
+            self.cells.pop(gran_coord, None)
+        else:
+            with scandir(join(self.region_dir, gran_coord)) as cell_entries:
+                fns = [entry.name for entry in cell_entries]
+            self.cells[gran_coord] = [stamp, self._cell_state(fns)]
+
+        self.nrescans += 1
+        if self.nrescans >= SAVE_EVERY:
+            self.save()
+
+    def save(self):
+        """
+        write to a file unique to this process then rename, since workers may save the same inventory concurrently
+        """
+        self.nrescans = 0
+        if not isdir(self.region_dir):
+            return
+
+        inventory = {'version': INVENTORY_VERSION, 'region_dir': self.region_dir,
+                     'met_fname_sets': self.met_fname_sets, 'cells': self.cells}
+        tmp_fn = self.inventory_fn + '.{}.tmp'.format(getpid())
+        try:
+            with open(tmp_fn, 'w') as finv:
+                json_dump(inventory, finv)
+            replace(tmp_fn, self.inventory_fn)
+        except (OSError, IOError) as err:
+            print(WARNING_STR + str(err) + ' writing weather inventory ' + self.inventory_fn)
+
+    def check_cell(self, gran_coord, read_lta_flag=False):
+        """
+        returns same values as _check_wthr_cell_exstnc in wthr_generation_fns
+        """
+        stamp = _cell_stamp(join(self.region_dir, gran_coord))
+        cell = self.cells.get(gran_coord)
+        if cell is None or cell[0] != stamp:
+            if cell is None and stamp is None:
+                return False, None, None
+            self._rescan_cell(gran_coord, stamp)
+            cell = self.cells.get(gran_coord)
+            if cell is None:
+                return False, None, None
+
+        state = cell[1]
+        if state == INCOMPLETE:
+            return False, None, None
+
+        if state == EMPTY:
+            return True, None, None
+
+        hist_lta_recs = None
+        if read_lta_flag:
+            if gran_coord not in self.hist_lta_recs:
+                hist_lta_recs = []
+                with open(join(self.region_dir, gran_coord, LTA_RECS_FN), 'r') as fave:
+                    for line in fave:
+                        hist_lta_recs.append(line.rstrip())     # strip out all tailing whitespace
+
+                self.hist_lta_recs[gran_coord] = hist_lta_recs
+
+            hist_lta_recs = list(self.hist_lta_recs[gran_coord])
+
+        return True, hist_lta_recs, list(self.met_fname_sets[state])
+
+# inventories held by this process, keyed by region weather directory
+# ===================================================================
+_wthr_inventories = {}
+
+def fetch_wthr_inventory(region_dir):
+    """
+    return inventory for this region - cells are revalidated as they are checked
+    """
+    region_dir = normpath(region_dir)
+    if region_dir not in _wthr_inventories:
+        _wthr_inventories[region_dir] = WthrInventory(region_dir)
+
+    return _wthr_inventories[region_dir]
+
+def save_wthr_inventories():
+    """
+    save inventories with cells listed since they were last saved
+    """
+    for wthr_inventory in _wthr_inventories.values():
+        if wthr_inventory.nrescans > 0:
+            wthr_inventory.save()
@@ -0,0 +1,295 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        wthr_store_class.py
+# Purpose:     compact weather store comprising a single zip file for each region and scenario in which each weather
+#              cell is one compressed member, with an index of cells so that existence checks avoid the file system
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'wthr_store_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from os import listdir, makedirs, stat
+from os.path import isdir, isfile, join, normpath, split
+from shutil import rmtree
+from zipfile import ZipFile, ZIP_DEFLATED, BadZipFile
+from json import dumps as json_dumps, loads as json_loads, dump as json_dump, load as json_load, JSONDecodeError
+from time import time
+
+from wthr_inventory_class import EMPTY, LTA_RECS_FN, REVALIDATE_SECS
+
+WARNING_STR = '*** Warning *** '
+
+STORE_SUFFIX = '_wthr_store.zip'
+INDEX_SUFFIX = '_wthr_store_index.json'
+ENCODING = 'latin-1'    # maps every byte so that extracted files are identical to those stored
+
+class WthrStore(object,):
+    """
+    each member is named after the granule coordinate of the cell and holds the contents of all files of that cell
+    the index records, for each cell, EMPTY or the index into the list of met file name sets, as for the inventory
+    """
+    def __init__(self, region_dir):
+        """
+        store and index are saved alongside the region weather directory
+        """
+        self.region_dir = region_dir
+        parent_dir, region_wthr_dir = split(region_dir)
+        self.store_fn = join(parent_dir, region_wthr_dir + STORE_SUFFIX)
+        self.index_fn = join(parent_dir, region_wthr_dir + INDEX_SUFFIX)
+        self.zip_obj = None
+        self.mode = None
+        self.last_check = time()
+        self.met_fname_sets = []
+        self.cells = {}
+        self.nadded = 0
+        self.last_cell = None, None     # granule coordinate and files of the cell most recently read
+
+        if isfile(self.store_fn):
+            self.mtime = stat(self.store_fn).st_mtime
+            if not self._read_index():
+                self._build_index()
+                self._write_index()
+        else:
+            self.mtime = None
+
+    def _read_index(self):
+        """
+        index is reused only if the store is unchanged since the index was written
+        """
+        if not isfile(self.index_fn):
+            return False
+
+        try:
+            with open(self.index_fn, 'r') as findx:
+                index = json_load(findx)
+        except (OSError, IOError, JSONDecodeError) as err:
+            print(WARNING_STR + str(err) + ' reading weather store index ' + self.index_fn)
+            return False
+
+        if index['mtime'] != self.mtime:
+            return False
+
+        self.met_fname_sets = index['met_fname_sets']
+        self.cells = index['cells']
+
+        return True
+
+    def _build_index(self):
+        """
+        read every member of the store - only required if the index is missing or out of date
+        """
+        print('Building weather store index for ' + self.store_fn)
+        self.met_fname_sets = []
+        self.cells = {}
+        fname_set_indices = {}
+        try:
+            with ZipFile(self.store_fn, 'r') as zip_obj:
+                for member in zip_obj.namelist():
+                    cell_files = json_loads(zip_obj.read(member).decode(ENCODING))
+                    self._add_to_index(member, cell_files, fname_set_indices)
+        except (OSError, IOError, BadZipFile) as err:
+            print(WARNING_STR + str(err) + ' reading weather store ' + self.store_fn)
+
+    def _add_to_index(self, gran_coord, cell_files, fname_set_indices=None):
+        """
+        met file names are those of the cell directory listing less AVEMET.DAT and lta_ave.txt
+        """
+        if len(cell_files) == 0:
+            self.cells[gran_coord] = EMPTY
+            return
+
+        met_fnames = sorted(cell_files)[2:]
+        if fname_set_indices is None:
+            fname_set_indices = {tuple(fname_set): indx for indx, fname_set in enumerate(self.met_fname_sets)}
+
+        met_fnames_key = tuple(met_fnames)
+        if met_fnames_key not in fname_set_indices:
+            fname_set_indices[met_fnames_key] = len(self.met_fname_sets)
+            self.met_fname_sets.append(met_fnames)
+
+        self.cells[gran_coord] = fname_set_indices[met_fnames_key]
+
+    def _write_index(self):
+        """
+        C
+        """
+        if self.mtime is None:
+            return
+
+        index = {'store_fn': self.store_fn, 'mtime': self.mtime, 'met_fname_sets': self.met_fname_sets,
+                 'cells': self.cells}
+        try:
+            with open(self.index_fn, 'w') as findx:
+                json_dump(index, findx)
+        except (OSError, IOError) as err:
+            print(WARNING_STR + str(err) + ' writing weather store index ' + self.index_fn)
+
+    def _open(self, mode):
+        """
+        C
+        """
+        if self.mode == mode:
+            return
+
+        self.close()
+        self.zip_obj = ZipFile(self.store_fn, mode, compression=ZIP_DEFLATED)
+        self.mode = mode
+
+    def _read_cell(self, gran_coord):
+        """
+        return dictionary of file names and contents for this cell
+        the most recently read cell is retained since a check of a cell is usually followed by its extraction
+        """
+        if self.last_cell[0] == gran_coord:
+            return self.last_cell[1]
+
+        self._open('r')
+        cell_files = json_loads(self.zip_obj.read(gran_coord).decode(ENCODING))
+        self.last_cell = gran_coord, cell_files
+
+        return cell_files
+
+    def is_current(self):
+        """
+        check modification time of the store no more often than every REVALIDATE_SECS seconds
+        """
+        if self.mode == 'a' or time() - self.last_check < REVALIDATE_SECS:
+            return True
+
+        self.last_check = time()
+        if isfile(self.store_fn):
+            mtime = stat(self.store_fn).st_mtime
+        else:
+            mtime = None
+
+        return mtime == self.mtime
+
+    def check_cell(self, gran_coord, read_lta_flag=False):
+        """
+        returns same values as _check_wthr_cell_exstnc in wthr_generation_fns
+        """
+        state = self.cells.get(gran_coord)
+        if state is None:
+            return False, None, None
+
+        if state == EMPTY:
+            return True, None, None
+
+        hist_lta_recs = None
+        if read_lta_flag:
+            cell_files = self._read_cell(gran_coord)
+            hist_lta_recs = [line.rstrip() for line in cell_files[LTA_RECS_FN].splitlines()]
+
+        return True, hist_lta_recs, list(self.met_fname_sets[state])
+
+    def add_cell(self, gran_coord, clim_dir, remove_flag=True):
+        """
+        copy files of a weather cell directory to the store and, by default, remove the directory
+        """
+        cell_files = {}
+        for fname in listdir(clim_dir):
+            with open(join(clim_dir, fname), 'rb') as fobj:
+                cell_files[fname] = fobj.read().decode(ENCODING)
+
+        self.add_cell_files(gran_coord, cell_files)
+
+        if remove_flag:
+            rmtree(clim_dir)
+
+    def add_cell_files(self, gran_coord, cell_files):
+        """
+        write cell to the store from a dictionary of file names and contents, see make_wthr_buffers
+        """
+        self._open('a')
+        self.last_cell = None, None
+        self.zip_obj.writestr(gran_coord, json_dumps(cell_files).encode(ENCODING))
+        self._add_to_index(gran_coord, cell_files)
+        self.nadded += 1
+
+    def extract_cell(self, gran_coord, clim_dir):
+        """
+        write ECOSSE weather files for this cell unless these already exist
+        """
+        if gran_coord not in self.cells:
+            return False
+
+        cell_files = self._read_cell(gran_coord)
+        if isdir(clim_dir):
+            if all([isfile(join(clim_dir, fname)) for fname in cell_files]):
+                return True
+        else:
+            makedirs(clim_dir)
+
+        for fname, contents in cell_files.items():
+            with open(join(clim_dir, fname), 'wb') as fobj:
+                fobj.write(contents.encode(ENCODING))
+
+        return True
+
+    def flush(self):
+        """
+        closing the zip file writes its central directory so that cells added so far are recoverable
+        """
+        if self.mode != 'a':
+            return
+
+        self.close()
+        self.mtime = stat(self.store_fn).st_mtime
+        self._write_index()
+        self.nadded = 0
+
+    def close(self):
+        """
+        C
+        """
+        if self.zip_obj is not None:
+            self.zip_obj.close()
+            self.zip_obj = None
+            self.mode = None
+
+# stores held by this process, keyed by region weather directory
+# ==============================================================
+_wthr_stores = {}
+
+def fetch_wthr_store(region_dir, create_flag=False):
+    """
+    return store for this region and scenario or None if there is no store and create_flag is not set
+    """
+    region_dir = normpath(region_dir)
+    if region_dir in _wthr_stores and not _wthr_stores[region_dir].is_current():
+        _wthr_stores[region_dir].close()
+        del _wthr_stores[region_dir]
+
+    if region_dir not in _wthr_stores:
+        wthr_store = WthrStore(region_dir)
+        if wthr_store.mtime is None and not create_flag:
+            return None
+
+        _wthr_stores[region_dir] = wthr_store
+
+    return _wthr_stores[region_dir]
+
+def unpack_wthr_store(region_dir, gran_coords=None):
+    """
+    extract all cells, or those listed, of a store to the region weather directory e.g. for use by other tools
+    returns number of cells extracted or already present
+    """
+    wthr_store = fetch_wthr_store(region_dir)
+    if wthr_store is None:
+        print(WARNING_STR + 'no weather store for ' + region_dir)
+        return 0
+
+    if gran_coords is None:
+        gran_coords = list(wthr_store.cells)
+
+    nextracted = 0
+    for gran_coord in gran_coords:
+        if wthr_store.extract_cell(gran_coord, join(wthr_store.region_dir, gran_coord)):
+            nextracted += 1
+
+    return nextracted
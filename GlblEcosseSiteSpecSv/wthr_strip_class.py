@@ -0,0 +1,104 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        wthr_strip_class.py
+# Purpose:     stand-ins for weather netCDF datasets which read the full time by longitude strip for each latitude
+#              row in a single call and then serve the time series for each cell from that strip
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'wthr_strip_class.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+from getClimGenFns import get_wthr_nc_coords
+
+class WthrStripVariable(object,):
+    """
+    serves reads of the form var[time_key, lat_indx, lon_indx] from the strip for lat_indx, reading a new strip
+    when the latitude index or time slice changes; all other reads are passed to the netCDF variable
+    when time_key is a slice then only those time steps are read, otherwise the strip spans the full time axis
+    """
+    def __init__(self, nc_var, lon_indx_min, lon_indx_max):
+        """
+        C
+        """
+        self.nc_var = nc_var
+        self.lon_indx_min = lon_indx_min
+        self.lon_indx_max = lon_indx_max
+        self.strip_key = None
+        self.strip = None
+
+    def __getitem__(self, key):
+        """
+        C
+        """
+        if isinstance(key, tuple) and len(key) == 3:
+            time_key, lat_indx, lon_indx = key
+            if not isinstance(lat_indx, slice) and not isinstance(lon_indx, slice) \
+                                                        and self.lon_indx_min <= lon_indx <= self.lon_indx_max:
+                if isinstance(time_key, slice):
+                    strip_key = (lat_indx, time_key.start, time_key.stop, time_key.step)
+                    strip_time_key, time_key = time_key, slice(None)
+                else:
+                    strip_key = (lat_indx, None)
+                    strip_time_key = slice(None)
+
+                if strip_key != self.strip_key:
+                    self.strip = self.nc_var[strip_time_key, lat_indx, self.lon_indx_min:self.lon_indx_max + 1]
+                    self.strip_key = strip_key
+
+                return self.strip[time_key, lon_indx - self.lon_indx_min]
+
+        return self.nc_var[key]
+
+    def __getattr__(self, attrib):
+        """
+        attributes such as units and shape are those of the netCDF variable
+        """
+        return getattr(self.nc_var, attrib)
+
+class WthrStripDataset(object,):
+    """
+    wraps netCDF dataset - only three dimensional variables i.e. time, lat, lon are read as strips
+    """
+    def __init__(self, nc_dset, lon_indx_min=None, lon_indx_max=None):
+        """
+        if longitude limits are not supplied then strips span the full width of the dataset
+        """
+        self.nc_dset = nc_dset
+        self.variables = {}
+        for var_name, nc_var in nc_dset.variables.items():
+            if nc_var.ndim == 3:
+                lon_min = 0 if lon_indx_min is None else lon_indx_min
+                lon_max = nc_var.shape[2] - 1 if lon_indx_max is None else lon_indx_max
+                self.variables[var_name] = WthrStripVariable(nc_var, lon_min, lon_max)
+            else:
+                self.variables[var_name] = nc_var
+
+    def __getattr__(self, attrib):
+        """
+        C
+        """
+        return getattr(self.nc_dset, attrib)
+
+def make_wthr_strip_dsets(wthr_dsets, wthr_set_defn, bbox):
+    """
+    return dictionary of stand-in datasets, one for each metric, with strips restricted to the longitudes of the AOI
+    """
+    lon_ll, lat_ll, lon_ur, lat_ur = bbox
+    lat_mid = (lat_ll + lat_ur)/2
+    dummy, lon_indx_ll = get_wthr_nc_coords(wthr_set_defn, lat_mid, lon_ll)
+    dummy, lon_indx_ur = get_wthr_nc_coords(wthr_set_defn, lat_mid, lon_ur)
+    if lon_indx_ll < 0 or lon_indx_ur < 0:
+        lon_indx_min, lon_indx_max = None, None     # AOI extends beyond dataset
+    else:
+        lon_indx_min, lon_indx_max = min(lon_indx_ll, lon_indx_ur), max(lon_indx_ll, lon_indx_ur)
+
+    wthr_strip_dsets = {}
+    for metric in wthr_dsets:
+        wthr_strip_dsets[metric] = WthrStripDataset(wthr_dsets[metric], lon_indx_min, lon_indx_max)
+
+    return wthr_strip_dsets